@@ -0,0 +1,332 @@
+import collections
+import threading
+import typing
+
+import pandas as pd
+
+from api import config
+from api.cache import (
+    InvalidationChannel,
+    get_invalidation_channel,
+)
+
+# freq 對應 pandas period, 週 K 以週一到週日為一週
+FREQ_PERIOD = {
+    "W": "W",
+    "M": "M",
+    "Q": "Q",
+}
+
+DAILY_SQL = """
+select Date, Open, Max, Min, Close,
+TradeVolume, TradeValue, `Transaction`
+from taiwan_stock_price
+where StockID = :stock_id
+and Date>= :start_date
+order by Date
+"""
+
+
+def resample_bars(
+    daily_df: pd.DataFrame, freq: str
+) -> pd.DataFrame:
+    """日 K 轉成週, 月, 季 K,
+    開盤取第一天, 收盤取最後一天, 最高, 最低取極值, 成交量值加總
+    """
+    daily_df = daily_df.assign(
+        Date=pd.to_datetime(
+            daily_df["Date"]
+        )
+    ).sort_values("Date")
+    period = daily_df[
+        "Date"
+    ].dt.to_period(FREQ_PERIOD[freq])
+    bars_df = daily_df.groupby(
+        period
+    ).agg(
+        StartDate=("Date", "first"),
+        EndDate=("Date", "last"),
+        Open=("Open", "first"),
+        Max=("Max", "max"),
+        Min=("Min", "min"),
+        Close=("Close", "last"),
+        TradeVolume=(
+            "TradeVolume",
+            "sum",
+        ),
+        TradeValue=(
+            "TradeValue",
+            "sum",
+        ),
+        Transaction=(
+            "Transaction",
+            "sum",
+        ),
+    )
+    return bars_df.reset_index(
+        drop=True
+    )
+
+
+def filter_bars(
+    bars_df: pd.DataFrame,
+    start_date: str = "",
+    end_date: str = "",
+) -> pd.DataFrame:
+    """K 線日期區間與 start_date ~ end_date 有重疊的部分"""
+    mask = pd.Series(
+        True, index=bars_df.index
+    )
+    if start_date:
+        mask &= bars_df[
+            "EndDate"
+        ] >= pd.Timestamp(start_date)
+    if end_date:
+        mask &= bars_df[
+            "StartDate"
+        ] <= pd.Timestamp(end_date)
+    return bars_df[mask]
+
+
+class BarsEntry:
+    def __init__(
+        self, bars_df: pd.DataFrame
+    ):
+        self.bars_df = bars_df
+        # 有新資料的最早日期, None 代表不需要更新
+        self.dirty_date = None
+
+
+class BarStore:
+    """保存每個 (股票, 頻率) 完整歷史的 K 線,
+    第一次查詢時從日 K 計算, 之後收到新資料的通知時,
+    只重新讀取最後一根 K 線之後的日 K, 接在原本的 K 線後面
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        channel: typing.Optional[
+            InvalidationChannel
+        ] = None,
+    ):
+        self.max_entries = max_entries
+        self._data = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+        # 每次收到通知加一, 讀取日 K 期間有通知時, 讀到的可能是舊資料
+        self._version = 0
+        if channel is not None:
+            channel.subscribe(
+                self.invalidate
+            )
+
+    def invalidate(
+        self,
+        dataset: str,
+        start_date: str = "",
+        end_date: str = "",
+    ):
+        if (
+            dataset
+            != "taiwan_stock_price"
+        ):
+            return
+        with self._lock:
+            self._version += 1
+            if not start_date:
+                self._data.clear()
+                return
+            for (
+                entry
+            ) in self._data.values():
+                if (
+                    entry.dirty_date
+                    is None
+                    or start_date
+                    < entry.dirty_date
+                ):
+                    entry.dirty_date = (
+                        start_date
+                    )
+
+    def get_update_date(
+        self,
+        key: typing.Tuple[str, str],
+    ) -> typing.Tuple[
+        typing.Optional[str], int
+    ]:
+        """需要重新讀取的日 K 起始日期, 與目前的通知版本,
+        "" 代表從頭讀取, None 代表不需要讀取
+        """
+        with self._lock:
+            return (
+                self._get_update_date(
+                    key
+                ),
+                self._version,
+            )
+
+    def _get_update_date(
+        self,
+        key: typing.Tuple[str, str],
+    ) -> typing.Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return ""
+        self._data.move_to_end(key)
+        if entry.dirty_date is None:
+            return None
+        bars_df = entry.bars_df
+        dirty_date = pd.Timestamp(
+            entry.dirty_date
+        )
+        if (
+            len(bars_df) == 0
+            or dirty_date
+            < bars_df["StartDate"].iloc[
+                0
+            ]
+        ):
+            return ""
+        # 新資料所在的 K 線, 與之後的 K 線都需要重算
+        start_list = bars_df.loc[
+            bars_df["EndDate"]
+            >= dirty_date,
+            "StartDate",
+        ]
+        if len(start_list) == 0:
+            start_date = bars_df[
+                "StartDate"
+            ].iloc[-1]
+        else:
+            start_date = (
+                start_list.iloc[0]
+            )
+        # 從該週期的第一天開始讀取
+        return str(
+            pd.Period(
+                start_date,
+                FREQ_PERIOD[key[1]],
+            ).start_time.date()
+        )
+
+    def update(
+        self,
+        key: typing.Tuple[str, str],
+        start_date: str,
+        daily_df: pd.DataFrame,
+        version: int,
+    ) -> typing.Optional[pd.DataFrame]:
+        """用 start_date 之後的日 K, 取代原本 start_date 之後的 K 線,
+        回傳完整歷史的 K 線, 讀取期間被淘汰時回傳 None
+        """
+        new_df = resample_bars(
+            daily_df, key[1]
+        )
+        with self._lock:
+            # 讀取期間收到通知, 保留 dirty_date, 下次重新讀取
+            notified = (
+                version != self._version
+            )
+            entry = self._data.get(key)
+            if not start_date:
+                if notified:
+                    # 沒有 entry 可以標記, 不保存, 下次從頭讀取
+                    return new_df
+                entry = BarsEntry(
+                    new_df
+                )
+                self._data[key] = entry
+            elif entry is None:
+                # 讀取期間被淘汰, 只有部分資料, 不保存
+                return None
+            else:
+                old_df = entry.bars_df
+                entry.bars_df = pd.concat(
+                    [
+                        old_df[
+                            old_df[
+                                "StartDate"
+                            ]
+                            < pd.Timestamp(
+                                start_date
+                            )
+                        ],
+                        new_df,
+                    ],
+                    ignore_index=True,
+                )
+                if not notified:
+                    entry.dirty_date = (
+                        None
+                    )
+            bars_df = entry.bars_df
+            self._data.move_to_end(key)
+            while (
+                len(self._data)
+                > self.max_entries
+            ):
+                self._data.popitem(
+                    last=False
+                )
+        return bars_df
+
+    async def load(
+        self,
+        key: typing.Tuple[str, str],
+        read_daily: typing.Callable[
+            [str],
+            typing.Awaitable[
+                pd.DataFrame
+            ],
+        ],
+    ) -> pd.DataFrame:
+        """回傳完整歷史的 K 線, read_daily 讀取日期之後的日 K,
+        有新資料時只讀取需要重算的部分, 讀取期間被淘汰時從頭讀取
+        """
+        update_date, version = (
+            self.get_update_date(key)
+        )
+        if update_date is None:
+            with self._lock:
+                entry = self._data.get(
+                    key
+                )
+            if entry is not None:
+                return entry.bars_df
+            update_date = ""
+        bars_df = self.update(
+            key,
+            update_date,
+            await read_daily(
+                update_date
+            ),
+            version,
+        )
+        if bars_df is None:
+            bars_df = self.update(
+                key,
+                "",
+                await read_daily(""),
+                version,
+            )
+        return bars_df
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_bar_store = None
+
+
+def get_bar_store() -> BarStore:
+    """FastAPI dependency, 整個進程共用"""
+    global _bar_store
+    if _bar_store is None:
+        _bar_store = BarStore(
+            max_entries=config.BARS_CACHE_MAX_ENTRIES,
+            channel=get_invalidation_channel(),
+        )
+    return _bar_store
@@ -0,0 +1,337 @@
+import collections
+import datetime
+import threading
+import time
+import typing
+from abc import ABC, abstractmethod
+
+from api import config
+
+
+def normalize_date(date: str) -> str:
+    """2021-4-1 與 2021-04-01 視為同一個 key"""
+    try:
+        return str(
+            datetime.datetime.strptime(
+                date.strip(), "%Y-%m-%d"
+            ).date()
+        )
+    except ValueError:
+        return date.strip()
+
+
+def make_key(
+    dataset: str, **params
+) -> typing.Tuple:
+    """cache key, (dataset, 排序後的參數), 日期參數統一格式"""
+    return (
+        dataset,
+        tuple(
+            sorted(
+                (
+                    name,
+                    (
+                        normalize_date(
+                            value
+                        )
+                        if name.endswith(
+                            "date"
+                        )
+                        else str(
+                            value
+                        ).strip()
+                    ),
+                )
+                for name, value in params.items()
+            )
+        ),
+    )
+
+
+class InvalidationChannel(ABC):
+    """資料更新時, 通知 cache 失效的管道,
+    publish 一個 dataset 的日期區間, 所有 subscribe 的 callback 都會收到
+    """
+
+    @abstractmethod
+    def publish(
+        self,
+        dataset: str,
+        start_date: str,
+        end_date: str,
+    ):
+        pass
+
+    @abstractmethod
+    def subscribe(
+        self,
+        callback: typing.Callable[
+            [str, str, str], None
+        ],
+    ):
+        pass
+
+
+class LocalInvalidationChannel(
+    InvalidationChannel
+):
+    """同一個進程內的實作, 直接呼叫 callback"""
+
+    def __init__(self):
+        self._callback_list = []
+
+    def publish(
+        self,
+        dataset: str,
+        start_date: str,
+        end_date: str,
+    ):
+        for (
+            callback
+        ) in self._callback_list:
+            callback(
+                dataset,
+                normalize_date(
+                    start_date
+                ),
+                normalize_date(
+                    end_date
+                ),
+            )
+
+    def subscribe(
+        self,
+        callback: typing.Callable[
+            [str, str, str], None
+        ],
+    ):
+        self._callback_list.append(
+            callback
+        )
+
+
+class CacheEntry:
+    def __init__(
+        self,
+        content: bytes,
+        dataset: str,
+        start_date: str,
+        end_date: str,
+        expire_time: float,
+    ):
+        self.content = content
+        self.dataset = dataset
+        self.start_date = start_date
+        self.end_date = end_date
+        self.expire_time = expire_time
+        # 估計記憶體用量, 內容 + 物件本身
+        self.size = len(content) + 200
+
+    def is_overlap(
+        self,
+        start_date: str,
+        end_date: str,
+    ) -> bool:
+        # 空字串代表沒有限制
+        return (
+            not self.start_date
+            or not end_date
+            or self.start_date
+            <= end_date
+        ) and (
+            not self.end_date
+            or not start_date
+            or self.end_date
+            >= start_date
+        )
+
+
+class ResponseCache:
+    """api response cache, 存放序列化後的 response,
+    超過 max_bytes 時, 從最久沒使用的開始淘汰 (LRU),
+    超過 ttl 秒的資料視為過期
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: float,
+        channel: typing.Optional[
+            InvalidationChannel
+        ] = None,
+        timer: typing.Callable[
+            [], float
+        ] = time.monotonic,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.timer = timer
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._data = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+        if channel is not None:
+            channel.subscribe(
+                self.invalidate
+            )
+
+    def get(
+        self, key: typing.Tuple
+    ) -> typing.Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if (
+                entry is not None
+                and entry.expire_time
+                < self.timer()
+            ):
+                self._pop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry.content
+
+    def set(
+        self,
+        key: typing.Tuple,
+        content: bytes,
+        dataset: str,
+        start_date: str = "",
+        end_date: str = "",
+    ):
+        entry = CacheEntry(
+            content,
+            dataset,
+            normalize_date(start_date),
+            normalize_date(end_date),
+            self.timer() + self.ttl,
+        )
+        # 單筆就超過上限, 不放進 cache
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = entry
+            self.size += entry.size
+            while (
+                self.size
+                > self.max_bytes
+            ):
+                self._pop(
+                    next(
+                        iter(self._data)
+                    )
+                )
+                self.evictions += 1
+
+    def invalidate(
+        self,
+        dataset: str,
+        start_date: str = "",
+        end_date: str = "",
+    ):
+        """dataset 在 start_date ~ end_date 有新資料,
+        刪除日期區間有重疊的 cache
+        """
+        with self._lock:
+            key_list = [
+                key
+                for key, entry in self._data.items()
+                if entry.dataset
+                == dataset
+                and entry.is_overlap(
+                    start_date, end_date
+                )
+            ]
+            for key in key_list:
+                self._pop(key)
+            self.invalidations += len(
+                key_list
+            )
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def _pop(self, key: typing.Tuple):
+        entry = self._data.pop(key)
+        self.size -= entry.size
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def render_metrics(self) -> str:
+        """Prometheus text 格式"""
+        metric_list = [
+            (
+                "api_cache_hits_total",
+                "counter",
+                self.hits,
+            ),
+            (
+                "api_cache_misses_total",
+                "counter",
+                self.misses,
+            ),
+            (
+                "api_cache_evictions_total",
+                "counter",
+                self.evictions,
+            ),
+            (
+                "api_cache_invalidations_total",
+                "counter",
+                self.invalidations,
+            ),
+            (
+                "api_cache_entries",
+                "gauge",
+                len(self),
+            ),
+            (
+                "api_cache_bytes",
+                "gauge",
+                self.size,
+            ),
+        ]
+        return "".join(
+            f"# TYPE {name} {metric_type}\n{name} {value}\n"
+            for name, metric_type, value in metric_list
+        )
+
+
+_channel = None
+_cache = None
+
+
+def get_invalidation_channel() -> (
+    InvalidationChannel
+):
+    global _channel
+    if _channel is None:
+        _channel = (
+            LocalInvalidationChannel()
+        )
+    return _channel
+
+
+def get_cache() -> ResponseCache:
+    """FastAPI dependency, 整個進程共用一個 cache"""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(
+            max_bytes=config.API_CACHE_MAX_BYTES,
+            ttl=config.API_CACHE_TTL,
+            channel=get_invalidation_channel(),
+        )
+    return _cache
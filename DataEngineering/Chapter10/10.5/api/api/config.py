@@ -18,3 +18,89 @@ MYSQL_DATA_DATABASE = os.environ.get(
     "MYSQL_DATA_DATABASE",
     "FinancialData",
 )
+
+# connection pool 設定
+MYSQL_POOL_SIZE = int(
+    os.environ.get(
+        "MYSQL_POOL_SIZE", "10"
+    )
+)
+MYSQL_MAX_OVERFLOW = int(
+    os.environ.get(
+        "MYSQL_MAX_OVERFLOW", "20"
+    )
+)
+MYSQL_POOL_RECYCLE = int(
+    os.environ.get(
+        "MYSQL_POOL_RECYCLE", "3600"
+    )
+)
+# 1: 使用 aiomysql, endpoint 直接 await 查詢, 不佔用 threadpool
+MYSQL_ASYNC = bool(
+    int(
+        os.environ.get(
+            "MYSQL_ASYNC", "0"
+        )
+    )
+)
+
+# response cache, 記憶體上限 (bytes) 與存活時間 (秒)
+API_CACHE_MAX_BYTES = int(
+    os.environ.get(
+        "API_CACHE_MAX_BYTES",
+        str(256 * 1024 * 1024),
+    )
+)
+API_CACHE_TTL = int(
+    os.environ.get(
+        "API_CACHE_TTL", "300"
+    )
+)
+
+# 串流輸出時, 每次從 server-side cursor 取出的筆數
+STREAM_BATCH_SIZE = int(
+    os.environ.get(
+        "STREAM_BATCH_SIZE", "5000"
+    )
+)
+
+# batch 查詢時, 一次最多可以查詢的股票數量
+BATCH_MAX_STOCK_ID = int(
+    os.environ.get(
+        "BATCH_MAX_STOCK_ID", "100"
+    )
+)
+
+# 分頁查詢時, 每頁最多筆數
+PAGE_MAX_LIMIT = int(
+    os.environ.get(
+        "PAGE_MAX_LIMIT", "10000"
+    )
+)
+
+# K 線 (週, 月, 季) 快取, 最多保存的 (股票, 頻率) 數量
+BARS_CACHE_MAX_ENTRIES = int(
+    os.environ.get(
+        "BARS_CACHE_MAX_ENTRIES", "2000"
+    )
+)
+
+# 每隔幾秒檢查 data_version, 有新版本時讓 cache 失效
+DATA_VERSION_INTERVAL = float(
+    os.environ.get(
+        "DATA_VERSION_INTERVAL", "5"
+    )
+)
+
+# 技術指標 job 每隔幾秒檢查 data_version, 計算有更新的股票
+INDICATOR_INTERVAL = float(
+    os.environ.get(
+        "INDICATOR_INTERVAL", "60"
+    )
+)
+
+# taiwan_stock_price 記憶體快照檔案 (arrow), 空字串代表不使用,
+# 啟動時載入, 檔案不存在時從 mysql 建立
+SNAPSHOT_PATH = os.environ.get(
+    "SNAPSHOT_PATH", ""
+)
@@ -0,0 +1,293 @@
+import threading
+import typing
+
+import pandas as pd
+from sqlalchemy import (
+    create_engine,
+    engine,
+    text,
+)
+from sqlalchemy.ext.asyncio import (
+    create_async_engine,
+)
+from starlette.concurrency import (
+    run_in_threadpool,
+)
+
+from api import config
+
+
+def get_address(
+    driver: str = "pymysql",
+) -> str:
+    return (
+        f"mysql+{driver}://{config.MYSQL_DATA_USER}:{config.MYSQL_DATA_PASSWORD}"
+        f"@{config.MYSQL_DATA_HOST}:{config.MYSQL_DATA_PORT}/{config.MYSQL_DATA_DATABASE}"
+    )
+
+
+class Database:
+    """整個 api 進程共用一組 connection pool,
+    啟動時建立, 關閉時釋放, 避免每個 request 重新建立連線
+    """
+
+    def __init__(self):
+        self.engine = create_engine(
+            get_address(),
+            pool_size=config.MYSQL_POOL_SIZE,
+            max_overflow=config.MYSQL_MAX_OVERFLOW,
+            pool_recycle=config.MYSQL_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+        self.async_engine = None
+        if config.MYSQL_ASYNC:
+            self.async_engine = create_async_engine(
+                get_address("aiomysql"),
+                pool_size=config.MYSQL_POOL_SIZE,
+                max_overflow=config.MYSQL_MAX_OVERFLOW,
+                pool_recycle=config.MYSQL_POOL_RECYCLE,
+                pool_pre_ping=True,
+            )
+
+    def connect(
+        self,
+    ) -> engine.base.Connection:
+        return self.engine.connect()
+
+    def read_sql_sync(
+        self,
+        sql: str,
+        params: typing.Dict[
+            str, typing.Any
+        ],
+    ) -> pd.DataFrame:
+        # with 區塊結束時, 連線還給 pool
+        with self.connect() as conn:
+            return pd.read_sql(
+                text(sql),
+                con=conn,
+                params=params,
+            )
+
+    async def read_sql(
+        self,
+        sql: str,
+        params: typing.Dict[
+            str, typing.Any
+        ],
+    ) -> pd.DataFrame:
+        """查詢資料, 有 async engine 時直接 await,
+        否則丟到 threadpool 執行, 不阻塞 event loop
+        """
+        if self.async_engine is None:
+            return (
+                await run_in_threadpool(
+                    self.read_sql_sync,
+                    sql,
+                    params,
+                )
+            )
+        async with self.async_engine.connect() as conn:
+            result = await conn.execute(
+                text(sql), params
+            )
+            return pd.DataFrame(
+                result.fetchall(),
+                columns=list(
+                    result.keys()
+                ),
+            )
+
+    def execute_sync(
+        self,
+        statement_list: typing.List[
+            typing.Tuple[
+                str,
+                typing.List[
+                    typing.Dict[
+                        str, typing.Any
+                    ]
+                ],
+            ]
+        ],
+    ):
+        """多個 (SQL, 多筆參數) 在同一個 transaction 寫入"""
+        with self.engine.begin() as conn:
+            for (
+                sql,
+                params_list,
+            ) in statement_list:
+                if params_list:
+                    conn.execute(
+                        text(sql),
+                        params_list,
+                    )
+
+    async def execute(
+        self,
+        statement_list: typing.List[
+            typing.Tuple[
+                str,
+                typing.List[
+                    typing.Dict[
+                        str, typing.Any
+                    ]
+                ],
+            ]
+        ],
+    ):
+        if self.async_engine is None:
+            await run_in_threadpool(
+                self.execute_sync,
+                statement_list,
+            )
+            return
+        async with self.async_engine.begin() as conn:
+            for (
+                sql,
+                params_list,
+            ) in statement_list:
+                if params_list:
+                    await conn.execute(
+                        text(sql),
+                        params_list,
+                    )
+
+    def stream_sql_sync(
+        self,
+        sql: str,
+        params: typing.Dict[
+            str, typing.Any
+        ],
+        batch_size: int,
+    ) -> typing.Iterator[
+        typing.Tuple[
+            typing.List[str],
+            typing.List,
+        ]
+    ]:
+        """server-side cursor, 每次只從 mysql 取 batch_size 筆,
+        回傳 (欄位名稱, 資料) , 記憶體用量與查詢範圍大小無關
+        """
+        with self.connect() as conn:
+            result = (
+                conn.execution_options(
+                    stream_results=True
+                ).execute(
+                    text(sql), params
+                )
+            )
+            columns = list(
+                result.keys()
+            )
+            # 沒有資料時, 也要回傳欄位名稱, 例如 csv header
+            rows = result.fetchmany(
+                batch_size
+            )
+            yield columns, rows
+            while rows:
+                rows = result.fetchmany(
+                    batch_size
+                )
+                if rows:
+                    yield columns, rows
+
+    async def stream_sql(
+        self,
+        sql: str,
+        params: typing.Dict[
+            str, typing.Any
+        ],
+        batch_size: int,
+    ) -> typing.AsyncIterator[
+        typing.Tuple[
+            typing.List[str],
+            typing.List,
+        ]
+    ]:
+        if self.async_engine is None:
+            iterator = (
+                self.stream_sql_sync(
+                    sql,
+                    params,
+                    batch_size,
+                )
+            )
+            # 取消時 thread 中的 next 仍會執行完, close 需要等它結束
+            lock = threading.Lock()
+
+            def next_batch():
+                with lock:
+                    return next(
+                        iterator, None
+                    )
+
+            def close():
+                with lock:
+                    iterator.close()
+
+            try:
+                while True:
+                    batch = await run_in_threadpool(
+                        next_batch
+                    )
+                    if batch is None:
+                        break
+                    yield batch
+            finally:
+                # client 中斷時 aclose 會進到這裡, 立刻關閉 cursor 並把連線還給 pool,
+                # 不等 GC, 關閉 server-side cursor 需要讀完剩下的資料, 在 thread 執行
+                await run_in_threadpool(
+                    close
+                )
+            return
+        async with self.async_engine.connect() as conn:
+            result = await conn.stream(
+                text(sql), params
+            )
+            columns = list(
+                result.keys()
+            )
+            empty = True
+            async for (
+                rows
+            ) in result.partitions(
+                batch_size
+            ):
+                empty = False
+                yield columns, rows
+            if empty:
+                yield columns, []
+
+    async def dispose(self):
+        self.engine.dispose()
+        if (
+            self.async_engine
+            is not None
+        ):
+            await self.async_engine.dispose()
+
+
+_database = None
+
+
+def get_database() -> Database:
+    """FastAPI dependency, 沒有經過 startup 時 (例如測試), 第一次使用才建立"""
+    global _database
+    if _database is None:
+        _database = Database()
+    return _database
+
+
+async def close_database():
+    global _database
+    if _database is not None:
+        await _database.dispose()
+        _database = None
+
+
+def get_mysql_financialdata_conn() -> (
+    engine.base.Connection
+):
+    """從共用的 connection pool 拿一條連線, 使用完需要 close 還給 pool"""
+    return get_database().connect()
@@ -0,0 +1,330 @@
+import asyncio
+import csv
+import datetime
+import decimal
+import io
+import json
+import typing
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import HTTPException
+from fastapi.responses import (
+    StreamingResponse,
+)
+
+# 串流輸出支援的格式
+MEDIA_TYPE = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# 各 dataset 的 arrow 欄位型態, 與 mysql table 一致
+# FLOAT -> float32, INT/BIGINT -> int64, DATE -> date32
+ARROW_SCHEMA = {
+    "taiwan_stock_price": pa.schema(
+        [
+            ("StockID", pa.string()),
+            ("TradeVolume", pa.int64()),
+            ("Transaction", pa.int64()),
+            ("TradeValue", pa.int64()),
+            ("Open", pa.float32()),
+            ("Max", pa.float32()),
+            ("Min", pa.float32()),
+            ("Close", pa.float32()),
+            ("Change", pa.float32()),
+            ("Date", pa.date32()),
+        ]
+    ),
+    "taiwan_futures_daily": pa.schema(
+        [
+            ("Date", pa.date32()),
+            ("FuturesID", pa.string()),
+            (
+                "ContractDate",
+                pa.string(),
+            ),
+            ("Open", pa.float32()),
+            ("Max", pa.float32()),
+            ("Min", pa.float32()),
+            ("Close", pa.float32()),
+            ("Change", pa.float32()),
+            ("ChangePer", pa.float32()),
+            ("Volume", pa.float32()),
+            (
+                "SettlementPrice",
+                pa.float32(),
+            ),
+            (
+                "OpenInterest",
+                pa.int64(),
+            ),
+            (
+                "TradingSession",
+                pa.string(),
+            ),
+        ]
+    ),
+}
+
+
+def to_jsonable(value):
+    if isinstance(
+        value,
+        (
+            datetime.date,
+            datetime.datetime,
+        ),
+    ):
+        return value.isoformat()
+    if isinstance(
+        value, decimal.Decimal
+    ):
+        return float(value)
+    return value
+
+
+def encode_ndjson(
+    columns: typing.List[str],
+    rows: typing.List,
+    header: bool,
+) -> bytes:
+    """一行一筆 json"""
+    return "".join(
+        json.dumps(
+            {
+                column: to_jsonable(
+                    value
+                )
+                for column, value in zip(
+                    columns, row
+                )
+            },
+            ensure_ascii=False,
+        )
+        + "\n"
+        for row in rows
+    ).encode("utf8")
+
+
+def encode_csv(
+    columns: typing.List[str],
+    rows: typing.List,
+    header: bool,
+) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(
+        buffer, lineterminator="\n"
+    )
+    if header:
+        writer.writerow(columns)
+    writer.writerows(
+        [
+            to_jsonable(value)
+            for value in row
+        ]
+        for row in rows
+    )
+    return buffer.getvalue().encode(
+        "utf8"
+    )
+
+
+ENCODE_FUNC = {
+    "ndjson": encode_ndjson,
+    "csv": encode_csv,
+}
+
+
+class StreamSink(io.RawIOBase):
+    """給 arrow writer 寫入的 file object,
+    每個 batch 寫完後, 用 pop 取出新寫入的 bytes 送出
+    """
+
+    def __init__(self):
+        self._chunk_list = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunk_list.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def pop(self) -> bytes:
+        data = b"".join(
+            self._chunk_list
+        )
+        self._chunk_list = []
+        return data
+
+
+def to_arrow_table(
+    columns: typing.List[str],
+    rows: typing.List,
+    schema: pa.Schema,
+) -> pa.Table:
+    """cursor 取出的資料, 依照 schema 轉成 arrow 欄位"""
+    index_dict = {
+        column: i
+        for i, column in enumerate(
+            columns
+        )
+    }
+    return pa.Table.from_arrays(
+        [
+            pa.array(
+                [
+                    row[
+                        index_dict[
+                            field.name
+                        ]
+                    ]
+                    for row in rows
+                ],
+                type=field.type,
+            )
+            for field in schema
+        ],
+        schema=schema,
+    )
+
+
+async def encode_arrow_stream(
+    batch_iter: typing.AsyncIterator,
+    format: str,
+    schema: pa.Schema,
+) -> typing.AsyncIterator[bytes]:
+    """arrow 每個 batch 是一個 record batch, parquet 每個 batch 是一個 row group,
+    schema 依照查詢回傳的欄位, 從 dataset schema 中取出
+    """
+    sink = StreamSink()
+    writer = None
+    async for (
+        columns,
+        rows,
+    ) in batch_iter:
+        if writer is None:
+            schema = pa.schema(
+                [
+                    schema.field(column)
+                    for column in columns
+                ]
+            )
+            if format == "arrow":
+                writer = (
+                    pa.ipc.new_stream(
+                        sink, schema
+                    )
+                )
+            else:
+                writer = (
+                    pq.ParquetWriter(
+                        sink, schema
+                    )
+                )
+        if rows:
+            writer.write_table(
+                to_arrow_table(
+                    columns,
+                    rows,
+                    schema,
+                )
+            )
+        yield sink.pop()
+    writer.close()
+    yield sink.pop()
+
+
+async def encode_stream(
+    batch_iter: typing.AsyncGenerator,
+    format: str,
+    dataset: str,
+) -> typing.AsyncIterator[bytes]:
+    """每個 batch 轉換後立刻送出, 不需要等待全部資料,
+    結束或被關閉時, 一併關閉 batch_iter, 釋放查詢的連線
+    """
+    try:
+        if format in [
+            "arrow",
+            "parquet",
+        ]:
+            async for (
+                data
+            ) in encode_arrow_stream(
+                batch_iter,
+                format,
+                ARROW_SCHEMA[dataset],
+            ):
+                yield data
+            return
+        encode = ENCODE_FUNC[format]
+        header = True
+        async for (
+            columns,
+            rows,
+        ) in batch_iter:
+            yield encode(
+                columns, rows, header
+            )
+            header = False
+    finally:
+        await batch_iter.aclose()
+
+
+def check_format(format: str):
+    if (
+        format != "json"
+        and format not in MEDIA_TYPE
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail=f"format must be one of json, {', '.join(MEDIA_TYPE)}",
+        )
+
+
+class ClosingStreamingResponse(
+    StreamingResponse
+):
+    """client 中斷時, starlette 只取消送出的 task, 不會關閉 body_iterator,
+    這裡一定呼叫 aclose, 放在另一個 task 並 shield, 被取消時也會執行完
+    """
+
+    async def stream_response(
+        self, send
+    ):
+        try:
+            await super().stream_response(
+                send
+            )
+        finally:
+            await asyncio.shield(
+                asyncio.ensure_future(
+                    self.body_iterator.aclose()
+                )
+            )
+
+
+def stream_response(
+    batch_iter: typing.AsyncGenerator,
+    format: str,
+    dataset: str,
+    headers: typing.Dict[
+        str, str
+    ] = None,
+) -> StreamingResponse:
+    return ClosingStreamingResponse(
+        encode_stream(
+            batch_iter, format, dataset
+        ),
+        media_type=MEDIA_TYPE[format],
+        headers=headers,
+    )
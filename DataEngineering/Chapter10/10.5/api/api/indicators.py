@@ -0,0 +1,547 @@
+"""
+技術指標 job, 指標計算後存放在 taiwan_stock_indicator,
+每檔股票最後的計算狀態 (最近的收盤價, RSI 平均漲跌幅) 存放在 taiwan_stock_indicator_state,
+有新的日 K 時, 從狀態接續計算新的日期, 不需要重算整段歷史,
+api 只讀取計算好的結果, 不在 request 中計算
+
+依照 data_version 定期計算:
+    pipenv run python api/indicators.py
+全部股票重新計算:
+    pipenv run python api/indicators.py rebuild
+"""
+
+import asyncio
+import contextlib
+import json
+import sys
+import typing
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from sqlalchemy import text
+
+from api import config
+
+# 移動平均
+MA_WINDOW = {
+    "ma_5": 5,
+    "ma_20": 20,
+    "ma_60": 60,
+}
+RSI_PERIOD = 14
+# 布林通道, 20 日均線 +- 2 倍標準差
+BBAND_WINDOW = 20
+BBAND_K = 2
+INDICATOR_LIST = list(MA_WINDOW) + [
+    "rsi_14",
+    "bband_upper_20",
+    "bband_lower_20",
+]
+# 接續計算需要保留的收盤價數量
+STATE_CLOSE_SIZE = (
+    max(
+        list(MA_WINDOW.values())
+        + [BBAND_WINDOW]
+    )
+    - 1
+)
+
+STATE_SQL = """
+select Date, State from taiwan_stock_indicator_state
+where StockID = :stock_id
+"""
+NEW_PRICE_SQL = """
+select Date, Close from taiwan_stock_price
+where StockID = :stock_id
+and Date > :last_date
+order by Date
+"""
+UPSERT_INDICATOR_SQL = """
+insert into taiwan_stock_indicator
+(StockID, Date, {columns})
+values (:StockID, :Date, {values})
+on duplicate key update {update}
+""".format(
+    columns=", ".join(INDICATOR_LIST),
+    values=", ".join(
+        f":{name}"
+        for name in INDICATOR_LIST
+    ),
+    update=", ".join(
+        f"{name} = values({name})"
+        for name in INDICATOR_LIST
+    ),
+)
+UPSERT_STATE_SQL = """
+insert into taiwan_stock_indicator_state
+(StockID, Date, State)
+values (:StockID, :Date, :State)
+on duplicate key update
+Date = values(Date), State = values(State)
+"""
+STOCK_ID_SQL = """
+select distinct StockID from taiwan_stock_price
+"""
+# data_version_consumer 中, 記錄此 job 處理到的版本
+CONSUMER = "taiwan_stock_indicator"
+CONSUMER_VERSION_SQL = """
+select version from data_version_consumer
+where consumer = :consumer
+"""
+UPSERT_CONSUMER_SQL = """
+insert into data_version_consumer
+(consumer, version)
+values (:consumer, :version)
+on duplicate key update version = values(version)
+"""
+NEW_VERSION_SQL = """
+select version, start_date from data_version
+where dataset = 'taiwan_stock_price'
+and version > :version
+order by version
+"""
+# start_date 之後有新的或更新的日 K, 走 idx_date_stock
+UPDATED_STOCK_ID_SQL = """
+select distinct StockID from taiwan_stock_price
+where Date >= :start_date
+"""
+# 已經計算過 start_date 之後的日期, 舊資料被更新, 需要從頭計算
+REBUILD_STOCK_ID_SQL = """
+select StockID from taiwan_stock_indicator_state
+where Date >= :start_date
+"""
+# mysql named lock, 綁定在連線上, 進程中斷時自動釋放
+GET_LOCK_SQL = (
+    "select get_lock(:name, 0)"
+)
+RELEASE_LOCK_SQL = (
+    "select release_lock(:name)"
+)
+
+
+def get_last_value(
+    series: pd.Series, default
+):
+    if len(series) and not np.isnan(
+        series.iloc[-1]
+    ):
+        return float(series.iloc[-1])
+    return default
+
+
+def wilder_smooth(
+    seed: float, value: np.ndarray
+) -> np.ndarray:
+    """Wilder 平滑, 第一個為 seed, avg = avg * (1 - 1/n) + x / n"""
+    return (
+        pd.Series(
+            np.concatenate(
+                [[seed], value]
+            )
+        )
+        .ewm(
+            alpha=1 / RSI_PERIOD,
+            adjust=False,
+        )
+        .mean()
+        .values
+    )
+
+
+def get_rsi(
+    avg_gain: np.ndarray,
+    avg_loss: np.ndarray,
+) -> np.ndarray:
+    """價格沒有變動, 平均漲跌幅都為 0 時, RSI 為 50"""
+    total = avg_gain + avg_loss
+    return np.where(
+        total > 0,
+        100
+        * avg_gain
+        / np.where(total > 0, total, 1),
+        50.0,
+    )
+
+
+def compute_indicators(
+    price_df: pd.DataFrame,
+    state: typing.Optional[
+        typing.Dict[str, typing.Any]
+    ] = None,
+) -> typing.Tuple[
+    pd.DataFrame,
+    typing.Dict[str, typing.Any],
+]:
+    """price_df 為新的日 K (Date, Close), 依照日期排序,
+    state 為上次計算後的狀態, None 代表從頭計算,
+    回傳新日期的指標, 與計算後的狀態
+    """
+    state = state or dict(
+        close_list=[],
+        avg_gain=None,
+        avg_loss=None,
+        count=0,
+    )
+    history_size = len(
+        state["close_list"]
+    )
+    close = pd.Series(
+        state["close_list"]
+        + price_df["Close"].tolist(),
+        dtype=float,
+    )
+    indicator_df = pd.DataFrame(
+        dict(
+            Date=price_df["Date"].values
+        )
+    )
+    # 均線與標準差, 在 [歷史收盤價 + 新收盤價] 上計算, 只取新日期
+    for (
+        name,
+        window,
+    ) in MA_WINDOW.items():
+        indicator_df[name] = (
+            close.rolling(window)
+            .mean()
+            .iloc[history_size:]
+            .values
+        )
+    bband_std = (
+        close.rolling(BBAND_WINDOW)
+        .std(ddof=0)
+        .iloc[history_size:]
+        .values
+    )
+    bband_mid = (
+        close.rolling(BBAND_WINDOW)
+        .mean()
+        .iloc[history_size:]
+        .values
+    )
+    indicator_df["bband_upper_20"] = (
+        bband_mid + BBAND_K * bband_std
+    )
+    indicator_df["bband_lower_20"] = (
+        bband_mid - BBAND_K * bband_std
+    )
+    # RSI, Wilder 的定義, 第一個平均值為前 RSI_PERIOD 個漲跌幅的簡單平均,
+    # 之後以 Wilder 平滑接續, 從狀態中的平均值即可接續計算
+    all_diff = close.diff()
+    diff = all_diff.iloc[history_size:]
+    gain = diff.clip(lower=0).values
+    loss = (-diff).clip(lower=0).values
+    # 累積的漲跌幅個數, 第一天沒有漲跌幅
+    count = state["count"] + np.cumsum(
+        diff.notna().values
+    )
+    rsi = np.full(len(diff), np.nan)
+    avg_gain = avg_loss = np.array([])
+    if state["avg_gain"] is not None:
+        avg_gain = wilder_smooth(
+            state["avg_gain"], gain
+        )[1:]
+        avg_loss = wilder_smooth(
+            state["avg_loss"], loss
+        )[1:]
+        rsi[:] = get_rsi(
+            avg_gain, avg_loss
+        )
+    else:
+        seed_list = np.flatnonzero(
+            count == RSI_PERIOD
+        )
+        if len(seed_list):
+            seed = seed_list[0]
+            # 到 seed 為止的 RSI_PERIOD 個漲跌幅, 可能包含狀態中的收盤價
+            seed_end = (
+                history_size + seed + 1
+            )
+            seed_diff = all_diff.iloc[
+                seed_end
+                - RSI_PERIOD : seed_end
+            ]
+            avg_gain = wilder_smooth(
+                seed_diff.clip(
+                    lower=0
+                ).mean(),
+                gain[seed + 1 :],
+            )
+            avg_loss = wilder_smooth(
+                (-seed_diff)
+                .clip(lower=0)
+                .mean(),
+                loss[seed + 1 :],
+            )
+            rsi[seed:] = get_rsi(
+                avg_gain, avg_loss
+            )
+    indicator_df["rsi_14"] = rsi
+    new_state = dict(
+        close_list=close.iloc[
+            -STATE_CLOSE_SIZE:
+        ].tolist(),
+        avg_gain=get_last_value(
+            pd.Series(avg_gain),
+            state["avg_gain"],
+        ),
+        avg_loss=get_last_value(
+            pd.Series(avg_loss),
+            state["avg_loss"],
+        ),
+        count=(
+            int(count[-1])
+            if len(count)
+            else state["count"]
+        ),
+    )
+    return indicator_df, new_state
+
+
+async def refresh(
+    database,
+    stock_id: str,
+    rebuild: bool = False,
+):
+    """從資料庫保存的狀態接續計算, rebuild=True 時從頭計算"""
+    last_date = "1900-01-01"
+    state = None
+    if not rebuild:
+        state_df = (
+            await database.read_sql(
+                STATE_SQL,
+                params=dict(
+                    stock_id=stock_id
+                ),
+            )
+        )
+        if len(state_df) > 0:
+            last_date = str(
+                state_df["Date"].iloc[0]
+            )
+            state = json.loads(
+                state_df["State"].iloc[
+                    0
+                ]
+            )
+    price_df = await database.read_sql(
+        NEW_PRICE_SQL,
+        params=dict(
+            stock_id=stock_id,
+            last_date=last_date,
+        ),
+    )
+    if len(price_df) == 0:
+        return
+    indicator_df, state = (
+        compute_indicators(
+            price_df, state
+        )
+    )
+    indicator_df = (
+        indicator_df.astype(object)
+        .where(
+            indicator_df.notna(), None
+        )
+        .assign(StockID=stock_id)
+    )
+    # 指標與狀態在同一個 transaction 寫入
+    await database.execute(
+        [
+            (
+                UPSERT_INDICATOR_SQL,
+                indicator_df.to_dict(
+                    "records"
+                ),
+            ),
+            (
+                UPSERT_STATE_SQL,
+                [
+                    dict(
+                        StockID=stock_id,
+                        Date=str(
+                            price_df[
+                                "Date"
+                            ].iloc[-1]
+                        ),
+                        State=json.dumps(
+                            state
+                        ),
+                    )
+                ],
+            ),
+        ]
+    )
+
+
+@contextlib.contextmanager
+def hold_lock(
+    database, name: str
+) -> typing.Iterator[bool]:
+    """多個 job 同時執行時, 只有拿到 lock 的會計算"""
+    conn = database.connect()
+    try:
+        acquired = (
+            conn.execute(
+                text(GET_LOCK_SQL),
+                dict(name=name),
+            ).scalar()
+            == 1
+        )
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(
+                    text(
+                        RELEASE_LOCK_SQL
+                    ),
+                    dict(name=name),
+                )
+    finally:
+        conn.close()
+
+
+async def run_once(database) -> bool:
+    """計算 data_version 中, 處理到的版本之後有更新的股票,
+    第一次執行時, 所有版本都是新的, 全部重新計算,
+    其他 job 正在計算時回傳 False
+    """
+    with hold_lock(
+        database, CONSUMER
+    ) as acquired:
+        if not acquired:
+            return False
+        consumer_df = (
+            await database.read_sql(
+                CONSUMER_VERSION_SQL,
+                params=dict(
+                    consumer=CONSUMER
+                ),
+            )
+        )
+        version = (
+            int(
+                consumer_df[
+                    "version"
+                ].iloc[0]
+            )
+            if len(consumer_df) > 0
+            else 0
+        )
+        version_df = (
+            await database.read_sql(
+                NEW_VERSION_SQL,
+                params=dict(
+                    version=version
+                ),
+            )
+        )
+        if len(version_df) == 0:
+            return True
+        start_date = str(
+            version_df[
+                "start_date"
+            ].min()
+        )
+        params = dict(
+            start_date=start_date
+        )
+        stock_id_df = (
+            await database.read_sql(
+                UPDATED_STOCK_ID_SQL,
+                params=params,
+            )
+        )
+        rebuild_df = (
+            await database.read_sql(
+                REBUILD_STOCK_ID_SQL,
+                params=params,
+            )
+        )
+        rebuild_set = set(
+            rebuild_df["StockID"]
+            if len(rebuild_df) > 0
+            else []
+        )
+        for stock_id in sorted(
+            set(
+                stock_id_df["StockID"]
+                if len(stock_id_df) > 0
+                else []
+            )
+            | rebuild_set
+        ):
+            await refresh(
+                database,
+                stock_id,
+                rebuild=stock_id
+                in rebuild_set,
+            )
+        # 全部計算完才記錄版本, 中斷後重跑會從同一個版本開始
+        await database.execute(
+            [
+                (
+                    UPSERT_CONSUMER_SQL,
+                    [
+                        dict(
+                            consumer=CONSUMER,
+                            version=int(
+                                version_df[
+                                    "version"
+                                ].max()
+                            ),
+                        )
+                    ],
+                )
+            ]
+        )
+        return True
+
+
+async def run(
+    database, interval: float
+):
+    """每 interval 秒檢查一次 data_version"""
+    while True:
+        try:
+            await run_once(database)
+        except Exception as e:
+            logger.info(e)
+        await asyncio.sleep(interval)
+
+
+async def rebuild_all(database):
+    """全部股票從頭計算"""
+    stock_id_df = (
+        await database.read_sql(
+            STOCK_ID_SQL, params={}
+        )
+    )
+    for stock_id in stock_id_df[
+        "StockID"
+    ]:
+        await refresh(
+            database,
+            stock_id,
+            rebuild=True,
+        )
+
+
+if __name__ == "__main__":
+    from api.database import (
+        get_database,
+    )
+
+    if sys.argv[1:] == ["rebuild"]:
+        main = rebuild_all(
+            get_database()
+        )
+    else:
+        main = run(
+            get_database(),
+            config.INDICATOR_INTERVAL,
+        )
+    asyncio.get_event_loop().run_until_complete(
+        main
+    )
@@ -1,23 +1,115 @@
-import pandas as pd
-from fastapi import FastAPI
-from sqlalchemy import (
-    create_engine,
-    engine,
+import asyncio
+import os
+import typing
+
+from fastapi import (
+    Depends,
+    FastAPI,
+    Header,
+    HTTPException,
+    Query,
+)
+from fastapi.encoders import (
+    jsonable_encoder,
+)
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+)
+from starlette.concurrency import (
+    run_in_threadpool,
 )
+
 from api import config
+from api.bars import (
+    DAILY_SQL,
+    FREQ_PERIOD,
+    BarStore,
+    filter_bars,
+    get_bar_store,
+)
+from api.cache import (
+    ResponseCache,
+    get_cache,
+    make_key,
+)
+from api.database import (
+    Database,
+    close_database,
+    get_database,
+    # 保留原本的 import 路徑
+    get_mysql_financialdata_conn,
+)
+from api.formats import (
+    ARROW_SCHEMA,
+    check_format,
+    stream_response,
+)
+from api.indicators import (
+    INDICATOR_LIST,
+)
+from api.pagination import (
+    encode_cursor,
+    get_page_sql,
+)
+from api.singleflight import (
+    get_single_flight,
+)
+from api.snapshot import (
+    build_snapshot,
+    get_snapshot,
+)
+from api.version import (
+    get_data_version,
+    get_etag,
+    get_last_modified,
+    is_not_modified,
+)
+
+app = FastAPI()
 
 
-def get_mysql_financialdata_conn() -> engine.base.Connection:
-    address = (
-        f"mysql+pymysql://{config.MYSQL_DATA_USER}:{config.MYSQL_DATA_PASSWORD}"
-        f"@{config.MYSQL_DATA_HOST}:{config.MYSQL_DATA_PORT}/{config.MYSQL_DATA_DATABASE}"
+def load_snapshot(
+    database: Database, path: str
+):
+    """載入快照, 檔案不存在時先從 mysql 建立,
+    快照建立後才寫入的資料, 第一次查詢時合併
+    """
+    if not os.path.exists(path):
+        build_snapshot(database, path)
+    snapshot = get_snapshot()
+    snapshot.load(path)
+    # catch_up 之後才寫入的版本, 由 data_version 第一次讀取時通知
+    get_data_version().publish_version = snapshot.catch_up(
+        database
     )
-    engine = create_engine(address)
-    connect = engine.connect()
-    return connect
 
 
-app = FastAPI()
+@app.on_event("startup")
+async def startup():
+    # 啟動時建立 connection pool
+    database = get_database()
+    if config.SNAPSHOT_PATH:
+        await run_in_threadpool(
+            load_snapshot,
+            database,
+            config.SNAPSHOT_PATH,
+        )
+    # 背景定期讀取 data_version
+    app.state.data_version_task = asyncio.ensure_future(
+        get_data_version().run(
+            database,
+            config.DATA_VERSION_INTERVAL,
+        )
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.data_version_task.cancel()
+    # 關閉時釋放所有連線
+    await close_database()
 
 
 @app.get("/")
@@ -25,25 +117,621 @@ def read_root():
     return {"Hello": "World"}
 
 
+@app.get("/metrics")
+def metrics(
+    cache: ResponseCache = Depends(
+        get_cache
+    ),
+):
+    return PlainTextResponse(
+        cache.render_metrics()
+        + "# TYPE api_singleflight_shared_total counter\n"
+        + f"api_singleflight_shared_total {get_single_flight().shared}\n"
+    )
+
+
+def get_date_range(
+    params: typing.Dict[str, str],
+) -> typing.Tuple[str, str]:
+    """查詢的日期區間, 單日查詢使用 date 參數"""
+    return (
+        params.get(
+            "start_date",
+            params.get("date", ""),
+        ),
+        params.get(
+            "end_date",
+            params.get("date", ""),
+        ),
+    )
+
+
+async def load_json(
+    key: typing.Tuple,
+    dataset: str,
+    sql: str,
+    params: typing.Dict[str, str],
+    database: Database,
+    cache: ResponseCache,
+    group_by: str,
+    page_key_list: typing.List[str],
+) -> bytes:
+    """查詢 mysql, 轉成 json 後放進 cache"""
+    data_df = await database.read_sql(
+        sql, params=params
+    )
+    if group_by:
+        data_dict = {
+            value: df.to_dict("records")
+            for value, df in data_df.groupby(
+                group_by
+            )
+        }
+    else:
+        data_dict = data_df.to_dict(
+            "records"
+        )
+    response_dict = {"data": data_dict}
+    if "limit" in params:
+        # 取滿 limit 筆, 代表可能還有下一頁
+        response_dict["next_cursor"] = (
+            encode_cursor(
+                data_df[page_key_list]
+                .iloc[-1]
+                .tolist()
+            )
+            if len(data_df)
+            == params["limit"]
+            else None
+        )
+    # cache 存放序列化後的結果, 命中時不需要再轉換
+    content = JSONResponse(
+        jsonable_encoder(response_dict)
+    ).body
+    start_date, end_date = (
+        get_date_range(params)
+    )
+    cache.set(
+        key,
+        content,
+        dataset=dataset,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    return content
+
+
+async def query_dataset(
+    dataset: str,
+    sql: str,
+    params: typing.Dict[str, str],
+    format: str,
+    database: Database,
+    cache: ResponseCache,
+    group_by: str = "",
+    page_key_list: typing.List[
+        str
+    ] = None,
+    if_none_match: typing.Optional[
+        str
+    ] = None,
+    load: typing.Optional[
+        typing.Callable[
+            [], typing.Awaitable[bytes]
+        ]
+    ] = None,
+) -> Response:
+    """依照 format 回傳資料,
+    json: 完整查詢後回傳, 結果放進 cache,
+    有 group_by 時, 依照該欄位分組, 回傳 {欄位值: 資料}
+    有分頁時 (params 有 limit), 另外回傳下一頁的 next_cursor
+    ndjson, csv, arrow, parquet: 分批從 server-side cursor 取出, 邊查邊送
+    ETag 依照 dataset 最新的 data version, If-None-Match 相同時回傳 304, 不查詢 mysql
+    有 load 時, json 改由 load 產生, 例如從記憶體快照讀取, 不經過 cache
+    """
+    check_format(format)
+    headers = {}
+    entry = (
+        get_data_version().get_version(
+            dataset
+        )
+    )
+    if entry is not None:
+        etag = get_etag(entry, format)
+        headers["ETag"] = etag
+        last_modified = (
+            get_last_modified(entry)
+        )
+        if last_modified:
+            headers["Last-Modified"] = (
+                last_modified
+            )
+        if is_not_modified(
+            if_none_match, etag
+        ):
+            return Response(
+                status_code=304,
+                headers=headers,
+            )
+    if format != "json":
+        return stream_response(
+            database.stream_sql(
+                sql,
+                params,
+                config.STREAM_BATCH_SIZE,
+            ),
+            format,
+            dataset,
+            headers=headers,
+        )
+    if load is not None:
+        return Response(
+            await load(),
+            media_type="application/json",
+            headers=headers,
+        )
+    # 不同 endpoint 的參數名稱可能相同, key 包含 SQL 本身
+    key = make_key(
+        dataset,
+        sql=" ".join(sql.split()),
+        group_by=group_by,
+        **params,
+    )
+    content = cache.get(key)
+    if content is None:
+        # 相同的查詢同時進來時, 共用同一個 mysql 查詢與序列化結果
+        content = await get_single_flight().do_async(
+            key,
+            load_json,
+            key,
+            dataset,
+            sql,
+            params,
+            database,
+            cache,
+            group_by,
+            page_key_list,
+        )
+    return Response(
+        content,
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+# 分頁依照 primary key 排序
+PRICE_KEY_LIST = ["StockID", "Date"]
+FUTURES_KEY_LIST = [
+    "FuturesID",
+    "ContractDate",
+    "TradingSession",
+    "Date",
+]
+
+
 @app.get("/taiwan_stock_price")
-def taiwan_stock_price(
+async def taiwan_stock_price(
     stock_id: str = "",
     start_date: str = "",
     end_date: str = "",
+    format: str = "json",
+    limit: int = 0,
+    cursor: str = "",
+    if_none_match: typing.Optional[
+        str
+    ] = Header(None),
+    database: Database = Depends(
+        get_database
+    ),
+    cache: ResponseCache = Depends(
+        get_cache
+    ),
+):
+    page_sql, page_params = (
+        get_page_sql(
+            PRICE_KEY_LIST,
+            cursor,
+            limit,
+            format,
+        )
+    )
+    sql = f"""
+    select * from taiwan_stock_price
+    where StockID = :stock_id
+    and Date>= :start_date
+    and Date<= :end_date
+    {page_sql}
+    """
+    snapshot = get_snapshot()
+
+    async def load_snapshot() -> bytes:
+        # 先合併尚未處理的更新, 再從快照切片
+        await snapshot.sync(database)
+        return JSONResponse(
+            {
+                "data": snapshot.query_records(
+                    stock_id,
+                    start_date,
+                    end_date,
+                )
+            }
+        ).body
+
+    return await query_dataset(
+        "taiwan_stock_price",
+        sql,
+        dict(
+            stock_id=stock_id,
+            start_date=start_date,
+            end_date=end_date,
+            **page_params,
+        ),
+        format,
+        database,
+        cache,
+        page_key_list=PRICE_KEY_LIST,
+        if_none_match=if_none_match,
+        # 有快照時, 不分頁的 json 查詢不需要經過 mysql
+        load=(
+            load_snapshot
+            if snapshot.loaded
+            and format == "json"
+            and not limit
+            else None
+        ),
+    )
+
+
+def get_stock_id_list(
+    stock_id: typing.List[str],
+) -> typing.List[str]:
+    """支援 stock_id=2330&stock_id=2317 與 stock_id=2330,2317,
+    去除重複並排序, 相同的股票組合使用同一個 cache key
+    """
+    return sorted(
+        set(
+            sid.strip()
+            for value in stock_id
+            for sid in value.split(",")
+            if sid.strip()
+        )
+    )
+
+
+@app.get("/taiwan_stock_price/batch")
+async def taiwan_stock_price_batch(
+    stock_id: typing.List[str] = Query(
+        []
+    ),
+    all_market: bool = False,
+    start_date: str = "",
+    end_date: str = "",
+    layout: str = "long",
+    format: str = "json",
+    limit: int = 0,
+    cursor: str = "",
+    if_none_match: typing.Optional[
+        str
+    ] = Header(None),
+    database: Database = Depends(
+        get_database
+    ),
+    cache: ResponseCache = Depends(
+        get_cache
+    ),
 ):
+    """一次查詢多檔股票, 或 all_market=true 查詢全市場,
+    layout=long: 所有股票放在同一張表
+    layout=group: 依照 StockID 分組, 只支援 json
+    """
+    stock_id_list = get_stock_id_list(
+        stock_id
+    )
+    if not all_market and (
+        not stock_id_list
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail="stock_id or all_market is required",
+        )
+    if (
+        len(stock_id_list)
+        > config.BATCH_MAX_STOCK_ID
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail=f"at most {config.BATCH_MAX_STOCK_ID} stock_id per request",
+        )
+    if layout not in ["long", "group"]:
+        raise HTTPException(
+            status_code=400,
+            detail="layout must be one of long, group",
+        )
+    if (
+        layout == "group"
+        and format != "json"
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail="layout=group only supports format=json",
+        )
+    page_sql, params = get_page_sql(
+        PRICE_KEY_LIST,
+        cursor,
+        limit,
+        format,
+    )
+    params.update(
+        start_date=start_date,
+        end_date=end_date,
+    )
+    # 全市場查詢不加 StockID 條件, 只靠 Date 做 partition pruning
+    stock_id_sql = ""
+    if not all_market:
+        # 每個股票一個參數, IN (...) 走 (StockID, Date) primary key
+        params.update(
+            {
+                f"stock_id_{i}": sid
+                for i, sid in enumerate(
+                    stock_id_list
+                )
+            }
+        )
+        stock_id_sql = "and StockID in ({})".format(
+            ", ".join(
+                f":stock_id_{i}"
+                for i in range(
+                    len(stock_id_list)
+                )
+            )
+        )
     sql = f"""
     select * from taiwan_stock_price
-    where StockID = '{stock_id}'
-    and Date>= '{start_date}'
-    and Date<= '{end_date}'
+    where Date>= :start_date
+    and Date<= :end_date
+    {stock_id_sql}
+    {page_sql or "order by StockID, Date"}
+    """
+    return await query_dataset(
+        "taiwan_stock_price",
+        sql,
+        params,
+        format,
+        database,
+        cache,
+        group_by=(
+            "StockID"
+            if layout == "group"
+            else ""
+        ),
+        page_key_list=PRICE_KEY_LIST,
+        if_none_match=if_none_match,
+    )
+
+
+@app.get("/taiwan_stock_price/bars")
+async def taiwan_stock_price_bars(
+    stock_id: str = "",
+    freq: str = "W",
+    start_date: str = "",
+    end_date: str = "",
+    database: Database = Depends(
+        get_database
+    ),
+    bar_store: BarStore = Depends(
+        get_bar_store
+    ),
+):
+    """週 (W), 月 (M), 季 (Q) K 線,
+    每個 (股票, 頻率) 保存完整歷史, 有新資料時只重算最後的 K 線
     """
-    mysql_conn = (
-        get_mysql_financialdata_conn()
+    if freq not in FREQ_PERIOD:
+        raise HTTPException(
+            status_code=400,
+            detail=f"freq must be one of {', '.join(FREQ_PERIOD)}",
+        )
+    key = (stock_id, freq)
+
+    async def read_daily(
+        update_date: str,
+    ):
+        return await database.read_sql(
+            DAILY_SQL,
+            params=dict(
+                stock_id=stock_id,
+                start_date=update_date
+                or "1900-01-01",
+            ),
+        )
+
+    bars_df = filter_bars(
+        await bar_store.load(
+            key, read_daily
+        ),
+        start_date,
+        end_date,
     )
-    data_df = pd.read_sql(
-        sql, con=mysql_conn
+    bars_df = bars_df.assign(
+        StartDate=bars_df[
+            "StartDate"
+        ].dt.strftime("%Y-%m-%d"),
+        EndDate=bars_df[
+            "EndDate"
+        ].dt.strftime("%Y-%m-%d"),
     )
-    data_dict = data_df.to_dict(
-        "records"
+    return {
+        "data": bars_df.to_dict(
+            "records"
+        )
+    }
+
+
+@app.get(
+    "/taiwan_stock_price/indicator"
+)
+async def taiwan_stock_price_indicator(
+    stock_id: str = "",
+    start_date: str = "",
+    end_date: str = "",
+    indicator: str = "",
+    database: Database = Depends(
+        get_database
+    ),
+):
+    """預先計算的技術指標, indicator=ma_5,rsi_14, 空字串代表全部指標,
+    由 api/indicators.py 的 job 依照 data_version 計算, 這裡只讀取
+    """
+    indicator_list = [
+        name.strip()
+        for name in indicator.split(",")
+        if name.strip()
+    ] or INDICATOR_LIST
+    for name in indicator_list:
+        if name not in INDICATOR_LIST:
+            raise HTTPException(
+                status_code=400,
+                detail=f"indicator must be one of {', '.join(INDICATOR_LIST)}",
+            )
+    sql = f"""
+    select StockID, Date, {", ".join(indicator_list)}
+    from taiwan_stock_indicator
+    where StockID = :stock_id
+    and Date>= :start_date
+    and Date<= :end_date
+    order by Date
+    """
+    data_df = await database.read_sql(
+        sql,
+        params=dict(
+            stock_id=stock_id,
+            start_date=start_date,
+            end_date=end_date,
+        ),
+    )
+    # 資料不足的日期沒有指標, 回傳 null
+    data_df = data_df.astype(
+        object
+    ).where(data_df.notna(), None)
+    return {
+        "data": data_df.to_dict(
+            "records"
+        )
+    }
+
+
+# 某一天全市場的資料, 走 (Date, StockID, Close) 的 idx_date_stock,
+# 只查詢 StockID, Date, Close 時, 不需要回到 primary key 讀取整筆資料
+CROSS_SECTION_SQL = """
+select {columns} from taiwan_stock_price
+where Date = :date
+order by StockID
+"""
+
+
+def get_column_list(
+    columns: str, dataset: str
+) -> typing.List[str]:
+    """columns=StockID,Close, 只允許 dataset 內的欄位, 空字串代表全部欄位"""
+    name_list = ARROW_SCHEMA[
+        dataset
+    ].names
+    column_list = [
+        column.strip()
+        for column in columns.split(",")
+        if column.strip()
+    ]
+    for column in column_list:
+        if column not in name_list:
+            raise HTTPException(
+                status_code=400,
+                detail=f"unknown column {column}",
+            )
+    return column_list or name_list
+
+
+@app.get(
+    "/taiwan_stock_price/cross_section"
+)
+async def taiwan_stock_price_cross_section(
+    date: str = "",
+    columns: str = "StockID,Date,Close",
+    format: str = "json",
+    if_none_match: typing.Optional[
+        str
+    ] = Header(None),
+    database: Database = Depends(
+        get_database
+    ),
+    cache: ResponseCache = Depends(
+        get_cache
+    ),
+):
+    """某一天所有股票的資料, 例如選股每天需要的全市場收盤價"""
+    column_list = get_column_list(
+        columns, "taiwan_stock_price"
+    )
+    sql = CROSS_SECTION_SQL.format(
+        columns=", ".join(
+            f"`{column}`"
+            for column in column_list
+        )
+    )
+    return await query_dataset(
+        "taiwan_stock_price",
+        sql,
+        dict(date=date),
+        format,
+        database,
+        cache,
+        if_none_match=if_none_match,
+    )
+
+
+@app.get("/taiwan_futures_daily")
+async def taiwan_futures_daily(
+    futures_id: str = "",
+    start_date: str = "",
+    end_date: str = "",
+    format: str = "json",
+    limit: int = 0,
+    cursor: str = "",
+    if_none_match: typing.Optional[
+        str
+    ] = Header(None),
+    database: Database = Depends(
+        get_database
+    ),
+    cache: ResponseCache = Depends(
+        get_cache
+    ),
+):
+    page_sql, page_params = (
+        get_page_sql(
+            FUTURES_KEY_LIST,
+            cursor,
+            limit,
+            format,
+        )
+    )
+    sql = f"""
+    select * from taiwan_futures_daily
+    where FuturesID = :futures_id
+    and Date>= :start_date
+    and Date<= :end_date
+    {page_sql}
+    """
+    return await query_dataset(
+        "taiwan_futures_daily",
+        sql,
+        dict(
+            futures_id=futures_id,
+            start_date=start_date,
+            end_date=end_date,
+            **page_params,
+        ),
+        format,
+        database,
+        cache,
+        page_key_list=FUTURES_KEY_LIST,
+        if_none_match=if_none_match,
     )
-    return {"data": data_dict}
@@ -0,0 +1,135 @@
+import base64
+import datetime
+import json
+import typing
+
+from fastapi import HTTPException
+
+from api import config
+
+
+def to_cursor_value(value):
+    # pandas 讀出的日期可能是 Timestamp, 統一成 yyyy-mm-dd
+    if isinstance(
+        value, datetime.datetime
+    ):
+        value = value.date()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(
+    value_list: typing.List,
+) -> str:
+    """最後一筆資料的 key, 轉成 client 不需要理解的字串"""
+    return base64.urlsafe_b64encode(
+        json.dumps(
+            [
+                to_cursor_value(value)
+                for value in value_list
+            ]
+        ).encode("utf8")
+    ).decode("utf8")
+
+
+def decode_cursor(
+    cursor: str, size: int
+) -> typing.List:
+    try:
+        value_list = json.loads(
+            base64.urlsafe_b64decode(
+                cursor.encode("utf8")
+            )
+        )
+    except ValueError:
+        value_list = None
+    if (
+        not isinstance(value_list, list)
+        or len(value_list) != size
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail="invalid cursor",
+        )
+    return value_list
+
+
+def get_keyset_condition(
+    key_list: typing.List[str],
+) -> str:
+    """(k0, k1) > (c0, c1) 展開成
+    k0 > c0 or (k0 = c0 and k1 > c1),
+    mysql 可以直接在 index 上 seek, 不需要 OFFSET
+    """
+    condition_list = []
+    for i, key in enumerate(key_list):
+        condition_list.append(
+            " and ".join(
+                [
+                    f"{k} = :cursor_{j}"
+                    for j, k in enumerate(
+                        key_list[:i]
+                    )
+                ]
+                + [
+                    f"{key} > :cursor_{i}"
+                ]
+            )
+        )
+    return " or ".join(
+        f"({condition})"
+        for condition in condition_list
+    )
+
+
+def get_page_sql(
+    key_list: typing.List[str],
+    cursor: str,
+    limit: int,
+    format: str,
+) -> typing.Tuple[
+    str, typing.Dict[str, typing.Any]
+]:
+    """keyset pagination, 依照 key_list 排序,
+    從上一頁最後一筆的 key 往後取 limit 筆,
+    回傳 (接在 where 後面的 SQL, 參數), limit=0 代表不分頁
+    """
+    if limit <= 0:
+        if cursor:
+            raise HTTPException(
+                status_code=400,
+                detail="cursor requires limit",
+            )
+        return "", {}
+    if limit > config.PAGE_MAX_LIMIT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"limit must be <= {config.PAGE_MAX_LIMIT}",
+        )
+    if format != "json":
+        raise HTTPException(
+            status_code=400,
+            detail="limit only supports format=json",
+        )
+    params = dict(limit=limit)
+    condition = ""
+    if cursor:
+        params.update(
+            {
+                f"cursor_{i}": value
+                for i, value in enumerate(
+                    decode_cursor(
+                        cursor,
+                        len(key_list),
+                    )
+                )
+            }
+        )
+        condition = f"and ({get_keyset_condition(key_list)})"
+    sql = f"""
+    {condition}
+    order by {", ".join(key_list)}
+    limit :limit
+    """
+    return sql, params
@@ -0,0 +1,144 @@
+import asyncio
+import functools
+import threading
+import typing
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """相同 key 的查詢同時進來時, 只有第一個 (leader) 真的執行,
+    其他的等待 leader 的結果,
+    使用 concurrent.futures.Future, async endpoint 與 threadpool 中的同步函式可以共用
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._future_dict = {}
+        # 等待其他 request 結果的次數
+        self.shared = 0
+
+    def _join(
+        self, key: typing.Hashable
+    ) -> typing.Tuple[Future, bool]:
+        with self._lock:
+            future = (
+                self._future_dict.get(
+                    key
+                )
+            )
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = Future()
+            self._future_dict[key] = (
+                future
+            )
+            return future, True
+
+    def _finish(
+        self,
+        key: typing.Hashable,
+        future: Future,
+        result=None,
+        error: typing.Optional[
+            BaseException
+        ] = None,
+    ):
+        with self._lock:
+            self._future_dict.pop(
+                key, None
+            )
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(
+        self,
+        key: typing.Hashable,
+        func: typing.Callable,
+        *args,
+    ):
+        """同步版本, 給 threadpool 中執行的函式使用"""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = func(*args)
+        except BaseException as e:
+            self._finish(
+                key, future, error=e
+            )
+            raise
+        self._finish(
+            key, future, result=result
+        )
+        return result
+
+    def _finish_task(
+        self,
+        key: typing.Hashable,
+        future: Future,
+        task: asyncio.Future,
+    ):
+        if task.cancelled():
+            with self._lock:
+                self._future_dict.pop(
+                    key, None
+                )
+            future.cancel()
+        elif (
+            task.exception() is not None
+        ):
+            self._finish(
+                key,
+                future,
+                error=task.exception(),
+            )
+        else:
+            self._finish(
+                key,
+                future,
+                result=task.result(),
+            )
+
+    async def do_async(
+        self,
+        key: typing.Hashable,
+        func: typing.Callable[
+            ..., typing.Awaitable
+        ],
+        *args,
+    ):
+        """async 版本, func 為 coroutine function,
+        在獨立的 task 執行, 任一個呼叫被取消 (例如 client 斷線) 時,
+        查詢繼續執行, 其他等待相同 key 的呼叫仍可拿到結果
+        """
+        future, leader = self._join(key)
+        if leader:
+            task = (
+                asyncio.ensure_future(
+                    func(*args)
+                )
+            )
+            task.add_done_callback(
+                functools.partial(
+                    self._finish_task,
+                    key,
+                    future,
+                )
+            )
+        # 取消時只取消自己的等待, 不會取消共用的 future
+        return await asyncio.shield(
+            asyncio.wrap_future(future)
+        )
+
+
+_single_flight = None
+
+
+def get_single_flight() -> SingleFlight:
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
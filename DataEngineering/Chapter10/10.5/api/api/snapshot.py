@@ -0,0 +1,480 @@
+"""
+taiwan_stock_price 的記憶體快照, 依照 (StockID, Date) 排序的 arrow 檔案,
+啟動時讀入並轉成 numpy 陣列 (會複製一份在記憶體), 每檔股票記錄在陣列中的起訖位置,
+查詢單一股票時, 用二分搜尋找出日期區間, 直接切片, 不需要查詢 mysql,
+mysql 仍然是資料來源, 收到 taiwan_stock_price 更新通知後, 只讀取更新的日期區間合併
+
+建立快照檔案:
+    pipenv run python api/snapshot.py taiwan_stock_price.arrow
+"""
+
+import asyncio
+import datetime
+import sys
+import threading
+import typing
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from api.cache import (
+    InvalidationChannel,
+    get_invalidation_channel,
+)
+
+# 快照的欄位, 浮點數使用 float64, 與 mysql 讀出的數值一致
+SNAPSHOT_SCHEMA = pa.schema(
+    [
+        ("StockID", pa.string()),
+        ("TradeVolume", pa.int64()),
+        ("Transaction", pa.int64()),
+        ("TradeValue", pa.int64()),
+        ("Open", pa.float64()),
+        ("Max", pa.float64()),
+        ("Min", pa.float64()),
+        ("Close", pa.float64()),
+        ("Change", pa.float64()),
+        ("Date", pa.date32()),
+    ]
+)
+VALUE_COLUMN_LIST = [
+    name
+    for name in SNAPSHOT_SCHEMA.names
+    if name != "StockID"
+]
+
+SNAPSHOT_SQL = """
+select * from taiwan_stock_price
+order by StockID, Date
+"""
+VERSION_SQL = """
+select coalesce(max(version), 0) as version
+from data_version
+"""
+NEW_VERSION_SQL = """
+select version, start_date, end_date from data_version
+where dataset = 'taiwan_stock_price'
+and version > :version
+"""
+DELTA_SQL = """
+select * from taiwan_stock_price
+where Date>= :start_date
+and Date<= :end_date
+"""
+
+
+def to_snapshot_table(
+    columns: typing.List[str],
+    rows: typing.List,
+) -> pa.Table:
+    df = pd.DataFrame(
+        rows, columns=columns
+    )
+    df["Date"] = pd.to_datetime(
+        df["Date"]
+    ).dt.date
+    return pa.Table.from_pandas(
+        df[SNAPSHOT_SCHEMA.names],
+        schema=SNAPSHOT_SCHEMA,
+        preserve_index=False,
+    )
+
+
+def build_snapshot(
+    database,
+    path: str,
+    batch_size: int = 100000,
+):
+    """從 mysql 依照 (StockID, Date) 讀出全部資料, 寫成 arrow 檔案,
+    讀取前的 data version 記錄在 schema metadata, 之後的更新在載入後合併
+    """
+    version = database.read_sql_sync(
+        VERSION_SQL, {}
+    )["version"].iloc[0]
+    schema = (
+        SNAPSHOT_SCHEMA.with_metadata(
+            {
+                "data_version": str(
+                    version
+                )
+            }
+        )
+    )
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(
+            sink, schema
+        ) as writer:
+            for (
+                columns,
+                rows,
+            ) in database.stream_sql_sync(
+                SNAPSHOT_SQL,
+                {},
+                batch_size,
+            ):
+                if rows:
+                    writer.write_table(
+                        to_snapshot_table(
+                            columns,
+                            rows,
+                        ).replace_schema_metadata(
+                            schema.metadata
+                        )
+                    )
+
+
+def split_by_stock(
+    table: pa.Table,
+) -> typing.Dict[
+    str, typing.Dict[str, np.ndarray]
+]:
+    """依照 StockID 切開, 每檔股票的欄位為原本陣列的切片, 不會複製資料"""
+    table = table.combine_chunks()
+    stock_id_array = table.column(
+        "StockID"
+    ).to_numpy()
+    if len(stock_id_array) == 0:
+        return {}
+    column_dict = {
+        name: table.column(
+            name
+        ).to_numpy()
+        for name in VALUE_COLUMN_LIST
+    }
+    # 每檔股票的起始位置
+    offset_array = np.concatenate(
+        [
+            [0],
+            np.flatnonzero(
+                stock_id_array[1:]
+                != stock_id_array[:-1]
+            )
+            + 1,
+            [len(stock_id_array)],
+        ]
+    )
+    return {
+        stock_id_array[start]: {
+            name: array[start:end]
+            for name, array in column_dict.items()
+        }
+        for start, end in zip(
+            offset_array[:-1],
+            offset_array[1:],
+        )
+    }
+
+
+def merge_stock(
+    old: typing.Optional[
+        typing.Dict[str, np.ndarray]
+    ],
+    new: typing.Dict[str, np.ndarray],
+) -> typing.Dict[str, np.ndarray]:
+    """合併同一檔股票的新舊資料, 相同日期以新資料為準, 依照日期排序"""
+    if old is None:
+        merged = new
+    else:
+        merged = {
+            name: np.concatenate(
+                [old[name], new[name]]
+            )
+            for name in VALUE_COLUMN_LIST
+        }
+    # 反轉後 unique, 取到的是最後出現 (新資料) 的位置
+    date_array = merged["Date"][::-1]
+    _, index = np.unique(
+        date_array, return_index=True
+    )
+    index = len(date_array) - 1 - index
+    return {
+        name: array[index]
+        for name, array in merged.items()
+    }
+
+
+def to_date64(
+    date: str,
+) -> np.datetime64:
+    return np.datetime64(
+        datetime.datetime.strptime(
+            date.strip(), "%Y-%m-%d"
+        ).date(),
+        "D",
+    )
+
+
+class PriceSnapshot:
+    def __init__(
+        self,
+        channel: typing.Optional[
+            InvalidationChannel
+        ] = None,
+    ):
+        self._stock_dict = {}
+        # 尚未合併的更新日期區間
+        self._pending_list = []
+        self._lock = threading.Lock()
+        # 同時只有一個 sync, 其他請求等待合併完成才讀取快照,
+        # 在第一次 sync 時建立, 綁定執行中的 event loop
+        self._sync_lock = None
+        self.loaded = False
+        # 快照建立時的 data version
+        self.version = 0
+        if channel is not None:
+            channel.subscribe(
+                self.invalidate
+            )
+
+    def load_table(
+        self, table: pa.Table
+    ):
+        self._stock_dict = (
+            split_by_stock(table)
+        )
+        self.loaded = True
+
+    def load(self, path: str):
+        """以 memory map 開啟檔案讀取, 轉成 numpy 陣列時會複製,
+        載入後整份快照常駐記憶體, 不依賴檔案
+        """
+        source = pa.memory_map(
+            path, "r"
+        )
+        table = pa.ipc.open_file(
+            source
+        ).read_all()
+        metadata = (
+            table.schema.metadata or {}
+        )
+        self.version = int(
+            metadata.get(
+                b"data_version", b"0"
+            )
+        )
+        self.load_table(table)
+
+    def catch_up(self, database) -> int:
+        """快照建立之後的更新, 加入待合併的日期區間,
+        回傳讀取到的最新版本, 之後的版本由 DataVersion 第一次讀取時通知
+        """
+        data_df = (
+            database.read_sql_sync(
+                NEW_VERSION_SQL,
+                dict(
+                    version=self.version
+                ),
+            )
+        )
+        last_version = self.version
+        for row in data_df.itertuples(
+            index=False
+        ):
+            self.invalidate(
+                "taiwan_stock_price",
+                str(row.start_date),
+                str(row.end_date),
+            )
+            last_version = max(
+                last_version,
+                int(row.version),
+            )
+        return last_version
+
+    def invalidate(
+        self,
+        dataset: str,
+        start_date: str = "",
+        end_date: str = "",
+    ):
+        if (
+            dataset
+            != "taiwan_stock_price"
+        ):
+            return
+        with self._lock:
+            self._pending_list.append(
+                (
+                    start_date
+                    or "1900-01-01",
+                    end_date
+                    or "9999-12-31",
+                )
+            )
+
+    def apply(self, table: pa.Table):
+        """合併新資料, 只替換有更新的股票"""
+        for (
+            stock_id,
+            new,
+        ) in split_by_stock(
+            table.take(
+                pc.sort_indices(
+                    table,
+                    sort_keys=[
+                        (
+                            "StockID",
+                            "ascending",
+                        ),
+                        (
+                            "Date",
+                            "ascending",
+                        ),
+                    ],
+                )
+            )
+        ).items():
+            self._stock_dict[
+                stock_id
+            ] = merge_stock(
+                self._stock_dict.get(
+                    stock_id
+                ),
+                new,
+            )
+
+    async def sync(self, database):
+        """從 mysql 讀取尚未合併的日期區間, 合併成功後才移除,
+        讀取失敗時區間保留在 _pending_list, 下一次 sync 重試
+        """
+        if self._sync_lock is None:
+            self._sync_lock = (
+                asyncio.Lock()
+            )
+        async with self._sync_lock:
+            while True:
+                with self._lock:
+                    if (
+                        not self._pending_list
+                    ):
+                        return
+                    (
+                        start_date,
+                        end_date,
+                    ) = self._pending_list[
+                        0
+                    ]
+                data_df = await database.read_sql(
+                    DELTA_SQL,
+                    params=dict(
+                        start_date=start_date,
+                        end_date=end_date,
+                    ),
+                )
+                if len(data_df) > 0:
+                    self.apply(
+                        to_snapshot_table(
+                            list(
+                                data_df.columns
+                            ),
+                            data_df.values.tolist(),
+                        )
+                    )
+                # invalidate 只會加在最後, 第一個即為剛合併的區間
+                with self._lock:
+                    self._pending_list.pop(
+                        0
+                    )
+
+    def query(
+        self,
+        stock_id: str,
+        start_date: str = "",
+        end_date: str = "",
+    ) -> typing.Dict[str, np.ndarray]:
+        """二分搜尋日期區間, 回傳各欄位的切片"""
+        stock = self._stock_dict.get(
+            stock_id
+        )
+        if stock is None:
+            return {
+                name: np.array([])
+                for name in SNAPSHOT_SCHEMA.names
+            }
+        date_array = stock["Date"]
+        start = (
+            np.searchsorted(
+                date_array,
+                to_date64(start_date),
+                "left",
+            )
+            if start_date
+            else 0
+        )
+        end = (
+            np.searchsorted(
+                date_array,
+                to_date64(end_date),
+                "right",
+            )
+            if end_date
+            else len(date_array)
+        )
+        result = {
+            name: array[start:end]
+            for name, array in stock.items()
+        }
+        result["StockID"] = np.full(
+            end - start, stock_id
+        )
+        return result
+
+    def query_records(
+        self,
+        stock_id: str,
+        start_date: str = "",
+        end_date: str = "",
+    ) -> typing.List[
+        typing.Dict[str, typing.Any]
+    ]:
+        """與 mysql 查詢相同的 json 格式"""
+        result = self.query(
+            stock_id,
+            start_date,
+            end_date,
+        )
+        result["Date"] = (
+            np.datetime_as_string(
+                result["Date"].astype(
+                    "datetime64[D]"
+                )
+            )
+        )
+        value_list = [
+            result[name].tolist()
+            for name in SNAPSHOT_SCHEMA.names
+        ]
+        return [
+            dict(
+                zip(
+                    SNAPSHOT_SCHEMA.names,
+                    row,
+                )
+            )
+            for row in zip(*value_list)
+        ]
+
+
+_snapshot = None
+
+
+def get_snapshot() -> PriceSnapshot:
+    """整個進程共用"""
+    global _snapshot
+    if _snapshot is None:
+        _snapshot = PriceSnapshot(
+            channel=get_invalidation_channel()
+        )
+    return _snapshot
+
+
+if __name__ == "__main__":
+    from api.database import (
+        get_database,
+    )
+
+    build_snapshot(
+        get_database(), sys.argv[1]
+    )
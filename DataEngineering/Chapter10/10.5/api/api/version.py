@@ -0,0 +1,198 @@
+import asyncio
+import email.utils
+import threading
+import typing
+
+import pandas as pd
+from loguru import logger
+
+from api.cache import (
+    InvalidationChannel,
+    get_invalidation_channel,
+)
+
+# update_time 為 mysql DATETIME, 沒有時區, 由 mysql 依照 session 的時區轉成 unix timestamp
+VERSION_SQL = """
+select version, dataset, start_date, end_date,
+unix_timestamp(update_time) as update_timestamp
+from data_version
+where version > :last_version
+order by version
+"""
+
+
+class VersionEntry:
+    def __init__(
+        self,
+        version: int,
+        update_timestamp: typing.Optional[
+            float
+        ],
+    ):
+        self.version = version
+        self.update_timestamp = (
+            update_timestamp
+        )
+
+
+class DataVersion:
+    """保存每個 dataset 最新的 data_version, 定期讀取新的版本,
+    查詢某個 dataset 的版本時, 不需要查詢 mysql,
+    新的版本同時透過 channel 通知 cache 失效, 讓多個 api 進程的 cache 一致
+    """
+
+    def __init__(
+        self,
+        channel: typing.Optional[
+            InvalidationChannel
+        ] = None,
+    ):
+        self.channel = channel
+        self.last_version = 0
+        # 成功讀取過 data_version, 才能產生 ETag
+        self.loaded = False
+        # 第一次讀取時, 只通知這個版本之後的更新,
+        # 例如快照 catch_up 之後才寫入的版本, None 代表都不通知
+        self.publish_version = None
+        # 每個 dataset 只保留最新的版本, 大小固定
+        self._entry_dict = {}
+        self._lock = threading.Lock()
+
+    async def refresh(self, database):
+        data_df = await database.read_sql(
+            VERSION_SQL,
+            params=dict(
+                last_version=self.last_version
+            ),
+        )
+        with self._lock:
+            # version 遞增, 後面的覆蓋前面的
+            for (
+                row
+            ) in data_df.itertuples(
+                index=False
+            ):
+                self._entry_dict[
+                    row.dataset
+                ] = VersionEntry(
+                    int(row.version),
+                    (
+                        None
+                        if pd.isna(
+                            row.update_timestamp
+                        )
+                        else float(
+                            row.update_timestamp
+                        )
+                    ),
+                )
+                self.last_version = max(
+                    self.last_version,
+                    int(row.version),
+                )
+            # 第一次讀取是既有的資料, 不需要通知
+            if self.loaded:
+                publish_df = data_df
+            elif (
+                self.publish_version
+                is not None
+            ):
+                publish_df = data_df[
+                    data_df["version"]
+                    > self.publish_version
+                ]
+            else:
+                publish_df = (
+                    data_df.iloc[:0]
+                )
+            self.loaded = True
+        if self.channel:
+            for (
+                row
+            ) in publish_df.itertuples(
+                index=False
+            ):
+                self.channel.publish(
+                    row.dataset,
+                    str(row.start_date),
+                    str(row.end_date),
+                )
+
+    def get_version(
+        self, dataset: str
+    ) -> typing.Optional[VersionEntry]:
+        """dataset 最新的版本, 任何日期有更新, 版本都會改變,
+        沒有讀取過 data_version 時回傳 None
+        """
+        if not self.loaded:
+            return None
+        with self._lock:
+            return self._entry_dict.get(
+                dataset,
+                VersionEntry(0, None),
+            )
+
+    async def run(
+        self,
+        database,
+        interval: float,
+    ):
+        """背景執行, 每 interval 秒讀取一次新的版本"""
+        while True:
+            try:
+                await self.refresh(
+                    database
+                )
+            except Exception as e:
+                logger.info(e)
+            await asyncio.sleep(
+                interval
+            )
+
+
+def get_etag(
+    entry: VersionEntry, format: str
+) -> str:
+    return (
+        f'"v{entry.version}-{format}"'
+    )
+
+
+def get_last_modified(
+    entry: VersionEntry,
+) -> typing.Optional[str]:
+    if entry.update_timestamp is None:
+        return None
+    return email.utils.formatdate(
+        entry.update_timestamp,
+        usegmt=True,
+    )
+
+
+def is_not_modified(
+    if_none_match: typing.Optional[str],
+    etag: str,
+) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [
+        tag.strip()
+        for tag in if_none_match.split(
+            ","
+        )
+    ]
+
+
+_data_version = None
+
+
+def get_data_version() -> DataVersion:
+    """整個進程共用"""
+    global _data_version
+    if _data_version is None:
+        _data_version = DataVersion(
+            channel=get_invalidation_channel()
+        )
+    return _data_version
@@ -0,0 +1,130 @@
+"""
+api 壓力測試, 比較不同版本 api 的延遲與吞吐量, 例如
+
+    # 1. 原本每個 request 建立 engine 的版本 (git stash 或切到舊版)
+    # 2. 共用 connection pool, MYSQL_ASYNC=0
+    # 3. 共用 connection pool + aiomysql, MYSQL_ASYNC=1
+    pipenv run uvicorn api.main:app --port 8888 --workers 1
+    pipenv run python load_test.py http://127.0.0.1:8888 20 2000
+
+參數: url, 同時發送的數量 concurrency, 總 request 數, endpoint (預設 taiwan_stock_price)
+
+比較 idx_date_stock 加入前後, 某一天全市場查詢的差異
+
+    pipenv run python load_test.py http://127.0.0.1:8888 20 500 taiwan_stock_price/cross_section
+"""
+
+import sys
+import time
+import typing
+from concurrent.futures import (
+    ThreadPoolExecutor,
+)
+
+import requests
+
+# 各 endpoint 壓測使用的參數
+ENDPOINT_PARAMS = {
+    "taiwan_stock_price": dict(
+        stock_id="2330",
+        start_date="2021-04-01",
+        end_date="2021-04-30",
+    ),
+    "taiwan_stock_price/cross_section": dict(
+        date="2021-04-01",
+    ),
+}
+
+
+def send_request(
+    session: requests.Session,
+    url: str,
+    endpoint: str = "taiwan_stock_price",
+) -> float:
+    start = time.perf_counter()
+    resp = session.get(
+        f"{url}/{endpoint}",
+        params=ENDPOINT_PARAMS[
+            endpoint
+        ],
+    )
+    resp.raise_for_status()
+    return time.perf_counter() - start
+
+
+def percentile(
+    latency_list: typing.List[float],
+    percent: float,
+) -> float:
+    index = min(
+        int(
+            len(latency_list) * percent
+        ),
+        len(latency_list) - 1,
+    )
+    return latency_list[index]
+
+
+def load_test(
+    url: str,
+    concurrency: int,
+    total: int,
+    endpoint: str = "taiwan_stock_price",
+) -> typing.Dict[str, float]:
+    session = requests.Session()
+    adapter = (
+        requests.adapters.HTTPAdapter(
+            pool_maxsize=concurrency
+        )
+    )
+    session.mount("http://", adapter)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(
+        max_workers=concurrency
+    ) as executor:
+        latency_list = sorted(
+            executor.map(
+                lambda _: send_request(
+                    session,
+                    url,
+                    endpoint,
+                ),
+                range(total),
+            )
+        )
+    elapsed = (
+        time.perf_counter() - start
+    )
+    return dict(
+        rps=total / elapsed,
+        p50_ms=percentile(
+            latency_list, 0.5
+        )
+        * 1000,
+        p95_ms=percentile(
+            latency_list, 0.95
+        )
+        * 1000,
+        p99_ms=percentile(
+            latency_list, 0.99
+        )
+        * 1000,
+    )
+
+
+if __name__ == "__main__":
+    url, concurrency, total = sys.argv[
+        1:4
+    ]
+    result = load_test(
+        url,
+        int(concurrency),
+        int(total),
+        *sys.argv[4:],
+    )
+    print(
+        " ".join(
+            f"{key}={value:.1f}"
+            for key, value in result.items()
+        )
+    )
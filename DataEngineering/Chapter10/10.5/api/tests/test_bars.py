@@ -0,0 +1,313 @@
+import asyncio
+
+import pandas as pd
+from fastapi.testclient import (
+    TestClient,
+)
+
+from api import bars, cache, database
+from api.main import app
+
+
+def create_daily_df(
+    date_list,
+) -> pd.DataFrame:
+    return pd.DataFrame(
+        [
+            dict(
+                Date=date,
+                Open=10.0 + i,
+                Max=12.0 + i,
+                Min=9.0 + i,
+                Close=11.0 + i,
+                TradeVolume=100,
+                TradeValue=1000,
+                Transaction=10,
+            )
+            for i, date in enumerate(
+                date_list
+            )
+        ]
+    )
+
+
+class FakeDatabase:
+    """依照 start_date 回傳日 K, 記錄每次讀取的起始日期"""
+
+    def __init__(self, daily_df):
+        self.daily_df = daily_df
+        self.start_date_list = []
+
+    async def read_sql(
+        self, sql, params
+    ):
+        self.start_date_list.append(
+            params["start_date"]
+        )
+        return self.daily_df[
+            self.daily_df["Date"]
+            >= params["start_date"]
+        ]
+
+
+def test_resample_bars():
+    """
+    測試週 K, 開盤取第一天, 收盤取最後一天, 最高, 最低取極值, 成交量加總
+    """
+    bars_df = bars.resample_bars(
+        create_daily_df(
+            [
+                "2021-04-01",
+                "2021-04-02",
+                "2021-04-06",
+            ]
+        ),
+        "W",
+    )
+    assert bars_df["Open"].tolist() == [
+        10.0,
+        12.0,
+    ]
+    assert bars_df[
+        "Close"
+    ].tolist() == [12.0, 13.0]
+    assert bars_df["Max"].tolist() == [
+        13.0,
+        14.0,
+    ]
+    assert bars_df[
+        "TradeVolume"
+    ].tolist() == [200, 100]
+    assert bars_df[
+        "EndDate"
+    ].dt.strftime(
+        "%Y-%m-%d"
+    ).tolist() == [
+        "2021-04-02",
+        "2021-04-06",
+    ]
+
+
+def test_bars_incremental():
+    """
+    測試收到新資料的通知後, 只從最後一根 K 線所在週期開始重新讀取
+    """
+    fake_database = FakeDatabase(
+        create_daily_df(
+            [
+                "2021-03-31",
+                "2021-04-01",
+                "2021-04-06",
+            ]
+        )
+    )
+    channel = (
+        cache.LocalInvalidationChannel()
+    )
+    bar_store = bars.BarStore(
+        max_entries=10, channel=channel
+    )
+    app.dependency_overrides[
+        database.get_database
+    ] = lambda: fake_database
+    app.dependency_overrides[
+        bars.get_bar_store
+    ] = lambda: bar_store
+    client = TestClient(app)
+    params = dict(
+        stock_id="2330", freq="M"
+    )
+    try:
+        response = client.get(
+            "/taiwan_stock_price/bars",
+            params=params,
+        )
+        assert [
+            row["Close"]
+            for row in response.json()[
+                "data"
+            ]
+        ] == [11.0, 13.0]
+        # 沒有新資料, 不會再讀取
+        client.get(
+            "/taiwan_stock_price/bars",
+            params=params,
+        )
+        fake_database.daily_df = (
+            create_daily_df(
+                [
+                    "2021-03-31",
+                    "2021-04-01",
+                    "2021-04-06",
+                    "2021-04-07",
+                ]
+            )
+        )
+        channel.publish(
+            "taiwan_stock_price",
+            "2021-04-07",
+            "2021-04-07",
+        )
+        response = client.get(
+            "/taiwan_stock_price/bars",
+            params=dict(
+                start_date="2021-04-01",
+                **params,
+            ),
+        )
+    finally:
+        app.dependency_overrides = {}
+    assert (
+        fake_database.start_date_list
+        == [
+            "1900-01-01",
+            "2021-04-01",
+        ]
+    )
+    assert response.json()["data"] == [
+        dict(
+            StartDate="2021-04-01",
+            EndDate="2021-04-07",
+            Open=11.0,
+            Max=15.0,
+            Min=10.0,
+            Close=14.0,
+            TradeVolume=300,
+            TradeValue=3000,
+            Transaction=30,
+        )
+    ]
+
+
+def test_bars_invalid_freq():
+    response = TestClient(app).get(
+        "/taiwan_stock_price/bars",
+        params=dict(
+            stock_id="2330", freq="D"
+        ),
+    )
+    assert response.status_code == 400
+
+
+def load(bar_store, key, read_daily):
+    return asyncio.new_event_loop().run_until_complete(
+        bar_store.load(key, read_daily)
+    )
+
+
+def test_bars_invalidate_during_read():
+    """
+    測試讀取日 K 期間收到通知, 不會清掉 dirty_date, 下次重新讀取
+    """
+    daily_df = create_daily_df(
+        [
+            "2021-03-31",
+            "2021-04-01",
+            "2021-04-06",
+        ]
+    )
+    bar_store = bars.BarStore(
+        max_entries=10
+    )
+    key = ("2330", "M")
+    start_date_list = []
+
+    async def read_daily(start_date):
+        start_date_list.append(
+            start_date
+        )
+        return daily_df
+
+    async def read_daily_notified(
+        start_date,
+    ):
+        start_date_list.append(
+            start_date
+        )
+        # 讀取完成後, 寫入前收到新資料的通知
+        bar_store.invalidate(
+            "taiwan_stock_price",
+            "2021-04-07",
+            "2021-04-07",
+        )
+        return daily_df
+
+    load(bar_store, key, read_daily)
+    bar_store.invalidate(
+        "taiwan_stock_price",
+        "2021-04-06",
+        "2021-04-06",
+    )
+    load(
+        bar_store,
+        key,
+        read_daily_notified,
+    )
+    load(bar_store, key, read_daily)
+    load(bar_store, key, read_daily)
+    assert start_date_list == [
+        "",
+        "2021-04-01",
+        "2021-04-01",
+    ]
+
+
+def test_bars_evicted_during_read():
+    """
+    測試讀取日 K 期間被淘汰, 改為從頭讀取, 回傳完整的 K 線
+    """
+    daily_df = create_daily_df(
+        [
+            "2021-03-31",
+            "2021-04-01",
+            "2021-04-06",
+        ]
+    )
+    bar_store = bars.BarStore(
+        max_entries=1
+    )
+    key = ("2330", "M")
+    start_date_list = []
+
+    async def read_daily(start_date):
+        start_date_list.append(
+            start_date
+        )
+        if start_date:
+            # 其他股票的查詢淘汰了這個 entry
+            bar_store.update(
+                ("2303", "M"),
+                "",
+                daily_df,
+                bar_store.get_update_date(
+                    ("2303", "M")
+                )[
+                    1
+                ],
+            )
+        return daily_df[
+            daily_df["Date"]
+            >= (
+                start_date
+                or "1900-01-01"
+            )
+        ]
+
+    load(bar_store, key, read_daily)
+    bar_store.invalidate(
+        "taiwan_stock_price",
+        "2021-04-06",
+        "2021-04-06",
+    )
+    bars_df = load(
+        bar_store, key, read_daily
+    )
+    assert start_date_list == [
+        "",
+        "2021-04-01",
+        "",
+    ]
+    assert list(bars_df["Close"]) == [
+        11.0,
+        13.0,
+    ]
@@ -0,0 +1,160 @@
+import pandas as pd
+from fastapi.testclient import (
+    TestClient,
+)
+
+from api import cache, config, database
+from api.main import (
+    app,
+    get_stock_id_list,
+)
+
+
+class FakeDatabase:
+    """替換資料庫, 記錄 api 送出的 SQL 與參數"""
+
+    def __init__(self):
+        self.sql_list = []
+        self.params_list = []
+
+    async def read_sql(
+        self, sql, params
+    ):
+        self.sql_list.append(sql)
+        self.params_list.append(params)
+        return pd.DataFrame(
+            [
+                {
+                    "StockID": "2317",
+                    "Close": 112.0,
+                    "Date": "2021-04-01",
+                },
+                {
+                    "StockID": "2330",
+                    "Close": 602.0,
+                    "Date": "2021-04-01",
+                },
+            ]
+        )
+
+
+def get_batch(fake_database, **params):
+    app.dependency_overrides[
+        database.get_database
+    ] = lambda: fake_database
+    app.dependency_overrides[
+        cache.get_cache
+    ] = lambda: cache.ResponseCache(
+        max_bytes=1024 * 1024, ttl=60
+    )
+    try:
+        return TestClient(app).get(
+            "/taiwan_stock_price/batch",
+            params=dict(
+                start_date="2021-04-01",
+                end_date="2021-04-01",
+                **params,
+            ),
+        )
+    finally:
+        app.dependency_overrides = {}
+
+
+def test_get_stock_id_list():
+    assert get_stock_id_list(
+        ["2330,2317", " 2330", ""]
+    ) == ["2317", "2330"]
+
+
+def test_batch_long():
+    """
+    測試多檔股票合併成一個 IN (...) 查詢, 每個股票一個參數
+    """
+    fake_database = FakeDatabase()
+    response = get_batch(
+        fake_database,
+        stock_id=["2330", "2317"],
+    )
+    assert response.status_code == 200
+    assert (
+        len(response.json()["data"])
+        == 2
+    )
+    assert (
+        fake_database.params_list
+        == [
+            dict(
+                start_date="2021-04-01",
+                end_date="2021-04-01",
+                stock_id_0="2317",
+                stock_id_1="2330",
+            )
+        ]
+    )
+    assert (
+        "StockID in (:stock_id_0, :stock_id_1)"
+        in fake_database.sql_list[0]
+    )
+
+
+def test_batch_group():
+    """
+    測試 layout=group, 依照 StockID 分組回傳
+    """
+    response = get_batch(
+        FakeDatabase(),
+        stock_id="2330,2317",
+        layout="group",
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "data": {
+            "2317": [
+                {
+                    "StockID": "2317",
+                    "Close": 112.0,
+                    "Date": "2021-04-01",
+                }
+            ],
+            "2330": [
+                {
+                    "StockID": "2330",
+                    "Close": 602.0,
+                    "Date": "2021-04-01",
+                }
+            ],
+        }
+    }
+
+
+def test_batch_all_market():
+    """
+    測試全市場查詢, 不加 StockID 條件
+    """
+    fake_database = FakeDatabase()
+    response = get_batch(
+        fake_database, all_market="true"
+    )
+    assert response.status_code == 200
+    assert (
+        "StockID in"
+        not in fake_database.sql_list[0]
+    )
+
+
+def test_batch_limit(mocker):
+    """
+    測試超過股票數量上限, 或沒有指定股票時, 回傳 400
+    """
+    mocker.patch.object(
+        config, "BATCH_MAX_STOCK_ID", 1
+    )
+    fake_database = FakeDatabase()
+    response = get_batch(
+        fake_database,
+        stock_id=["2330", "2317"],
+    )
+    assert response.status_code == 400
+    response = get_batch(fake_database)
+    assert response.status_code == 400
+    assert fake_database.sql_list == []
@@ -0,0 +1,241 @@
+import pandas as pd
+from fastapi.testclient import (
+    TestClient,
+)
+
+from api import cache, database
+from api.main import app
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_make_key():
+    """
+    測試日期格式不同, 參數順序不同, 視為同一個 key
+    """
+    assert cache.make_key(
+        "taiwan_stock_price",
+        stock_id=" 2330",
+        start_date="2021-4-1",
+        end_date="2021-04-30",
+    ) == cache.make_key(
+        "taiwan_stock_price",
+        end_date="2021-04-30",
+        start_date="2021-04-01",
+        stock_id="2330",
+    )
+
+
+def test_ttl():
+    """
+    測試超過 ttl 秒, 視為過期
+    """
+    timer = FakeTimer()
+    response_cache = (
+        cache.ResponseCache(
+            max_bytes=10000,
+            ttl=60,
+            timer=timer,
+        )
+    )
+    response_cache.set(
+        ("a",),
+        b"data",
+        "taiwan_stock_price",
+    )
+    timer.now = 59
+    assert (
+        response_cache.get(("a",))
+        == b"data"
+    )
+    timer.now = 61
+    assert (
+        response_cache.get(("a",))
+        is None
+    )
+    assert response_cache.hits == 1
+    assert response_cache.misses == 1
+    assert len(response_cache) == 0
+
+
+def test_lru():
+    """
+    測試超過記憶體上限, 淘汰最久沒使用的資料
+    """
+    response_cache = (
+        cache.ResponseCache(
+            max_bytes=3 * (100 + 200),
+            ttl=60,
+        )
+    )
+    for key in ["a", "b", "c"]:
+        response_cache.set(
+            (key,),
+            b"x" * 100,
+            "taiwan_stock_price",
+        )
+    # 使用 a, b 變成最久沒使用
+    response_cache.get(("a",))
+    response_cache.set(
+        ("d",),
+        b"x" * 100,
+        "taiwan_stock_price",
+    )
+    assert (
+        response_cache.get(("b",))
+        is None
+    )
+    assert response_cache.get(("a",))
+    assert response_cache.evictions == 1
+    assert (
+        response_cache.size == 3 * 300
+    )
+
+
+def test_invalidate():
+    """
+    測試 upload_data 寫入 2021-04-12, 只刪除日期區間重疊的 cache
+    """
+    channel = (
+        cache.LocalInvalidationChannel()
+    )
+    response_cache = (
+        cache.ResponseCache(
+            max_bytes=10000,
+            ttl=60,
+            channel=channel,
+        )
+    )
+    for key, start_date, end_date in [
+        (
+            "a",
+            "2021-04-01",
+            "2021-04-30",
+        ),
+        (
+            "b",
+            "2021-03-01",
+            "2021-03-31",
+        ),
+        ("c", "2021-04-12", ""),
+    ]:
+        response_cache.set(
+            (key,),
+            b"data",
+            "taiwan_stock_price",
+            start_date,
+            end_date,
+        )
+    response_cache.set(
+        ("d",),
+        b"data",
+        "taiwan_futures_daily",
+        "2021-04-01",
+        "2021-04-30",
+    )
+    channel.publish(
+        "taiwan_stock_price",
+        "2021-04-12",
+        "2021-04-12",
+    )
+    assert (
+        response_cache.get(("a",))
+        is None
+    )
+    assert response_cache.get(("b",))
+    assert (
+        response_cache.get(("c",))
+        is None
+    )
+    assert response_cache.get(("d",))
+    assert (
+        response_cache.invalidations
+        == 2
+    )
+
+
+def test_taiwan_stock_price_cache():
+    """
+    測試相同參數第二次查詢, 直接使用 cache, 不再查詢資料庫,
+    並且從 /metrics 看到命中次數
+    """
+
+    class CountDatabase:
+        count = 0
+
+        async def read_sql(
+            self, sql, params
+        ):
+            self.count += 1
+            return pd.DataFrame(
+                [
+                    {
+                        "StockID": "2330",
+                        "Close": 602.0,
+                        "Date": "2021-04-01",
+                    }
+                ]
+            )
+
+    count_database = CountDatabase()
+    response_cache = (
+        cache.ResponseCache(
+            max_bytes=1024 * 1024,
+            ttl=60,
+        )
+    )
+    app.dependency_overrides[
+        database.get_database
+    ] = lambda: count_database
+    app.dependency_overrides[
+        cache.get_cache
+    ] = lambda: response_cache
+    client = TestClient(app)
+    try:
+        response_list = [
+            client.get(
+                "/taiwan_stock_price",
+                params=dict(
+                    stock_id="2330",
+                    start_date=start_date,
+                    end_date="2021-04-01",
+                ),
+            )
+            for start_date in [
+                "2021-04-01",
+                "2021-4-1",
+            ]
+        ]
+        metrics = client.get(
+            "/metrics"
+        ).text
+    finally:
+        app.dependency_overrides = {}
+    assert count_database.count == 1
+    assert (
+        response_list[0].json()
+        == response_list[1].json()
+        == {
+            "data": [
+                {
+                    "StockID": "2330",
+                    "Close": 602.0,
+                    "Date": "2021-04-01",
+                }
+            ]
+        }
+    )
+    assert (
+        "api_cache_hits_total 1"
+        in metrics
+    )
+    assert (
+        "api_cache_misses_total 1"
+        in metrics
+    )
@@ -0,0 +1,160 @@
+import pandas as pd
+import pyarrow as pa
+import pytest
+from fastapi.testclient import (
+    TestClient,
+)
+from sqlalchemy import exc, text
+
+from api import cache, database
+from api.main import (
+    CROSS_SECTION_SQL,
+    app,
+)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.sql_list = []
+
+    async def read_sql(
+        self, sql, params
+    ):
+        self.sql_list.append(sql)
+        return pd.DataFrame(
+            [
+                {
+                    "StockID": "2330",
+                    "Close": 602.0,
+                }
+            ]
+        )
+
+    async def stream_sql(
+        self, sql, params, batch_size
+    ):
+        self.sql_list.append(sql)
+        yield ["StockID", "Close"], [
+            ("2330", 602.0)
+        ]
+
+
+def get_cross_section(
+    fake_database, **params
+):
+    app.dependency_overrides[
+        database.get_database
+    ] = lambda: fake_database
+    app.dependency_overrides[
+        cache.get_cache
+    ] = lambda: cache.ResponseCache(
+        max_bytes=1024 * 1024, ttl=60
+    )
+    try:
+        return TestClient(app).get(
+            "/taiwan_stock_price/cross_section",
+            params=dict(
+                date="2021-04-01",
+                **params,
+            ),
+        )
+    finally:
+        app.dependency_overrides = {}
+
+
+def test_cross_section():
+    """
+    測試只查詢指定欄位
+    """
+    fake_database = FakeDatabase()
+    response = get_cross_section(
+        fake_database,
+        columns="StockID,Close",
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "data": [
+            {
+                "StockID": "2330",
+                "Close": 602.0,
+            }
+        ]
+    }
+    assert (
+        "select `StockID`, `Close` from"
+        in fake_database.sql_list[0]
+    )
+
+
+def test_cross_section_arrow():
+    """
+    測試只查詢部分欄位時, arrow schema 只包含這些欄位
+    """
+    response = get_cross_section(
+        FakeDatabase(),
+        columns="StockID,Close",
+        format="arrow",
+    )
+    table = pa.ipc.open_stream(
+        response.content
+    ).read_all()
+    assert table.schema.names == [
+        "StockID",
+        "Close",
+    ]
+    assert (
+        table.schema.field("Close").type
+        == pa.float32()
+    )
+
+
+def test_cross_section_unknown_column():
+    """
+    測試欄位不存在時, 回傳 400, 不會拼接進 SQL
+    """
+    fake_database = FakeDatabase()
+    response = get_cross_section(
+        fake_database,
+        columns="Close from x; --",
+    )
+    assert response.status_code == 400
+    assert fake_database.sql_list == []
+
+
+# 以下需要連線 mysql, 並且已經執行 migration, 連不到 mysql 時跳過
+def test_cross_section_explain():
+    """
+    測試某一天全市場的查詢, 走 idx_date_stock,
+    並且只掃描該年度的 partition
+    """
+    sql = CROSS_SECTION_SQL.format(
+        columns="`StockID`, `Date`, `Close`"
+    )
+    try:
+        conn = (
+            database.get_database().connect()
+        )
+    except exc.OperationalError as e:
+        pytest.skip(
+            f"mysql is not reachable, {e}"
+        )
+    with conn:
+        plan = (
+            conn.execute(
+                text(f"explain {sql}"),
+                dict(date="2021-04-01"),
+            )
+            .mappings()
+            .fetchall()
+        )
+    assert (
+        plan[0]["key"]
+        == "idx_date_stock"
+    )
+    assert (
+        plan[0]["partitions"] == "p2021"
+    )
+    # covering index, 不需要回到 primary key
+    assert "Using index" in (
+        plan[0]["Extra"] or ""
+    )
@@ -0,0 +1,85 @@
+import pandas as pd
+from fastapi.testclient import (
+    TestClient,
+)
+
+from api import cache, database
+from api.main import app
+
+
+class FakeDatabase:
+    """替換資料庫, 記錄 api 送出的 SQL 參數"""
+
+    def __init__(self):
+        self.params_list = []
+
+    async def read_sql(
+        self, sql, params
+    ):
+        self.params_list.append(params)
+        return pd.DataFrame(
+            [
+                {
+                    "StockID": "2330",
+                    "Close": 602.0,
+                    "Date": "2021-04-01",
+                }
+            ]
+        )
+
+
+def test_get_database():
+    """
+    測試整個進程共用同一個 Database, 不會每次建立新的 engine
+    """
+    db1 = database.get_database()
+    db2 = database.get_database()
+    assert db1 is db2
+    assert (
+        db1.engine.pool.size()
+        == database.config.MYSQL_POOL_SIZE
+    )
+
+
+def test_taiwan_stock_price_dependency():
+    """
+    測試 endpoint 透過 Depends 拿到 Database,
+    並以參數方式傳入 SQL, 避免 SQL injection
+    """
+    fake_database = FakeDatabase()
+    app.dependency_overrides[
+        database.get_database
+    ] = lambda: fake_database
+    app.dependency_overrides[
+        cache.get_cache
+    ] = lambda: cache.ResponseCache(
+        max_bytes=1024 * 1024, ttl=60
+    )
+    try:
+        response = TestClient(app).get(
+            "/taiwan_stock_price",
+            params=dict(
+                stock_id="2330' or '1'='1",
+                start_date="2021-04-01",
+                end_date="2021-04-01",
+            ),
+        )
+    finally:
+        app.dependency_overrides = {}
+    assert response.status_code == 200
+    assert response.json() == {
+        "data": [
+            {
+                "StockID": "2330",
+                "Close": 602.0,
+                "Date": "2021-04-01",
+            }
+        ]
+    }
+    assert fake_database.params_list == [
+        dict(
+            stock_id="2330' or '1'='1",
+            start_date="2021-04-01",
+            end_date="2021-04-01",
+        )
+    ]
@@ -0,0 +1,348 @@
+import asyncio
+import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi.testclient import (
+    TestClient,
+)
+import pytest
+from sqlalchemy import create_engine
+
+from api import database, formats
+from api.main import app
+
+COLUMNS = ["StockID", "Close", "Date"]
+ROWS = [
+    (
+        "2330",
+        602.0,
+        datetime.date(2021, 4, 1),
+    ),
+    (
+        "2330",
+        603.0,
+        datetime.date(2021, 4, 6),
+    ),
+]
+
+
+class FakeDatabase:
+    """模擬 server-side cursor, 每次回傳一筆"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def stream_sql(
+        self, sql, params, batch_size
+    ):
+        yield COLUMNS, self.rows[:1]
+        for row in self.rows[1:]:
+            yield COLUMNS, [row]
+
+
+def test_encode_ndjson():
+    result = formats.encode_ndjson(
+        COLUMNS, ROWS, header=True
+    )
+    expected = (
+        b'{"StockID": "2330", "Close": 602.0, "Date": "2021-04-01"}\n'
+        b'{"StockID": "2330", "Close": 603.0, "Date": "2021-04-06"}\n'
+    )
+    assert result == expected
+
+
+def test_encode_csv():
+    result = formats.encode_csv(
+        COLUMNS, ROWS, header=True
+    )
+    expected = (
+        b"StockID,Close,Date\n"
+        b"2330,602.0,2021-04-01\n"
+        b"2330,603.0,2021-04-06\n"
+    )
+    assert result == expected
+
+
+def test_stream_csv():
+    """
+    測試 format=csv, 分批送出, header 只出現一次
+    """
+    app.dependency_overrides[
+        database.get_database
+    ] = lambda: FakeDatabase(ROWS)
+    try:
+        response = TestClient(app).get(
+            "/taiwan_stock_price",
+            params=dict(
+                stock_id="2330",
+                start_date="2021-04-01",
+                end_date="2021-04-30",
+                format="csv",
+            ),
+        )
+    finally:
+        app.dependency_overrides = {}
+    assert response.status_code == 200
+    assert response.headers[
+        "content-type"
+    ].startswith("text/csv")
+    assert response.text == (
+        "StockID,Close,Date\n"
+        "2330,602.0,2021-04-01\n"
+        "2330,603.0,2021-04-06\n"
+    )
+
+
+def test_stream_ndjson_no_data():
+    """
+    測試沒有資料時, ndjson 回傳空內容
+    """
+    app.dependency_overrides[
+        database.get_database
+    ] = lambda: FakeDatabase([])
+    try:
+        response = TestClient(app).get(
+            "/taiwan_stock_price",
+            params=dict(
+                stock_id="2330",
+                format="ndjson",
+            ),
+        )
+    finally:
+        app.dependency_overrides = {}
+    assert response.status_code == 200
+    assert response.text == ""
+
+
+def test_unknown_format():
+    response = TestClient(app).get(
+        "/taiwan_stock_price",
+        params=dict(format="xml"),
+    )
+    assert response.status_code == 400
+
+
+def test_stream_sql_sync():
+    """
+    測試 server-side cursor 分批取出, 使用 sqlite 代替 mysql
+    """
+    db = database.Database()
+    db.engine = create_engine(
+        "sqlite://"
+    )
+    with db.engine.connect() as conn:
+        conn.execute(
+            "create table taiwan_stock_price (StockID text, Close real)"
+        )
+        for i in range(5):
+            conn.execute(
+                f"insert into taiwan_stock_price values ('2330', {i})"
+            )
+    result = list(
+        db.stream_sql_sync(
+            "select * from taiwan_stock_price",
+            {},
+            batch_size=2,
+        )
+    )
+    assert [
+        len(rows) for _, rows in result
+    ] == [2, 2, 1]
+    assert result[0][0] == [
+        "StockID",
+        "Close",
+    ]
+
+
+def test_stream_sql_close():
+    """
+    測試 client 中斷 (aclose) 時, 立刻關閉 sync generator, 釋放 cursor 與連線
+    """
+    closed_list = []
+
+    def stream_sql_sync(
+        sql, params, batch_size
+    ):
+        try:
+            for i in range(10):
+                yield COLUMNS, ROWS
+        finally:
+            closed_list.append(True)
+
+    db = database.Database()
+    db.stream_sql_sync = stream_sql_sync
+    batch_iter = db.stream_sql(
+        "", {}, batch_size=1
+    )
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(
+            batch_iter.__anext__()
+        )
+        assert closed_list == []
+        loop.run_until_complete(
+            batch_iter.aclose()
+        )
+    finally:
+        loop.close()
+    assert closed_list == [True]
+
+
+def test_stream_response_close():
+    """
+    測試送出失敗 (client 中斷) 時, 一併關閉查詢的 batch_iter
+    """
+    closed_list = []
+
+    async def stream_sql():
+        try:
+            for row in ROWS:
+                yield COLUMNS, [row]
+        finally:
+            closed_list.append(True)
+
+    response = formats.stream_response(
+        stream_sql(),
+        "csv",
+        "taiwan_stock_price",
+    )
+
+    async def send(message):
+        if message.get("body"):
+            raise OSError(
+                "client disconnected"
+            )
+
+    loop = asyncio.new_event_loop()
+    try:
+        with pytest.raises(OSError):
+            loop.run_until_complete(
+                response.stream_response(
+                    send
+                )
+            )
+    finally:
+        loop.close()
+    assert closed_list == [True]
+
+
+PRICE_COLUMNS = [
+    "StockID",
+    "TradeVolume",
+    "Transaction",
+    "TradeValue",
+    "Open",
+    "Max",
+    "Min",
+    "Close",
+    "Change",
+    "Date",
+]
+PRICE_ROWS = [
+    (
+        "2330",
+        45972766,
+        48170,
+        27520742963,
+        598.0,
+        602.0,
+        594.0,
+        602.0,
+        15.0,
+        datetime.date(2021, 4, 1),
+    ),
+    (
+        "2330",
+        36534387,
+        35405,
+        22011218013,
+        605.0,
+        607.0,
+        599.0,
+        602.0,
+        0.0,
+        datetime.date(2021, 4, 6),
+    ),
+]
+
+
+class FakePriceDatabase:
+    async def stream_sql(
+        self, sql, params, batch_size
+    ):
+        for row in PRICE_ROWS:
+            yield PRICE_COLUMNS, [row]
+
+
+def get_price(format: str) -> bytes:
+    app.dependency_overrides[
+        database.get_database
+    ] = lambda: FakePriceDatabase()
+    try:
+        response = TestClient(app).get(
+            "/taiwan_stock_price",
+            params=dict(
+                stock_id="2330",
+                start_date="2021-04-01",
+                end_date="2021-04-30",
+                format=format,
+            ),
+        )
+    finally:
+        app.dependency_overrides = {}
+    assert response.status_code == 200
+    assert (
+        response.headers["content-type"]
+        == formats.MEDIA_TYPE[format]
+    )
+    return response.content
+
+
+def test_stream_arrow():
+    """
+    測試 format=arrow, 欄位型態與 mysql 一致
+    """
+    table = pa.ipc.open_stream(
+        get_price("arrow")
+    ).read_all()
+    assert (
+        table.schema
+        == formats.ARROW_SCHEMA[
+            "taiwan_stock_price"
+        ]
+    )
+    assert table.column(
+        "TradeValue"
+    ).to_pylist() == [
+        27520742963,
+        22011218013,
+    ]
+    assert table.column(
+        "Date"
+    ).to_pylist() == [
+        datetime.date(2021, 4, 1),
+        datetime.date(2021, 4, 6),
+    ]
+
+
+def test_stream_parquet():
+    """
+    測試 format=parquet, 每個 batch 一個 row group
+    """
+    parquet_file = pq.ParquetFile(
+        pa.BufferReader(
+            get_price("parquet")
+        )
+    )
+    assert (
+        parquet_file.num_row_groups == 2
+    )
+    table = parquet_file.read()
+    assert table.column(
+        "Close"
+    ).to_pylist() == [602.0, 602.0]
+    assert (
+        table.schema.field("Close").type
+        == pa.float32()
+    )
@@ -0,0 +1,628 @@
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import (
+    TestClient,
+)
+
+from api import database, indicators
+from api.indicators import (
+    INDICATOR_LIST,
+    compute_indicators,
+)
+from api.main import app
+
+
+def create_price_df(
+    size: int,
+) -> pd.DataFrame:
+    close = 100 + np.cumsum(
+        np.random.RandomState(0).normal(
+            size=size
+        )
+    )
+    return pd.DataFrame(
+        dict(
+            Date=pd.date_range(
+                "2021-01-01",
+                periods=size,
+            ).strftime("%Y-%m-%d"),
+            Close=close,
+        )
+    )
+
+
+def test_compute_indicators():
+    """
+    測試均線, 布林通道, RSI 與直接計算的結果一致
+    """
+    price_df = create_price_df(100)
+    indicator_df, state = (
+        compute_indicators(price_df)
+    )
+    close = price_df["Close"]
+    assert np.allclose(
+        indicator_df["ma_20"],
+        close.rolling(20).mean(),
+        equal_nan=True,
+    )
+    assert np.allclose(
+        indicator_df["bband_upper_20"],
+        close.rolling(20).mean()
+        + 2
+        * close.rolling(20).std(ddof=0),
+        equal_nan=True,
+    )
+    assert (
+        indicator_df["rsi_14"]
+        .iloc[:14]
+        .isna()
+        .all()
+    )
+    assert np.allclose(
+        indicator_df["rsi_14"],
+        get_wilder_rsi(close.tolist()),
+        equal_nan=True,
+    )
+    assert (
+        len(state["close_list"]) == 59
+    )
+
+
+def test_compute_indicators_incremental():
+    """
+    測試從狀態接續計算, 與一次計算整段歷史的結果一致
+    """
+    price_df = create_price_df(100)
+    full_df, full_state = (
+        compute_indicators(price_df)
+    )
+    indicator_df_list = []
+    state = None
+    for start, end in [
+        (0, 1),
+        (1, 10),
+        (10, 15),
+        (15, 30),
+        (30, 99),
+        (99, 100),
+    ]:
+        indicator_df, state = (
+            compute_indicators(
+                price_df.iloc[
+                    start:end
+                ],
+                # 狀態會存成 json
+                (
+                    json.loads(
+                        json.dumps(
+                            state
+                        )
+                    )
+                    if state
+                    else None
+                ),
+            )
+        )
+        indicator_df_list.append(
+            indicator_df
+        )
+    incremental_df = pd.concat(
+        indicator_df_list,
+        ignore_index=True,
+    )
+    for name in INDICATOR_LIST:
+        assert np.allclose(
+            incremental_df[name],
+            full_df[name],
+            equal_nan=True,
+        )
+    assert (
+        state["count"]
+        == full_state["count"]
+    )
+
+
+def get_wilder_rsi(
+    close_list, period=14
+):
+    """Wilder 的 RSI 定義, 逐筆計算, 作為參考值"""
+    diff_list = np.diff(close_list)
+    rsi_list = [np.nan] * len(
+        close_list
+    )
+    avg_gain = np.mean(
+        np.clip(
+            diff_list[:period], 0, None
+        )
+    )
+    avg_loss = np.mean(
+        np.clip(
+            -diff_list[:period], 0, None
+        )
+    )
+    for i in range(
+        period, len(close_list)
+    ):
+        if i > period:
+            diff = diff_list[i - 1]
+            avg_gain = (
+                avg_gain * (period - 1)
+                + max(diff, 0)
+            ) / period
+            avg_loss = (
+                avg_loss * (period - 1)
+                + max(-diff, 0)
+            ) / period
+        rsi_list[i] = (
+            100
+            * avg_gain
+            / (avg_gain + avg_loss)
+        )
+    return rsi_list
+
+
+def test_rsi_reference():
+    """
+    測試 RSI 與 Wilder 定義的參考值一致,
+    stockcharts 的範例以四捨五入後的平均值計算, 誤差在 0.1 內
+    """
+    close_list = [
+        44.34,
+        44.09,
+        44.15,
+        43.61,
+        44.33,
+        44.83,
+        45.10,
+        45.42,
+        45.84,
+        46.08,
+        45.89,
+        46.03,
+        45.61,
+        46.28,
+        46.28,
+        46.00,
+        46.03,
+        46.41,
+        46.22,
+        45.64,
+        46.21,
+        46.25,
+        45.71,
+        46.45,
+        45.78,
+        45.35,
+        44.03,
+        44.18,
+        44.22,
+        44.57,
+        43.42,
+        42.66,
+        43.13,
+    ]
+    price_df = pd.DataFrame(
+        dict(
+            Date=pd.date_range(
+                "2021-01-01",
+                periods=len(close_list),
+            ).strftime("%Y-%m-%d"),
+            Close=close_list,
+        )
+    )
+    indicator_df, _ = (
+        compute_indicators(price_df)
+    )
+    assert np.allclose(
+        indicator_df["rsi_14"],
+        get_wilder_rsi(close_list),
+        equal_nan=True,
+    )
+    stockcharts = [
+        70.53,
+        66.32,
+        66.55,
+        69.41,
+        66.36,
+        57.97,
+        62.93,
+        63.26,
+        56.06,
+        62.38,
+        54.71,
+        50.42,
+        39.99,
+        41.46,
+        41.87,
+        45.46,
+        37.30,
+        33.08,
+        37.77,
+    ]
+    assert np.allclose(
+        indicator_df["rsi_14"].iloc[
+            14:
+        ],
+        stockcharts,
+        atol=0.1,
+    )
+
+
+def test_rsi_flat_price():
+    """
+    測試價格沒有變動時, RSI 為 50, 不會產生 0 / 0
+    """
+    price_df = pd.DataFrame(
+        dict(
+            Date=pd.date_range(
+                "2021-01-01", periods=20
+            ).strftime("%Y-%m-%d"),
+            Close=[100.0] * 20,
+        )
+    )
+    with np.errstate(all="raise"):
+        indicator_df, _ = (
+            compute_indicators(price_df)
+        )
+    assert (
+        indicator_df["rsi_14"]
+        .iloc[14:]
+        .eq(50)
+        .all()
+    )
+
+
+class FakeConnection:
+    """模擬 get_lock, 同一個名稱只有一條連線拿得到"""
+
+    def __init__(self, lock_set):
+        self.lock_set = lock_set
+
+    def execute(self, sql, params):
+        name = params["name"]
+        if "release_lock" in str(sql):
+            self.lock_set.discard(name)
+            return FakeResult(1)
+        if name in self.lock_set:
+            return FakeResult(0)
+        self.lock_set.add(name)
+        return FakeResult(1)
+
+    def close(self):
+        pass
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class FakeDatabase:
+    """模擬 taiwan_stock_price, taiwan_stock_indicator, 狀態,
+    data_version 與 data_version_consumer
+    """
+
+    def __init__(self, price_df):
+        self.price_df = price_df
+        self.indicator_df = (
+            pd.DataFrame()
+        )
+        self.state = None
+        self.version_list = []
+        self.consumer_version = None
+        self.lock_set = set()
+        self.price_read_list = []
+
+    def connect(self):
+        return FakeConnection(
+            self.lock_set
+        )
+
+    async def read_sql(
+        self, sql, params
+    ):
+        if (
+            "from data_version_consumer"
+            in sql
+        ):
+            if (
+                self.consumer_version
+                is None
+            ):
+                return pd.DataFrame()
+            return pd.DataFrame(
+                dict(
+                    version=[
+                        self.consumer_version
+                    ]
+                )
+            )
+        if "from data_version" in sql:
+            return pd.DataFrame(
+                [
+                    dict(
+                        version=version,
+                        start_date=start_date,
+                    )
+                    for (
+                        version,
+                        start_date,
+                    ) in self.version_list
+                    if version
+                    > params["version"]
+                ],
+                columns=[
+                    "version",
+                    "start_date",
+                ],
+            )
+        if (
+            "from taiwan_stock_indicator_state"
+            in sql
+        ):
+            if self.state is None or (
+                "stock_id" not in params
+                and self.state["Date"]
+                < params["start_date"]
+            ):
+                return pd.DataFrame(
+                    columns=[
+                        "StockID",
+                        "Date",
+                        "State",
+                    ]
+                )
+            return pd.DataFrame(
+                [self.state]
+            )
+        if (
+            "select distinct StockID"
+            in sql
+        ):
+            return pd.DataFrame(
+                dict(
+                    StockID=(
+                        ["2330"]
+                        if (
+                            self.price_df[
+                                "Date"
+                            ]
+                            >= params[
+                                "start_date"
+                            ]
+                        ).any()
+                        else []
+                    )
+                )
+            )
+        if (
+            "from taiwan_stock_price"
+            in sql
+        ):
+            self.price_read_list.append(
+                params["last_date"]
+            )
+            return self.price_df[
+                self.price_df["Date"]
+                > params["last_date"]
+            ]
+        return self.indicator_df[
+            (
+                self.indicator_df[
+                    "Date"
+                ]
+                >= params["start_date"]
+            )
+            & (
+                self.indicator_df[
+                    "Date"
+                ]
+                <= params["end_date"]
+            )
+        ][["StockID", "Date", "ma_5"]]
+
+    async def execute(
+        self, statement_list
+    ):
+        if len(statement_list) == 1:
+            ((_, consumer_list),) = (
+                statement_list
+            )
+            self.consumer_version = (
+                consumer_list[0][
+                    "version"
+                ]
+            )
+            return
+        (
+            (_, indicator_list),
+            (_, state_list),
+        ) = statement_list
+        self.indicator_df = (
+            pd.concat(
+                [
+                    self.indicator_df,
+                    pd.DataFrame(
+                        indicator_list
+                    ),
+                ],
+                ignore_index=True,
+            )
+            .drop_duplicates(
+                ["StockID", "Date"],
+                keep="last",
+            )
+            .sort_values("Date")
+        )
+        self.state = state_list[0]
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(
+            coroutine
+        )
+    finally:
+        loop.close()
+
+
+def test_indicator_job():
+    """
+    測試 job 第一次從頭計算, 沒有新版本時不讀取日 K,
+    新的日期接續計算, 舊日期被更新時從頭計算
+    """
+    fake_database = FakeDatabase(
+        create_price_df(10)
+    )
+    fake_database.version_list = [
+        (1, "2021-01-01")
+    ]
+    assert run(
+        indicators.run_once(
+            fake_database
+        )
+    )
+    assert (
+        fake_database.consumer_version
+        == 1
+    )
+    # 沒有新版本, 不會再讀取日 K
+    run(
+        indicators.run_once(
+            fake_database
+        )
+    )
+    fake_database.price_df = (
+        create_price_df(11)
+    )
+    fake_database.version_list.append(
+        (2, "2021-01-11")
+    )
+    run(
+        indicators.run_once(
+            fake_database
+        )
+    )
+    fake_database.version_list.append(
+        (3, "2021-01-05")
+    )
+    run(
+        indicators.run_once(
+            fake_database
+        )
+    )
+    assert (
+        fake_database.price_read_list
+        == [
+            "1900-01-01",
+            "2021-01-10",
+            "1900-01-01",
+        ]
+    )
+    assert (
+        fake_database.consumer_version
+        == 3
+    )
+    assert (
+        len(fake_database.indicator_df)
+        == 11
+    )
+    assert (
+        fake_database.lock_set == set()
+    )
+
+
+def test_indicator_job_locked():
+    """
+    測試其他 job 正在計算時, 不重複計算, 也不更新版本
+    """
+    fake_database = FakeDatabase(
+        create_price_df(10)
+    )
+    fake_database.version_list = [
+        (1, "2021-01-01")
+    ]
+    fake_database.lock_set.add(
+        indicators.CONSUMER
+    )
+    assert not run(
+        indicators.run_once(
+            fake_database
+        )
+    )
+    assert (
+        fake_database.price_read_list
+        == []
+    )
+    assert (
+        fake_database.consumer_version
+        is None
+    )
+
+
+def test_indicator_endpoint():
+    """
+    測試 endpoint 只讀取計算好的指標, 不會計算
+    """
+    fake_database = FakeDatabase(
+        create_price_df(10)
+    )
+    fake_database.version_list = [
+        (1, "2021-01-01")
+    ]
+    run(
+        indicators.run_once(
+            fake_database
+        )
+    )
+    fake_database.price_df = (
+        create_price_df(11)
+    )
+    app.dependency_overrides[
+        database.get_database
+    ] = lambda: fake_database
+    client = TestClient(app)
+    params = dict(
+        stock_id="2330",
+        start_date="2021-01-01",
+        end_date="2021-12-31",
+        indicator="ma_5",
+    )
+    try:
+        response = client.get(
+            "/taiwan_stock_price/indicator",
+            params=params,
+        )
+        invalid_response = client.get(
+            "/taiwan_stock_price/indicator",
+            params=dict(
+                params, indicator="ma_7"
+            ),
+        )
+    finally:
+        app.dependency_overrides = {}
+    assert (
+        response.json()["data"][0][
+            "ma_5"
+        ]
+        is None
+    )
+    assert (
+        len(response.json()["data"])
+        == 10
+    )
+    assert (
+        fake_database.price_read_list
+        == ["1900-01-01"]
+    )
+    assert (
+        invalid_response.status_code
+        == 400
+    )
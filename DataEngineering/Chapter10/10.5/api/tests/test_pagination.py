@@ -0,0 +1,182 @@
+import datetime
+
+from fastapi.testclient import (
+    TestClient,
+)
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from api import cache, database
+from api.main import app
+from api.pagination import (
+    decode_cursor,
+    encode_cursor,
+    get_keyset_condition,
+)
+
+
+def create_database() -> (
+    database.Database
+):
+    """使用 sqlite 代替 mysql, 2 檔股票各 5 天"""
+    db = database.Database()
+    db.engine = create_engine(
+        "sqlite://",
+        connect_args={
+            "check_same_thread": False
+        },
+        poolclass=StaticPool,
+    )
+    with db.engine.connect() as conn:
+        conn.execute(
+            "create table taiwan_stock_price (StockID text, Close real, Date text)"
+        )
+        for stock_id in [
+            "2317",
+            "2330",
+        ]:
+            for day in range(1, 6):
+                conn.execute(
+                    f"insert into taiwan_stock_price values ('{stock_id}', {day}, '2021-04-0{day}')"
+                )
+    return db
+
+
+def get_all_page(
+    db: database.Database,
+    path: str,
+    **params,
+):
+    app.dependency_overrides[
+        database.get_database
+    ] = lambda: db
+    app.dependency_overrides[
+        cache.get_cache
+    ] = lambda: cache.ResponseCache(
+        max_bytes=1024 * 1024, ttl=60
+    )
+    page_list = []
+    cursor = ""
+    try:
+        while True:
+            response = TestClient(
+                app
+            ).get(
+                path,
+                params=dict(
+                    cursor=cursor,
+                    start_date="2021-04-01",
+                    end_date="2021-04-30",
+                    **params,
+                ),
+            )
+            assert (
+                response.status_code
+                == 200
+            )
+            page_list.append(
+                response.json()["data"]
+            )
+            cursor = response.json()[
+                "next_cursor"
+            ]
+            if cursor is None:
+                return page_list
+    finally:
+        app.dependency_overrides = {}
+
+
+def test_cursor():
+    cursor = encode_cursor(
+        [
+            "2330",
+            datetime.datetime(
+                2021, 4, 1
+            ),
+        ]
+    )
+    assert decode_cursor(cursor, 2) == [
+        "2330",
+        "2021-04-01",
+    ]
+
+
+def test_keyset_condition():
+    assert get_keyset_condition(
+        ["StockID", "Date"]
+    ) == (
+        "(StockID > :cursor_0) or "
+        "(StockID = :cursor_0 and Date > :cursor_1)"
+    )
+
+
+def test_stock_price_page():
+    """
+    測試單一股票分頁, 每頁 2 筆, 最後一頁不滿 limit 時, next_cursor 為 None
+    """
+    page_list = get_all_page(
+        create_database(),
+        "/taiwan_stock_price",
+        stock_id="2330",
+        limit=2,
+    )
+    assert [
+        [row["Date"] for row in page]
+        for page in page_list
+    ] == [
+        ["2021-04-01", "2021-04-02"],
+        ["2021-04-03", "2021-04-04"],
+        ["2021-04-05"],
+    ]
+
+
+def test_batch_page():
+    """
+    測試多檔股票分頁, 跨股票時依照 (StockID, Date) 接續, 不重複也不遺漏
+    """
+    page_list = get_all_page(
+        create_database(),
+        "/taiwan_stock_price/batch",
+        stock_id="2330,2317",
+        limit=3,
+    )
+    row_list = [
+        (row["StockID"], row["Date"])
+        for page in page_list
+        for row in page
+    ]
+    assert [
+        len(page) for page in page_list
+    ] == [3, 3, 3, 1]
+    assert row_list == sorted(
+        (stock_id, f"2021-04-0{day}")
+        for stock_id in ["2317", "2330"]
+        for day in range(1, 6)
+    )
+
+
+def test_invalid_page():
+    """
+    測試 cursor 格式錯誤, limit 超過上限, 或非 json 格式時, 回傳 400
+    """
+    client = TestClient(app)
+    for params in [
+        dict(limit=2, cursor="abc"),
+        dict(limit=10**9),
+        dict(limit=2, format="csv"),
+        dict(
+            cursor=encode_cursor(
+                ["2330", "2021-04-01"]
+            )
+        ),
+    ]:
+        response = client.get(
+            "/taiwan_stock_price",
+            params=dict(
+                stock_id="2330",
+                **params,
+            ),
+        )
+        assert (
+            response.status_code == 400
+        )
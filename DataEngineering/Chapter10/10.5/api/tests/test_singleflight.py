@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import (
+    ThreadPoolExecutor,
+)
+
+import pandas as pd
+import pytest
+from fastapi.testclient import (
+    TestClient,
+)
+
+from api import cache, database
+from api.main import app
+from api.singleflight import (
+    SingleFlight,
+)
+
+
+class SlowDatabase:
+    """查詢需要一段時間, 記錄實際查詢 mysql 的次數"""
+
+    def __init__(self):
+        self.count = 0
+
+    async def read_sql(
+        self, sql, params
+    ):
+        self.count += 1
+        await asyncio.sleep(0.5)
+        return pd.DataFrame(
+            [
+                {
+                    "StockID": "2330",
+                    "Close": 602.0,
+                }
+            ]
+        )
+
+
+def test_single_flight_endpoint():
+    """
+    測試同時送出 N 個相同的 request, 只查詢一次 mysql,
+    cache 關閉, 確認是 single-flight 合併, 而不是 cache 命中
+    """
+    slow_database = SlowDatabase()
+    app.dependency_overrides[
+        database.get_database
+    ] = lambda: slow_database
+    app.dependency_overrides[
+        cache.get_cache
+    ] = lambda: cache.ResponseCache(
+        max_bytes=0, ttl=60
+    )
+
+    # 每個 thread 各自建立 TestClient, 各自有自己的 event loop
+    def send_request(_):
+        return TestClient(app).get(
+            "/taiwan_stock_price",
+            params=dict(
+                stock_id="2330",
+                start_date="2021-04-01",
+                end_date="2021-04-30",
+            ),
+        )
+
+    try:
+        with ThreadPoolExecutor(
+            max_workers=10
+        ) as executor:
+            response_list = list(
+                executor.map(
+                    send_request,
+                    range(10),
+                )
+            )
+    finally:
+        app.dependency_overrides = {}
+    assert slow_database.count == 1
+    assert all(
+        response.status_code == 200
+        and response.json()
+        == {
+            "data": [
+                {
+                    "StockID": "2330",
+                    "Close": 602.0,
+                }
+            ]
+        }
+        for response in response_list
+    )
+
+
+def test_single_flight_sync():
+    """
+    測試 threadpool 中的同步函式, 相同 key 只執行一次, 錯誤也會傳給等待的呼叫
+    """
+    single_flight = SingleFlight()
+    count = []
+    barrier = threading.Barrier(5)
+
+    def query():
+        count.append(1)
+        time.sleep(0.3)
+        return "result"
+
+    def call(_):
+        barrier.wait()
+        return single_flight.do(
+            "key", query
+        )
+
+    with ThreadPoolExecutor(
+        max_workers=5
+    ) as executor:
+        result_list = list(
+            executor.map(call, range(5))
+        )
+    assert result_list == ["result"] * 5
+    assert len(count) == 1
+    assert single_flight.shared == 4
+
+    def fail():
+        raise ValueError("mysql error")
+
+    with pytest.raises(ValueError):
+        single_flight.do("key", fail)
+    # 失敗後不會留下 in-flight 的 key
+    assert (
+        single_flight.do("key", query)
+        == "result"
+    )
+
+
+def test_single_flight_leader_cancelled():
+    """
+    測試 leader 被取消 (例如 client 斷線) 時, 查詢繼續執行,
+    其他等待相同 key 的呼叫仍拿到結果
+    """
+    single_flight = SingleFlight()
+    count = []
+
+    async def query():
+        count.append(1)
+        await asyncio.sleep(0.1)
+        return "result"
+
+    async def main():
+        leader = asyncio.ensure_future(
+            single_flight.do_async(
+                "key", query
+            )
+        )
+        await asyncio.sleep(0)
+        follower = (
+            asyncio.ensure_future(
+                single_flight.do_async(
+                    "key", query
+                )
+            )
+        )
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(
+            asyncio.CancelledError
+        ):
+            await leader
+        return await follower
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert (
+            loop.run_until_complete(
+                main()
+            )
+            == "result"
+        )
+    finally:
+        loop.close()
+    assert len(count) == 1
+    # 完成後不會留下 in-flight 的 key
+    assert (
+        single_flight._future_dict == {}
+    )
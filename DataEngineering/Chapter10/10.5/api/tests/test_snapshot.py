@@ -0,0 +1,356 @@
+import asyncio
+import datetime
+
+import pandas as pd
+import pytest
+from fastapi.testclient import (
+    TestClient,
+)
+
+from api import (
+    cache,
+    database,
+    snapshot,
+)
+from api.main import app
+
+COLUMNS = [
+    "StockID",
+    "TradeVolume",
+    "Transaction",
+    "TradeValue",
+    "Open",
+    "Max",
+    "Min",
+    "Close",
+    "Change",
+    "Date",
+]
+
+
+def create_row(stock_id, day, close):
+    return (
+        stock_id,
+        1000,
+        10,
+        100000,
+        close,
+        close,
+        close,
+        close,
+        0.0,
+        datetime.date(2021, 4, day),
+    )
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.row_list = [
+            create_row(
+                "2317", 1, 112.5
+            ),
+            create_row(
+                "2330", 1, 602.0
+            ),
+            create_row(
+                "2330", 6, 603.0
+            ),
+            create_row(
+                "2330", 7, 15.45
+            ),
+        ]
+        self.version_list = []
+        self.delta_list = []
+
+    def read_sql_sync(
+        self, sql, params
+    ):
+        if "max(version)" in sql:
+            return pd.DataFrame(
+                [{"version": 3}]
+            )
+        return pd.DataFrame(
+            self.version_list,
+            columns=[
+                "version",
+                "start_date",
+                "end_date",
+            ],
+        )
+
+    def stream_sql_sync(
+        self, sql, params, batch_size
+    ):
+        for i in range(
+            0,
+            len(self.row_list),
+            batch_size,
+        ):
+            yield COLUMNS, self.row_list[
+                i : i + batch_size
+            ]
+
+    async def read_sql(
+        self, sql, params
+    ):
+        self.delta_list.append(params)
+        # 讓其他 coroutine 有機會執行
+        await asyncio.sleep(0)
+        return pd.DataFrame(
+            [
+                create_row(
+                    "2330", 7, 610.0
+                ),
+                create_row(
+                    "2330", 8, 611.0
+                ),
+                create_row(
+                    "2454", 8, 800.0
+                ),
+            ],
+            columns=COLUMNS,
+        )
+
+
+def create_snapshot(
+    tmp_path, fake_database
+) -> snapshot.PriceSnapshot:
+    path = str(tmp_path / "price.arrow")
+    snapshot.build_snapshot(
+        fake_database,
+        path,
+        batch_size=3,
+    )
+    price_snapshot = (
+        snapshot.PriceSnapshot()
+    )
+    price_snapshot.load(path)
+    return price_snapshot
+
+
+def test_snapshot_query(tmp_path):
+    """
+    測試快照載入後, 依照日期區間切片,
+    json 格式與 mysql 查詢一致
+    """
+    price_snapshot = create_snapshot(
+        tmp_path, FakeDatabase()
+    )
+    assert price_snapshot.version == 3
+    assert price_snapshot.query_records(
+        "2330",
+        "2021-04-02",
+        "2021-04-07",
+    ) == [
+        dict(
+            StockID="2330",
+            TradeVolume=1000,
+            Transaction=10,
+            TradeValue=100000,
+            Open=603.0,
+            Max=603.0,
+            Min=603.0,
+            Close=603.0,
+            Change=0.0,
+            Date="2021-04-06",
+        ),
+        dict(
+            StockID="2330",
+            TradeVolume=1000,
+            Transaction=10,
+            TradeValue=100000,
+            Open=15.45,
+            Max=15.45,
+            Min=15.45,
+            Close=15.45,
+            Change=0.0,
+            Date="2021-04-07",
+        ),
+    ]
+    assert (
+        len(
+            price_snapshot.query(
+                "2317"
+            )["Close"]
+        )
+        == 1
+    )
+    assert (
+        price_snapshot.query_records(
+            "0000"
+        )
+        == []
+    )
+
+
+def test_snapshot_endpoint(
+    tmp_path, mocker
+):
+    """
+    測試快照建立之後的更新, 第一次查詢時合併,
+    相同日期以新資料為準, 不需要查詢 taiwan_stock_price
+    """
+    fake_database = FakeDatabase()
+    fake_database.version_list = [
+        (4, "2021-04-07", "2021-04-08")
+    ]
+    price_snapshot = create_snapshot(
+        tmp_path, fake_database
+    )
+    assert (
+        price_snapshot.catch_up(
+            fake_database
+        )
+        == 4
+    )
+    mocker.patch.object(
+        snapshot,
+        "_snapshot",
+        price_snapshot,
+    )
+    app.dependency_overrides[
+        database.get_database
+    ] = lambda: fake_database
+    app.dependency_overrides[
+        cache.get_cache
+    ] = lambda: cache.ResponseCache(
+        max_bytes=1024 * 1024, ttl=60
+    )
+    client = TestClient(app)
+    try:
+        response = client.get(
+            "/taiwan_stock_price",
+            params=dict(
+                stock_id="2330",
+                start_date="2021-04-06",
+                end_date="2021-04-30",
+            ),
+        )
+        client.get(
+            "/taiwan_stock_price",
+            params=dict(
+                stock_id="2454"
+            ),
+        )
+    finally:
+        app.dependency_overrides = {}
+    assert [
+        (row["Date"], row["Close"])
+        for row in response.json()[
+            "data"
+        ]
+    ] == [
+        ("2021-04-06", 603.0),
+        ("2021-04-07", 610.0),
+        ("2021-04-08", 611.0),
+    ]
+    # 更新只讀取一次
+    assert fake_database.delta_list == [
+        dict(
+            start_date="2021-04-07",
+            end_date="2021-04-08",
+        )
+    ]
+    assert (
+        len(
+            price_snapshot.query(
+                "2454"
+            )["Close"]
+        )
+        == 1
+    )
+
+
+class FailDatabase(FakeDatabase):
+    """第一次讀取更新時失敗"""
+
+    def __init__(self):
+        super().__init__()
+        self.fail = True
+
+    async def read_sql(
+        self, sql, params
+    ):
+        if self.fail:
+            self.fail = False
+            raise ConnectionError(
+                "mysql"
+            )
+        return await super().read_sql(
+            sql, params
+        )
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(
+            coroutine
+        )
+    finally:
+        loop.close()
+
+
+def test_snapshot_sync_retry(tmp_path):
+    """讀取更新失敗時, 日期區間保留, 下一次 sync 重試"""
+    fail_database = FailDatabase()
+    price_snapshot = create_snapshot(
+        tmp_path, fail_database
+    )
+    price_snapshot.invalidate(
+        "taiwan_stock_price",
+        "2021-04-07",
+        "2021-04-08",
+    )
+    with pytest.raises(ConnectionError):
+        run(
+            price_snapshot.sync(
+                fail_database
+            )
+        )
+    run(
+        price_snapshot.sync(
+            fail_database
+        )
+    )
+    assert price_snapshot.query(
+        "2330", "2021-04-07"
+    )["Close"].tolist() == [
+        610.0,
+        611.0,
+    ]
+
+
+def test_snapshot_sync_wait(tmp_path):
+    """同時 sync 時, 後面的 sync 等待合併完成, 不會讀到舊的快照"""
+    fake_database = FakeDatabase()
+    price_snapshot = create_snapshot(
+        tmp_path, fake_database
+    )
+    price_snapshot.invalidate(
+        "taiwan_stock_price",
+        "2021-04-07",
+        "2021-04-08",
+    )
+
+    async def query():
+        await price_snapshot.sync(
+            fake_database
+        )
+        return price_snapshot.query(
+            "2330", "2021-04-08"
+        )["Close"].tolist()
+
+    async def main():
+        return await asyncio.gather(
+            query(), query()
+        )
+
+    assert run(main()) == [
+        [611.0],
+        [611.0],
+    ]
+    assert (
+        len(fake_database.delta_list)
+        == 1
+    )
@@ -0,0 +1,295 @@
+import asyncio
+import datetime
+
+import pandas as pd
+from fastapi.testclient import (
+    TestClient,
+)
+
+from api import cache, database, version
+from api.main import app
+
+
+class FakeDatabase:
+    """data_version 的內容, 查詢 taiwan_stock_price 時記錄次數"""
+
+    def __init__(self, version_list):
+        self.version_list = version_list
+        self.price_count = 0
+
+    async def read_sql(
+        self, sql, params
+    ):
+        if "from data_version" in sql:
+            return pd.DataFrame(
+                [
+                    row
+                    for row in self.version_list
+                    if row["version"]
+                    > params[
+                        "last_version"
+                    ]
+                ],
+                columns=[
+                    "version",
+                    "dataset",
+                    "start_date",
+                    "end_date",
+                    "update_timestamp",
+                ],
+            )
+        self.price_count += 1
+        return pd.DataFrame(
+            [{"StockID": "2330"}]
+        )
+
+
+def create_version(
+    version_id, start_date, end_date
+):
+    return dict(
+        version=version_id,
+        dataset="taiwan_stock_price",
+        start_date=pd.Timestamp(
+            start_date
+        ).date(),
+        end_date=pd.Timestamp(
+            end_date
+        ).date(),
+        # mysql 的 unix_timestamp(update_time)
+        update_timestamp=datetime.datetime(
+            2021,
+            4,
+            1,
+            7,
+            0,
+            0,
+            tzinfo=datetime.timezone.utc,
+        ).timestamp(),
+    )
+
+
+def test_get_version():
+    """
+    測試每個 dataset 只保留最新的版本
+    """
+    data_version = version.DataVersion()
+    assert (
+        data_version.get_version(
+            "taiwan_stock_price"
+        )
+        is None
+    )
+    asyncio.new_event_loop().run_until_complete(
+        data_version.refresh(
+            FakeDatabase(
+                [
+                    create_version(
+                        1,
+                        "2021-03-01",
+                        "2021-03-31",
+                    ),
+                    create_version(
+                        2,
+                        "2021-04-01",
+                        "2021-04-01",
+                    ),
+                ]
+            )
+        )
+    )
+    assert (
+        data_version.get_version(
+            "taiwan_stock_price"
+        ).version
+        == 2
+    )
+    assert (
+        len(data_version._entry_dict)
+        == 1
+    )
+    assert (
+        data_version.get_version(
+            "taiwan_futures_daily"
+        ).version
+        == 0
+    )
+
+
+def test_get_last_modified():
+    """
+    測試 Last-Modified 由 mysql 轉換的 unix timestamp 產生, 與 api 主機的時區無關
+    """
+    entry = version.VersionEntry(
+        1,
+        create_version(
+            1,
+            "2021-04-01",
+            "2021-04-01",
+        )["update_timestamp"],
+    )
+    assert (
+        version.get_last_modified(entry)
+        == "Thu, 01 Apr 2021 07:00:00 GMT"
+    )
+    assert (
+        version.get_last_modified(
+            version.VersionEntry(
+                1, None
+            )
+        )
+        is None
+    )
+
+
+def test_etag(mocker):
+    """
+    測試回傳 ETag, If-None-Match 相同時回傳 304 且不查詢 mysql,
+    有新版本時, ETag 改變, 並通知 cache 失效
+    """
+    channel = (
+        cache.LocalInvalidationChannel()
+    )
+    response_cache = (
+        cache.ResponseCache(
+            max_bytes=1024 * 1024,
+            ttl=60,
+            channel=channel,
+        )
+    )
+    data_version = version.DataVersion(
+        channel=channel
+    )
+    mocker.patch.object(
+        version,
+        "_data_version",
+        data_version,
+    )
+    fake_database = FakeDatabase(
+        [
+            create_version(
+                1,
+                "2021-04-01",
+                "2021-04-01",
+            )
+        ]
+    )
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(
+        data_version.refresh(
+            fake_database
+        )
+    )
+    app.dependency_overrides[
+        database.get_database
+    ] = lambda: fake_database
+    app.dependency_overrides[
+        cache.get_cache
+    ] = lambda: response_cache
+    client = TestClient(app)
+    params = dict(
+        stock_id="2330",
+        start_date="2021-04-01",
+        end_date="2021-04-30",
+    )
+    try:
+        response = client.get(
+            "/taiwan_stock_price",
+            params=params,
+        )
+        etag = response.headers["ETag"]
+        assert etag == '"v1-json"'
+        assert response.headers[
+            "Last-Modified"
+        ].endswith("GMT")
+        response = client.get(
+            "/taiwan_stock_price",
+            params=params,
+            headers={
+                "If-None-Match": etag
+            },
+        )
+        assert (
+            response.status_code == 304
+        )
+        assert (
+            fake_database.price_count
+            == 1
+        )
+        fake_database.version_list.append(
+            create_version(
+                2,
+                "2021-04-06",
+                "2021-04-06",
+            )
+        )
+        loop.run_until_complete(
+            data_version.refresh(
+                fake_database
+            )
+        )
+        # 新版本讓 cache 失效
+        assert len(response_cache) == 0
+        response = client.get(
+            "/taiwan_stock_price",
+            params=params,
+            headers={
+                "If-None-Match": etag
+            },
+        )
+    finally:
+        app.dependency_overrides = {}
+        loop.close()
+    assert response.status_code == 200
+    assert (
+        response.headers["ETag"]
+        == '"v2-json"'
+    )
+    assert (
+        fake_database.price_count == 2
+    )
+
+
+def test_publish_version():
+    """
+    測試第一次讀取時, 只通知 publish_version 之後的版本,
+    例如快照 catch_up 之後, data_version 第一次讀取之前寫入的資料
+    """
+    channel = (
+        cache.LocalInvalidationChannel()
+    )
+    publish_list = []
+    channel.subscribe(
+        lambda *args: publish_list.append(
+            args
+        )
+    )
+    data_version = version.DataVersion(
+        channel=channel
+    )
+    data_version.publish_version = 1
+    asyncio.new_event_loop().run_until_complete(
+        data_version.refresh(
+            FakeDatabase(
+                [
+                    create_version(
+                        1,
+                        "2021-03-01",
+                        "2021-03-31",
+                    ),
+                    create_version(
+                        2,
+                        "2021-04-01",
+                        "2021-04-01",
+                    ),
+                ]
+            )
+        )
+    )
+    assert publish_list == [
+        (
+            "taiwan_stock_price",
+            "2021-04-01",
+            "2021-04-01",
+        )
+    ]
@@ -0,0 +1,239 @@
+"""
+比較讀取 csv 的速度與記憶體, 原本不指定型態的 pd.read_csv,
+依照 create_*_sql() 指定型態的 pandas 與 pyarrow, 例如:
+    pipenv run python benchmark_csv.py taiwan_stock_price
+    pipenv run python benchmark_csv.py taiwan_stock_price --rows 1000000
+沒有 csv 時產生 --rows 筆測試資料, 每種方式在獨立的 process 執行,
+peak memory 為該 process 的最大 RSS, 包含 pyarrow 的記憶體
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import typing
+
+import numpy as np
+import pandas as pd
+
+from csv_reader import (
+    ENGINE_LIST,
+    get_csv_path,
+    read_csv,
+)
+from upload_data2mysql import (
+    get_create_table_sql,
+)
+
+# 原本的讀取方式, 每個 chunk 推斷型態
+BASELINE = "baseline"
+
+
+def create_price_csv(
+    path: str, rows: int
+):
+    """taiwan_stock_price 格式的測試資料, StockID 含開頭為 0 的代碼"""
+    stock_id_list = ["0050", "0056"] + [
+        str(stock_id)
+        for stock_id in range(
+            1101, 2999
+        )
+    ]
+    date_list = pd.date_range(
+        "2000-01-01",
+        periods=rows
+        // len(stock_id_list)
+        + 1,
+    ).strftime("%Y-%m-%d")
+    random = np.random.RandomState(0)
+    price = random.uniform(
+        10, 1000, rows
+    )
+    pd.DataFrame(
+        dict(
+            StockID=np.resize(
+                stock_id_list, rows
+            ),
+            TradeVolume=random.randint(
+                0, 10**9, rows
+            ),
+            Transaction=random.randint(
+                0, 10**5, rows
+            ),
+            TradeValue=random.randint(
+                0, 10**12, rows
+            ),
+            Open=price,
+            Max=price * 1.05,
+            Min=price * 0.95,
+            Close=price,
+            Change=random.uniform(
+                -10, 10, rows
+            ),
+            Date=np.repeat(
+                date_list,
+                len(stock_id_list),
+            )[:rows],
+        )
+    ).round(2).to_csv(path, index=False)
+
+
+def read_baseline(
+    path: str,
+    sql: str,
+    chunk_size: int,
+) -> typing.Iterator[pd.DataFrame]:
+    return pd.read_csv(
+        path, chunksize=chunk_size
+    )
+
+
+def run(
+    name: str,
+    path: str,
+    sql: str,
+    chunk_size: int,
+    result_queue: multiprocessing.Queue,
+):
+    start = time.time()
+    rows = 0
+    leading_zero = 0
+    if name == BASELINE:
+        reader = read_baseline(
+            path, sql, chunk_size
+        )
+    else:
+        reader = read_csv(
+            path,
+            sql,
+            chunk_size=chunk_size,
+            engine=name,
+        )
+    for df in reader:
+        rows += len(df)
+        if "StockID" in df.columns:
+            leading_zero += int(
+                df["StockID"]
+                .astype(str)
+                .str.startswith("0")
+                .sum()
+            )
+    seconds = time.time() - start
+    result_queue.put(
+        dict(
+            name=name,
+            rows=rows,
+            seconds=seconds,
+            rows_per_second=rows
+            / max(seconds, 1e-6),
+            # linux 的 ru_maxrss 單位為 KB
+            peak_mb=resource.getrusage(
+                resource.RUSAGE_SELF
+            ).ru_maxrss
+            / 1024,
+            leading_zero=leading_zero,
+        )
+    )
+
+
+def benchmark(
+    path: str,
+    sql: str,
+    chunk_size: int = 100000,
+) -> pd.DataFrame:
+    result_list = []
+    for name in [
+        BASELINE
+    ] + ENGINE_LIST:
+        result_queue = (
+            multiprocessing.Queue()
+        )
+        process = (
+            multiprocessing.Process(
+                target=run,
+                args=(
+                    name,
+                    path,
+                    sql,
+                    chunk_size,
+                    result_queue,
+                ),
+            )
+        )
+        process.start()
+        result_list.append(
+            result_queue.get()
+        )
+        process.join()
+    return pd.DataFrame(result_list)
+
+
+def parse_args(
+    argv: typing.List[str],
+) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "table",
+        nargs="?",
+        default="taiwan_stock_price",
+    )
+    parser.add_argument(
+        "--rows",
+        type=int,
+        default=1000000,
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=100000,
+    )
+    return parser.parse_args(argv)
+
+
+def main(
+    table: str,
+    rows: int,
+    chunk_size: int,
+):
+    path = get_csv_path(table)
+    temp_dir = None
+    if not os.path.exists(path):
+        if (
+            table
+            != "taiwan_stock_price"
+        ):
+            raise FileNotFoundError(
+                path
+            )
+        temp_dir = (
+            tempfile.TemporaryDirectory()
+        )
+        path = os.path.join(
+            temp_dir.name,
+            f"{table}.csv",
+        )
+        create_price_csv(path, rows)
+    print(
+        f"{path}, {os.path.getsize(path) / 1024 ** 2:.1f} MB"
+    )
+    print(
+        benchmark(
+            path,
+            get_create_table_sql(table),
+            chunk_size=chunk_size,
+        ).to_string(index=False)
+    )
+    if temp_dir is not None:
+        temp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    main(
+        args.table,
+        rows=args.rows,
+        chunk_size=args.chunk_size,
+    )
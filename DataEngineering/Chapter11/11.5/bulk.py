@@ -0,0 +1,364 @@
+"""
+可以中斷後繼續的 bulk load, 寫入前先移除 secondary index, 寫完再一次重建,
+已經 commit 的 chunk 記錄在 checkpoint 檔, 重跑時略過, 最後比對筆數與 checksum
+"""
+
+import json
+import os
+import typing
+
+import pandas as pd
+from loguru import logger
+from sqlalchemy import create_engine
+
+from loader import parallel_upload
+
+
+class Checkpoint:
+    """checkpoint 檔, 每個 chunk commit 後立刻寫入"""
+
+    def __init__(
+        self,
+        path: str,
+        table: str,
+        chunk_size: int,
+    ):
+        self.path = path
+        self.table = table
+        self.chunk_size = chunk_size
+        # 移除的 secondary index, 寫完後重建
+        self.index_sql_list = []
+        self.index_dropped = False
+        # chunk 編號 -> (筆數, checksum)
+        self.done = {}
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        table: str,
+        chunk_size: int,
+    ) -> "Checkpoint":
+        checkpoint = cls(
+            path, table, chunk_size
+        )
+        if not os.path.exists(path):
+            return checkpoint
+        with open(
+            path, encoding="utf8"
+        ) as f:
+            data = json.load(f)
+        if (
+            data["table"] != table
+            or data["chunk_size"]
+            != chunk_size
+        ):
+            raise ValueError(
+                f"{path} is for {data['table']} chunk_size {data['chunk_size']}, "
+                "remove it to start over"
+            )
+        checkpoint.index_sql_list = (
+            data["index_sql_list"]
+        )
+        checkpoint.index_dropped = data[
+            "index_dropped"
+        ]
+        checkpoint.done = {
+            int(index): tuple(value)
+            for index, value in data[
+                "done"
+            ].items()
+        }
+        return checkpoint
+
+    def save(self):
+        """先寫暫存檔再 rename, 中斷時不會留下寫到一半的檔案"""
+        temp_path = f"{self.path}.tmp"
+        with open(
+            temp_path,
+            "w",
+            encoding="utf8",
+        ) as f:
+            json.dump(
+                dict(
+                    table=self.table,
+                    chunk_size=self.chunk_size,
+                    index_sql_list=self.index_sql_list,
+                    index_dropped=self.index_dropped,
+                    done={
+                        str(
+                            index
+                        ): list(value)
+                        for index, value in self.done.items()
+                    },
+                ),
+                f,
+            )
+        os.replace(temp_path, self.path)
+
+    def commit(
+        self,
+        index: int,
+        rows: int,
+        checksum: int,
+    ):
+        self.done[index] = (
+            rows,
+            checksum,
+        )
+        self.save()
+
+    @property
+    def rows(self) -> int:
+        return sum(
+            rows
+            for rows, _ in self.done.values()
+        )
+
+    @property
+    def checksum(self) -> int:
+        return sum(
+            checksum
+            for _, checksum in self.done.values()
+        )
+
+
+def get_key_list(
+    mysql_conn, table: str
+) -> typing.List[str]:
+    return [
+        column
+        for column, in mysql_conn.execute(
+            f"""
+            SELECT COLUMN_NAME FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME = '{table}'
+            AND INDEX_NAME = 'PRIMARY'
+            ORDER BY SEQ_IN_INDEX
+            """
+        ).fetchall()
+    ]
+
+
+def get_index_sql_list(
+    statistics: typing.List[
+        typing.Tuple[
+            str,
+            int,
+            str,
+            typing.Optional[int],
+        ]
+    ],
+) -> typing.List[str]:
+    """information_schema.STATISTICS 的
+    (INDEX_NAME, NON_UNIQUE, COLUMN_NAME, SUB_PART), 依照 SEQ_IN_INDEX 排序,
+    轉成 ALTER TABLE 的 ADD INDEX, PRIMARY KEY 不包含在內
+    """
+    index_dict = {}
+    unique_dict = {}
+    for (
+        name,
+        non_unique,
+        column,
+        sub_part,
+    ) in statistics:
+        if name == "PRIMARY":
+            continue
+        index_dict.setdefault(
+            name, []
+        ).append(
+            f"`{column}`({sub_part})"
+            if sub_part
+            else f"`{column}`"
+        )
+        unique_dict[name] = not int(
+            non_unique
+        )
+    return [
+        f"ADD {'UNIQUE ' if unique_dict[name] else ''}INDEX `{name}`({', '.join(column_list)})"
+        for name, column_list in index_dict.items()
+    ]
+
+
+def get_drop_index_sql(
+    table: str,
+    index_sql_list: typing.List[str],
+) -> str:
+    return (
+        f"ALTER TABLE `{table}` "
+        + ", ".join(
+            "DROP INDEX "
+            + index_sql.split("INDEX ")[
+                1
+            ].split("(")[0]
+            for index_sql in index_sql_list
+        )
+    )
+
+
+def drop_secondary_index(
+    mysql_conn,
+    checkpoint: Checkpoint,
+):
+    """移除前先記錄要重建的 index, ALTER 成功後才記錄已移除,
+    ALTER 前後中斷時, 以第一次記錄的 index 為準, 只移除還存在的
+    """
+    if checkpoint.index_dropped:
+        return
+    index_sql_list = get_index_sql_list(
+        mysql_conn.execute(f"""
+            SELECT INDEX_NAME, NON_UNIQUE, COLUMN_NAME, SUB_PART
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME = '{checkpoint.table}'
+            ORDER BY INDEX_NAME, SEQ_IN_INDEX
+            """).fetchall()
+    )
+    if not checkpoint.index_sql_list:
+        checkpoint.index_sql_list = (
+            index_sql_list
+        )
+        checkpoint.save()
+    drop_list = [
+        index_sql
+        for index_sql in checkpoint.index_sql_list
+        if index_sql in index_sql_list
+    ]
+    if drop_list:
+        sql = get_drop_index_sql(
+            checkpoint.table, drop_list
+        )
+        logger.info(sql)
+        mysql_conn.execute(sql)
+    checkpoint.index_dropped = True
+    checkpoint.save()
+
+
+def check_empty(mysql_conn, table: str):
+    """沒有 checkpoint 時, table 必須是空的, 否則筆數與 checksum 無法比對"""
+    if mysql_conn.execute(
+        f"SELECT 1 FROM `{table}` LIMIT 1"
+    ).fetchone():
+        raise ValueError(
+            f"{table} is not empty, bulk load needs an empty table"
+        )
+
+
+def rebuild_secondary_index(
+    mysql_conn,
+    checkpoint: Checkpoint,
+):
+    """一個 ALTER TABLE 重建全部 index, 只需要掃描一次資料"""
+    if not checkpoint.index_sql_list:
+        return
+    sql = (
+        f"ALTER TABLE `{checkpoint.table}` "
+        + ", ".join(
+            checkpoint.index_sql_list
+        )
+    )
+    logger.info(sql)
+    mysql_conn.execute(sql)
+    checkpoint.index_sql_list = []
+    checkpoint.save()
+
+
+def verify(
+    mysql_conn,
+    table: str,
+    key_list: typing.List[str],
+    checkpoint: Checkpoint,
+):
+    """table 的筆數, primary key checksum, 需要與寫入的 chunk 加總相同"""
+    columns = ",".join(
+        f"`{key}`" for key in key_list
+    )
+    checksum_sql = (
+        f"SUM(CRC32(CONCAT_WS('|',{columns})))"
+        if key_list
+        else "0"
+    )
+    rows, checksum = mysql_conn.execute(
+        f"SELECT COUNT(*), {checksum_sql} FROM `{table}`"
+    ).fetchone()
+    if (
+        int(rows) != checkpoint.rows
+        or int(checksum or 0)
+        != checkpoint.checksum
+    ):
+        raise ValueError(
+            f"{table} verify failed, "
+            f"mysql {rows} rows checksum {checksum}, "
+            f"file {checkpoint.rows} rows checksum {checkpoint.checksum}"
+        )
+    logger.info(
+        f"{table} verify ok, {rows} rows"
+    )
+
+
+def bulk_upload(
+    chunk_iter: typing.Iterator[
+        pd.DataFrame
+    ],
+    table: str,
+    address: str,
+    chunk_size: int,
+    workers: int = 4,
+    method: str = "multi",
+    checkpoint_path: str = "",
+):
+    """寫入新建立的空 table, 中斷後以相同參數重跑, 從上次的位置繼續,
+    完成並驗證後刪除 checkpoint 檔
+    """
+    checkpoint_path = (
+        checkpoint_path
+        or f"{table}.checkpoint.json"
+    )
+    resume = os.path.exists(
+        checkpoint_path
+    )
+    checkpoint = Checkpoint.load(
+        checkpoint_path,
+        table,
+        chunk_size,
+    )
+    if checkpoint.done:
+        logger.info(
+            f"resume {table}, {len(checkpoint.done)} chunks done"
+        )
+    engine = create_engine(address)
+    with engine.connect() as mysql_conn:
+        if not resume:
+            check_empty(
+                mysql_conn, table
+            )
+        key_list = get_key_list(
+            mysql_conn, table
+        )
+        drop_secondary_index(
+            mysql_conn, checkpoint
+        )
+        parallel_upload(
+            chunk_iter,
+            table=table,
+            address=address,
+            workers=workers,
+            method=method,
+            bulk=True,
+            key_list=key_list,
+            skip_set=set(
+                checkpoint.done
+            ),
+            on_commit=checkpoint.commit,
+        )
+        rebuild_secondary_index(
+            mysql_conn, checkpoint
+        )
+        verify(
+            mysql_conn,
+            table,
+            key_list,
+            checkpoint,
+        )
+    engine.dispose()
+    os.remove(checkpoint_path)
@@ -0,0 +1,46 @@
+"""
+將 csv 轉為依照年度分割的 parquet, 並打包成 release 使用的 zip, 例如:
+    pipenv run python csv2parquet.py taiwan_stock_price
+"""
+
+import sys
+
+from parquet import (
+    csv2parquet,
+    get_parquet_dir,
+    get_zip_path,
+    pack,
+)
+from schema import (
+    get_arrow_type_dict,
+    get_date_column,
+)
+from upload_data2mysql import (
+    get_create_table_sql,
+)
+
+
+def main(
+    table: str,
+    row_group_size: int = 100000,
+):
+    sql = get_create_table_sql(table)
+    csv2parquet(
+        f"{table}.csv",
+        get_parquet_dir(table),
+        type_dict=get_arrow_type_dict(
+            sql
+        ),
+        date_column=get_date_column(
+            sql
+        ),
+        row_group_size=row_group_size,
+    )
+    pack(
+        get_parquet_dir(table),
+        get_zip_path(table),
+    )
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -0,0 +1,155 @@
+"""
+依照 create_*_sql() 的欄位型態讀取 csv, 不需要每個 chunk 推斷型態,
+StockID 等代碼保留開頭的 0, .gz, .zst 檔案直接串流解壓縮讀取
+"""
+
+import os
+import typing
+
+import pandas as pd
+
+from download import (
+    COMPRESSED_SUFFIX_LIST,
+    open_decompress,
+)
+from schema import (
+    get_arrow_type_dict,
+    get_dtype_dict,
+    get_parse_dates,
+)
+
+# pandas: pd.read_csv, pyarrow: 多執行緒解析, 速度較快
+ENGINE_LIST = ["pandas", "pyarrow"]
+
+
+def get_csv_path(table: str) -> str:
+    """依序尋找未壓縮, 壓縮的 csv, 都不存在時回傳未壓縮的檔名"""
+    for path in [f"{table}.csv"] + [
+        f"{table}.csv{suffix}"
+        for suffix in COMPRESSED_SUFFIX_LIST
+    ]:
+        if os.path.exists(path):
+            return path
+    return f"{table}.csv"
+
+
+def open_input(path: str):
+    if any(
+        path.endswith(suffix)
+        for suffix in COMPRESSED_SUFFIX_LIST
+    ):
+        return open_decompress(path)
+    return open(path, "rb")
+
+
+def get_header(
+    path: str,
+) -> typing.List[str]:
+    with open_input(path) as f:
+        return pd.read_csv(
+            f, nrows=0
+        ).columns.tolist()
+
+
+def read_csv_pandas(
+    path: str,
+    sql: str,
+    chunk_size: int,
+) -> typing.Iterator[pd.DataFrame]:
+    columns = set(get_header(path))
+    dtype_dict = {
+        name: dtype
+        for name, dtype in get_dtype_dict(
+            sql
+        ).items()
+        if name in columns
+    }
+    parse_dates = [
+        name
+        for name in get_parse_dates(sql)
+        if name in columns
+    ]
+    with open_input(path) as f:
+        for df in pd.read_csv(
+            f,
+            dtype=dtype_dict,
+            parse_dates=parse_dates,
+            chunksize=chunk_size,
+        ):
+            yield df
+
+
+def read_csv_pyarrow(
+    path: str,
+    sql: str,
+    chunk_size: int,
+) -> typing.Iterator[pd.DataFrame]:
+    """pyarrow 依照 block 切分, 重新切成 chunk_size 筆,
+    與 pandas 的 chunk 相同, bulk load 的 checkpoint 可以互用
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    def to_pandas(
+        table: pa.Table,
+    ) -> pd.DataFrame:
+        return table.to_pandas(
+            date_as_object=False
+        )
+
+    with open_input(path) as f:
+        csv_reader = pa_csv.open_csv(
+            f,
+            convert_options=pa_csv.ConvertOptions(
+                column_types=get_arrow_type_dict(
+                    sql
+                )
+            ),
+        )
+        batch_list = []
+        rows = 0
+        for batch in csv_reader:
+            batch_list.append(batch)
+            rows += batch.num_rows
+            while rows >= chunk_size:
+                table = pa.Table.from_batches(
+                    batch_list
+                )
+                yield to_pandas(
+                    table.slice(
+                        0, chunk_size
+                    )
+                )
+                batch_list = (
+                    table.slice(
+                        chunk_size
+                    ).to_batches()
+                )
+                rows -= chunk_size
+        if rows:
+            yield to_pandas(
+                pa.Table.from_batches(
+                    batch_list
+                )
+            )
+
+
+READ_FUNC = {
+    "pandas": read_csv_pandas,
+    "pyarrow": read_csv_pyarrow,
+}
+
+
+def read_csv(
+    path: str,
+    sql: str,
+    chunk_size: int = 100000,
+    engine: str = "pandas",
+) -> typing.Iterator[pd.DataFrame]:
+    if engine not in READ_FUNC:
+        raise ValueError(
+            f"engine must be one of {ENGINE_LIST}"
+        )
+    return READ_FUNC[engine](
+        path, sql, chunk_size
+    )
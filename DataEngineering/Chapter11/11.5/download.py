@@ -0,0 +1,413 @@
+"""
+下載 release 的資料檔, 檔案切成多段, 以 HTTP Range 平行下載,
+每段寫入各自的 .part 檔, 中斷後重跑只下載缺少的部分,
+合併時計算 sha256, 與 manifest.json 比對, 通過後才 rename 成正式檔名,
+.gz, .zst 檔案下載後串流解壓縮, 產生 manifest, 例如:
+    pipenv run python download.py manifest taiwan_stock_price.csv.gz
+"""
+
+import concurrent.futures
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import typing
+
+import requests
+from loguru import logger
+
+MANIFEST = "manifest.json"
+# 每段的大小, 段落切法只由檔案大小決定, 中斷後重跑時一致
+PART_SIZE = 32 * 1024 * 1024
+# 讀寫檔案, 串流下載時每次的大小
+BUFFER_SIZE = 1024 * 1024
+RETRY = 3
+TIMEOUT = 30
+COMPRESSED_SUFFIX_LIST = [
+    ".gz",
+    ".zst",
+]
+# 避免 server 壓縮回應, 造成 Range 的位置與檔案不一致
+HEADERS = {
+    "Accept-Encoding": "identity"
+}
+
+
+def get_sha256(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(
+            lambda: f.read(BUFFER_SIZE),
+            b"",
+        ):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def create_manifest(
+    path_list: typing.List[str],
+) -> typing.Dict[
+    str, typing.Dict[str, typing.Any]
+]:
+    """release 上傳的檔案, 檔名對應大小與 sha256"""
+    return {
+        os.path.basename(path): dict(
+            size=os.path.getsize(path),
+            sha256=get_sha256(path),
+        )
+        for path in path_list
+    }
+
+
+def get_manifest(
+    base_url: str,
+) -> typing.Dict[
+    str, typing.Dict[str, typing.Any]
+]:
+    """release 沒有 manifest 時回傳空的 dict, 下載後不驗證"""
+    try:
+        response = requests.get(
+            f"{base_url}/{MANIFEST}",
+            timeout=TIMEOUT,
+        )
+        response.raise_for_status()
+        return response.json()
+    except (
+        requests.RequestException,
+        ValueError,
+    ) as e:
+        logger.info(
+            f"{MANIFEST} not found, {e}"
+        )
+        return {}
+
+
+def get_remote_info(
+    session: requests.Session,
+    url: str,
+) -> typing.Tuple[int, bool]:
+    """回傳 (檔案大小, 是否支援 Range)"""
+    response = session.head(
+        url,
+        headers=HEADERS,
+        allow_redirects=True,
+        timeout=TIMEOUT,
+    )
+    response.raise_for_status()
+    return (
+        int(
+            response.headers.get(
+                "Content-Length", -1
+            )
+        ),
+        response.headers.get(
+            "Accept-Ranges"
+        )
+        == "bytes",
+    )
+
+
+def get_part_list(
+    size: int, part_size: int
+) -> typing.List[
+    typing.Tuple[int, int]
+]:
+    """[start, end] 包含 end, 與 Range header 相同"""
+    return [
+        (
+            start,
+            min(start + part_size, size)
+            - 1,
+        )
+        for start in range(
+            0, size, part_size
+        )
+    ]
+
+
+def get_part_path(
+    path: str, index: int
+) -> str:
+    return f"{path}.part{index}"
+
+
+def download_part(
+    session: requests.Session,
+    url: str,
+    part_path: str,
+    start: int,
+    end: int,
+):
+    """.part 檔已經有的部分不再下載, 從缺少的位置繼續"""
+    expected = end - start + 1
+    for retry in range(RETRY):
+        done = (
+            os.path.getsize(part_path)
+            if os.path.exists(part_path)
+            else 0
+        )
+        if done == expected:
+            return
+        if done > expected:
+            os.remove(part_path)
+            done = 0
+        try:
+            with session.get(
+                url,
+                headers=dict(
+                    HEADERS,
+                    Range=f"bytes={start + done}-{end}",
+                ),
+                stream=True,
+                timeout=TIMEOUT,
+            ) as response:
+                response.raise_for_status()
+                if (
+                    response.status_code
+                    != 206
+                ):
+                    raise ValueError(
+                        f"{url} does not support range"
+                    )
+                with open(
+                    part_path, "ab"
+                ) as f:
+                    for (
+                        chunk
+                    ) in response.iter_content(
+                        BUFFER_SIZE
+                    ):
+                        f.write(chunk)
+        except (
+            requests.RequestException
+        ) as e:
+            logger.info(
+                f"{part_path} retry {retry}, {e}"
+            )
+    if (
+        os.path.exists(part_path)
+        and os.path.getsize(part_path)
+        == expected
+    ):
+        return
+    raise IOError(
+        f"{part_path} download failed"
+    )
+
+
+def download_stream(
+    session: requests.Session,
+    url: str,
+    part_path: str,
+):
+    """server 不支援 Range 時, 只能從頭下載"""
+    with session.get(
+        url,
+        headers=HEADERS,
+        stream=True,
+        timeout=TIMEOUT,
+    ) as response:
+        response.raise_for_status()
+        with open(part_path, "wb") as f:
+            for (
+                chunk
+            ) in response.iter_content(
+                BUFFER_SIZE
+            ):
+                f.write(chunk)
+
+
+def merge_part(
+    path: str,
+    part_count: int,
+    temp_path: str,
+) -> str:
+    """依序合併 .part 檔, 同時計算 sha256"""
+    sha256 = hashlib.sha256()
+    with open(
+        temp_path, "wb"
+    ) as output:
+        for index in range(part_count):
+            with open(
+                get_part_path(
+                    path, index
+                ),
+                "rb",
+            ) as f:
+                for chunk in iter(
+                    lambda: f.read(
+                        BUFFER_SIZE
+                    ),
+                    b"",
+                ):
+                    sha256.update(chunk)
+                    output.write(chunk)
+    return sha256.hexdigest()
+
+
+def download(
+    url: str,
+    path: str,
+    size: int = -1,
+    sha256: str = "",
+    workers: int = 4,
+    part_size: int = PART_SIZE,
+) -> str:
+    """檔案只有在驗證通過後才會出現, 已經存在表示下載完成"""
+    if os.path.exists(path):
+        logger.info(
+            f"{path} already download"
+        )
+        return path
+    session = requests.Session()
+    remote_size, accept_range = (
+        get_remote_info(session, url)
+    )
+    size = (
+        remote_size
+        if size < 0
+        else size
+    )
+    if accept_range and size > 0:
+        part_list = get_part_list(
+            size, part_size
+        )
+        with concurrent.futures.ThreadPoolExecutor(
+            workers
+        ) as executor:
+            for future in [
+                executor.submit(
+                    download_part,
+                    session,
+                    url,
+                    get_part_path(
+                        path, index
+                    ),
+                    start,
+                    end,
+                )
+                for index, (
+                    start,
+                    end,
+                ) in enumerate(
+                    part_list
+                )
+            ]:
+                future.result()
+        part_count = len(part_list)
+    else:
+        download_stream(
+            session,
+            url,
+            get_part_path(path, 0),
+        )
+        part_count = 1
+    temp_path = f"{path}.tmp"
+    digest = merge_part(
+        path, part_count, temp_path
+    )
+    for index in range(part_count):
+        os.remove(
+            get_part_path(path, index)
+        )
+    if sha256 and digest != sha256:
+        os.remove(temp_path)
+        raise ValueError(
+            f"{path} sha256 {digest} != {sha256}"
+        )
+    os.replace(temp_path, path)
+    logger.info(
+        f"{path} download complete"
+    )
+    return path
+
+
+def open_decompress(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    # zstandard 只有 .zst 檔案需要
+    import zstandard
+
+    return zstandard.ZstdDecompressor().stream_reader(
+        open(path, "rb"),
+        closefd=True,
+    )
+
+
+def get_decompress_path(
+    path: str,
+) -> str:
+    for (
+        suffix
+    ) in COMPRESSED_SUFFIX_LIST:
+        if path.endswith(suffix):
+            return path[: -len(suffix)]
+    return path
+
+
+def decompress(path: str) -> str:
+    """串流解壓縮, 不需要整個檔案讀入記憶體, 完成後刪除壓縮檔"""
+    target = get_decompress_path(path)
+    temp_path = f"{target}.tmp"
+    with open_decompress(
+        path
+    ) as f, open(
+        temp_path, "wb"
+    ) as output:
+        shutil.copyfileobj(
+            f, output, BUFFER_SIZE
+        )
+    os.replace(temp_path, target)
+    os.remove(path)
+    return target
+
+
+def fetch(
+    base_url: str,
+    name: str,
+    manifest: typing.Dict[
+        str,
+        typing.Dict[str, typing.Any],
+    ],
+    workers: int = 4,
+) -> str:
+    """下載 release 的檔案, 回傳解壓縮後的路徑"""
+    target = get_decompress_path(name)
+    if (
+        target != name
+        and os.path.exists(target)
+    ):
+        logger.info(
+            f"{target} already download"
+        )
+        return target
+    entry = manifest.get(name, {})
+    path = download(
+        f"{base_url}/{name}",
+        name,
+        size=entry.get("size", -1),
+        sha256=entry.get("sha256", ""),
+        workers=workers,
+    )
+    if target != name:
+        return decompress(path)
+    return path
+
+
+if __name__ == "__main__":
+    command, *path_list = sys.argv[1:]
+    if command == "manifest":
+        with open(
+            MANIFEST,
+            "w",
+            encoding="utf8",
+        ) as f:
+            json.dump(
+                create_manifest(
+                    path_list
+                ),
+                f,
+                indent=2,
+            )
@@ -0,0 +1,481 @@
+"""
+平行上傳, 一個 reader thread 讀取 csv, 放入有上限的 queue,
+多個 writer process 各自使用一條連線寫入 mysql
+"""
+
+import datetime
+import multiprocessing
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+import typing
+import zlib
+
+import pandas as pd
+from loguru import logger
+from sqlalchemy import create_engine
+from tqdm import tqdm
+
+# multi: 多筆一個 INSERT, load_data: 寫成暫存檔後 LOAD DATA LOCAL INFILE,
+# load_data 需要 mysql 開啟 local_infile
+WRITE_METHOD_LIST = [
+    "multi",
+    "load_data",
+]
+# multi 模式, 一個 INSERT 包含的筆數
+INSERT_BATCH_SIZE = 1000
+# bulk 模式, 每條連線關閉檢查, 加快寫入
+BULK_SESSION_SQL_LIST = [
+    "SET SESSION unique_checks = 0",
+    "SET SESSION foreign_key_checks = 0",
+]
+
+
+def insert_ignore(
+    pd_table, conn, keys, data_iter
+):
+    """to_sql 的 method, 多筆一個 INSERT IGNORE,
+    已經寫入的資料重複寫入時略過, 中斷後重跑不會失敗
+    """
+    columns = ",".join(
+        f"`{key}`" for key in keys
+    )
+    placeholder = ",".join(
+        ["%s"] * len(keys)
+    )
+    conn.execute(
+        f"INSERT IGNORE INTO `{pd_table.name}`({columns}) VALUES ({placeholder})",
+        list(data_iter),
+    )
+
+
+def write_multi(
+    df: pd.DataFrame,
+    table: str,
+    mysql_conn,
+    ignore: bool = False,
+):
+    df.to_sql(
+        name=table,
+        con=mysql_conn,
+        if_exists="append",
+        index=False,
+        method=(
+            insert_ignore
+            if ignore
+            else "multi"
+        ),
+        chunksize=INSERT_BATCH_SIZE,
+    )
+
+
+def write_load_data(
+    df: pd.DataFrame,
+    table: str,
+    mysql_conn,
+    ignore: bool = False,
+):
+    """mysql 直接解析檔案, 不需要組 INSERT, 速度最快"""
+    fd, path = tempfile.mkstemp(
+        suffix=".csv"
+    )
+    os.close(fd)
+    try:
+        df.to_csv(
+            path,
+            index=False,
+            header=False,
+            na_rep="\\N",
+        )
+        columns = ",".join(
+            f"`{column}`"
+            for column in df.columns
+        )
+        mysql_conn.execute(f"""
+            LOAD DATA LOCAL INFILE '{path}'
+            {"IGNORE" if ignore else ""} INTO TABLE `{table}`
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+            LINES TERMINATED BY '\\n'
+            ({columns})
+            """)
+    finally:
+        os.remove(path)
+
+
+WRITE_FUNC = {
+    "multi": write_multi,
+    "load_data": write_load_data,
+}
+
+
+def to_checksum_text(value) -> str:
+    """與 mysql CONCAT_WS 的結果一致, DATE 為 YYYY-MM-DD"""
+    if isinstance(
+        value,
+        (
+            pd.Timestamp,
+            datetime.date,
+        ),
+    ):
+        return value.strftime(
+            "%Y-%m-%d"
+        )
+    return str(value)
+
+
+def get_checksum(
+    df: pd.DataFrame,
+    key_list: typing.List[str],
+) -> int:
+    """與 mysql SUM(CRC32(CONCAT_WS('|', key...))) 相同"""
+    if not key_list:
+        return 0
+    return sum(
+        zlib.crc32(
+            "|".join(
+                to_checksum_text(value)
+                for value in row
+            ).encode("utf8")
+        )
+        for row in df[
+            key_list
+        ].itertuples(
+            index=False, name=None
+        )
+    )
+
+
+def write_chunks(
+    address: str,
+    table: str,
+    method: str,
+    chunk_queue: multiprocessing.Queue,
+    result_queue: multiprocessing.Queue,
+    bulk: bool,
+    key_list: typing.List[str],
+):
+    engine = create_engine(
+        address,
+        connect_args=dict(
+            local_infile=True
+        ),
+    )
+    with engine.connect() as mysql_conn:
+        if bulk:
+            for (
+                sql
+            ) in BULK_SESSION_SQL_LIST:
+                mysql_conn.execute(sql)
+        while True:
+            item = chunk_queue.get()
+            if item is None:
+                break
+            index, df = item
+            try:
+                if bulk:
+                    with mysql_conn.begin():
+                        WRITE_FUNC[
+                            method
+                        ](
+                            df,
+                            table,
+                            mysql_conn,
+                            ignore=True,
+                        )
+                else:
+                    WRITE_FUNC[method](
+                        df,
+                        table,
+                        mysql_conn,
+                    )
+                result_queue.put(
+                    (
+                        index,
+                        len(df),
+                        get_checksum(
+                            df,
+                            key_list
+                            or [],
+                        ),
+                        "",
+                    )
+                )
+            except Exception as e:
+                result_queue.put(
+                    (
+                        index,
+                        0,
+                        0,
+                        str(e),
+                    )
+                )
+    engine.dispose()
+
+
+def writer(
+    address: str,
+    table: str,
+    method: str,
+    chunk_queue: multiprocessing.Queue,
+    result_queue: multiprocessing.Queue,
+    bulk: bool = False,
+    key_list: typing.List[str] = None,
+):
+    """writer process, 拿到 None 時結束,
+    每個 chunk 寫完回傳 (chunk 編號, 筆數, checksum, 錯誤訊息),
+    bulk 模式每個 chunk 一個 transaction, commit 後才回傳,
+    連線失敗等 chunk 以外的錯誤, 以 chunk 編號 -1 回傳後結束
+    """
+    try:
+        write_chunks(
+            address,
+            table,
+            method,
+            chunk_queue,
+            result_queue,
+            bulk,
+            key_list,
+        )
+    except Exception as e:
+        result_queue.put(
+            (-1, 0, 0, str(e))
+        )
+        sys.exit(1)
+
+
+def put_until_stop(
+    chunk_queue: multiprocessing.Queue,
+    item,
+    stop_event: threading.Event,
+) -> bool:
+    """queue 滿時等待, 停止時放棄, 回傳是否放入"""
+    while not stop_event.is_set():
+        try:
+            chunk_queue.put(
+                item, timeout=1
+            )
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def reader(
+    chunk_iter: typing.Iterator[
+        pd.DataFrame
+    ],
+    chunk_queue: multiprocessing.Queue,
+    workers: int,
+    stop_event: threading.Event,
+    skip_set: typing.Set[int],
+    error_list: typing.List[str],
+):
+    """queue 滿時會等待 writer, 記憶體中最多只有 queue 上限個 chunk,
+    skip_set 為已經寫入的 chunk 編號, 不再放入 queue,
+    讀取失敗時錯誤訊息放入 error_list
+    """
+    try:
+        for index, df in enumerate(
+            chunk_iter
+        ):
+            if index in skip_set:
+                continue
+            if not put_until_stop(
+                chunk_queue,
+                (index, df),
+                stop_event,
+            ):
+                break
+    except Exception as e:
+        error_list.append(f"read: {e}")
+        stop_event.set()
+    finally:
+        # writer 已經停止時 queue 不會再有空間, 不能無限等待
+        for _ in range(workers):
+            if not put_until_stop(
+                chunk_queue,
+                None,
+                stop_event,
+            ):
+                break
+
+
+def handle_result(
+    result: typing.Tuple[
+        int, int, int, str
+    ],
+    progress: tqdm,
+    on_commit: typing.Optional[
+        typing.Callable[
+            [int, int, int], None
+        ]
+    ],
+) -> str:
+    """回傳錯誤訊息, 沒有錯誤時回傳空字串"""
+    index, count, checksum, message = (
+        result
+    )
+    if message:
+        return (
+            f"chunk {index}: {message}"
+        )
+    progress.update(count)
+    if on_commit is not None:
+        on_commit(
+            index, count, checksum
+        )
+    return ""
+
+
+def get_exit_error(
+    process_list: typing.List[
+        multiprocessing.Process
+    ],
+    reader_error_list: typing.List[str],
+) -> str:
+    """reader 讀取失敗, 或 writer 沒有回傳結果就異常結束, 例如被 kill"""
+    if reader_error_list:
+        return reader_error_list[0]
+    for process in process_list:
+        if process.exitcode not in (
+            None,
+            0,
+        ):
+            return f"writer exited with code {process.exitcode}"
+    return ""
+
+
+def parallel_upload(
+    chunk_iter: typing.Iterator[
+        pd.DataFrame
+    ],
+    table: str,
+    address: str,
+    workers: int = 4,
+    method: str = "multi",
+    queue_size: int = 0,
+    bulk: bool = False,
+    key_list: typing.List[str] = None,
+    skip_set: typing.Set[int] = None,
+    on_commit: typing.Callable[
+        [int, int, int], None
+    ] = None,
+) -> int:
+    """回傳上傳筆數, 任一個 chunk 寫入失敗時, 停止讀取並 raise,
+    每個 chunk 寫入後呼叫 on_commit(chunk 編號, 筆數, checksum)
+    """
+    if method not in WRITE_FUNC:
+        raise ValueError(
+            f"method must be one of {WRITE_METHOD_LIST}"
+        )
+    chunk_queue = multiprocessing.Queue(
+        queue_size or workers * 2
+    )
+    result_queue = (
+        multiprocessing.Queue()
+    )
+    process_list = [
+        multiprocessing.Process(
+            target=writer,
+            args=(
+                address,
+                table,
+                method,
+                chunk_queue,
+                result_queue,
+                bulk,
+                key_list,
+            ),
+            daemon=True,
+        )
+        for _ in range(workers)
+    ]
+    for process in process_list:
+        process.start()
+    stop_event = threading.Event()
+    reader_error_list = []
+    reader_thread = threading.Thread(
+        target=reader,
+        args=(
+            chunk_iter,
+            chunk_queue,
+            workers,
+            stop_event,
+            skip_set or set(),
+            reader_error_list,
+        ),
+        daemon=True,
+    )
+    reader_thread.start()
+    rows = 0
+    error = ""
+    start = time.time()
+    with tqdm(
+        unit="rows", unit_scale=True
+    ) as progress:
+        while reader_thread.is_alive() or any(
+            process.is_alive()
+            for process in process_list
+        ):
+            try:
+                result = (
+                    result_queue.get(
+                        timeout=1
+                    )
+                )
+            except queue.Empty:
+                error = (
+                    error
+                    or get_exit_error(
+                        process_list,
+                        reader_error_list,
+                    )
+                )
+                if error:
+                    stop_event.set()
+                # 停止後 reader 結束即離開, 不等待仍在寫入的 writer
+                if (
+                    stop_event.is_set()
+                    and not reader_thread.is_alive()
+                ):
+                    break
+                continue
+            message = handle_result(
+                result,
+                progress,
+                on_commit,
+            )
+            if message:
+                error = error or message
+                stop_event.set()
+            else:
+                rows += result[1]
+        # process 結束前放入 queue 的結果
+        while not result_queue.empty():
+            result = result_queue.get()
+            message = handle_result(
+                result,
+                progress,
+                on_commit,
+            )
+            error = error or message
+            if not message:
+                rows += result[1]
+    error = error or get_exit_error(
+        process_list, reader_error_list
+    )
+    for process in process_list:
+        if error and process.is_alive():
+            process.terminate()
+        process.join()
+    seconds = time.time() - start
+    logger.info(
+        f"upload {table} {rows} rows, "
+        f"{seconds:.1f} s, {rows / max(seconds, 1e-6):.0f} rows/sec"
+    )
+    if error:
+        raise RuntimeError(error)
+    return rows
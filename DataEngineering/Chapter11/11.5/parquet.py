@@ -0,0 +1,297 @@
+"""
+parquet 格式的資料集, 依照年度分割, 例如
+    taiwan_stock_price.parquet/year=2021/part-0.parquet
+欄位型態寫在檔案內, 讀取時不需要推斷, 多個 row group 平行讀取後依序交給 writer
+"""
+
+import collections
+import concurrent.futures
+import glob
+import os
+import shutil
+import tempfile
+import typing
+import zipfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from loguru import logger
+
+# 壓縮率比預設的 snappy 高, 發布時下載較小
+COMPRESSION = "zstd"
+# 沒有日期欄位, 或日期為空值時的分割名稱
+NO_YEAR = "all"
+
+
+def get_parquet_dir(table: str) -> str:
+    return f"{table}.parquet"
+
+
+def get_zip_path(table: str) -> str:
+    """發布用的單一檔案, parquet 已經壓縮, zip 只是打包"""
+    return f"{table}.parquet.zip"
+
+
+def get_partition_path(
+    parquet_dir: str, year: str
+) -> str:
+    return os.path.join(
+        parquet_dir,
+        f"year={year}",
+        "part-0.parquet",
+    )
+
+
+def split_by_year(
+    batch: pa.RecordBatch,
+    date_column: str,
+) -> typing.Dict[str, pa.RecordBatch]:
+    if not date_column:
+        return {NO_YEAR: batch}
+    year_array = pc.year(
+        batch.column(date_column)
+    )
+    batch_dict = {}
+    for year in pc.unique(
+        year_array
+    ).to_pylist():
+        mask = (
+            pc.is_null(year_array)
+            if year is None
+            else pc.equal(
+                year_array, year
+            )
+        )
+        batch_dict[
+            (
+                NO_YEAR
+                if year is None
+                else str(year)
+            )
+        ] = batch.filter(mask)
+    return batch_dict
+
+
+def csv2parquet(
+    csv_path: str,
+    parquet_dir: str,
+    type_dict: typing.Dict[
+        str, pa.DataType
+    ],
+    date_column: str = "",
+    row_group_size: int = 100000,
+) -> int:
+    """串流讀取 csv, 依照 type_dict 轉換型態, 每年一個檔案,
+    累積到 row_group_size 筆才寫入一個 row group, 回傳筆數
+    """
+    csv_reader = pa_csv.open_csv(
+        csv_path,
+        convert_options=pa_csv.ConvertOptions(
+            column_types=type_dict
+        ),
+    )
+    writer_dict = {}
+    buffer_dict = (
+        collections.defaultdict(list)
+    )
+    rows = 0
+
+    def flush(year: str):
+        table = pa.Table.from_batches(
+            buffer_dict.pop(year)
+        )
+        if year not in writer_dict:
+            path = get_partition_path(
+                parquet_dir, year
+            )
+            os.makedirs(
+                os.path.dirname(path),
+                exist_ok=True,
+            )
+            writer_dict[year] = (
+                pq.ParquetWriter(
+                    path,
+                    table.schema,
+                    compression=COMPRESSION,
+                )
+            )
+        writer_dict[year].write_table(
+            table,
+            row_group_size=row_group_size,
+        )
+
+    try:
+        for batch in csv_reader:
+            rows += batch.num_rows
+            for (
+                year,
+                year_batch,
+            ) in split_by_year(
+                batch, date_column
+            ).items():
+                buffer_dict[
+                    year
+                ].append(year_batch)
+                if (
+                    sum(
+                        item.num_rows
+                        for item in buffer_dict[
+                            year
+                        ]
+                    )
+                    >= row_group_size
+                ):
+                    flush(year)
+        for year in list(buffer_dict):
+            flush(year)
+    finally:
+        for (
+            writer
+        ) in writer_dict.values():
+            writer.close()
+    logger.info(
+        f"{csv_path} -> {parquet_dir}, {rows} rows, "
+        f"{len(writer_dict)} partitions"
+    )
+    return rows
+
+
+def get_row_group_list(
+    parquet_dir: str,
+) -> typing.List[
+    typing.Tuple[str, int]
+]:
+    """(檔案, row group 編號), 依照年度排序,
+    順序固定, bulk load 的 checkpoint 可以用來繼續
+    """
+    return [
+        (path, index)
+        for path in sorted(
+            glob.glob(
+                os.path.join(
+                    parquet_dir,
+                    "**",
+                    "*.parquet",
+                ),
+                recursive=True,
+            )
+        )
+        for index in range(
+            pq.ParquetFile(
+                path
+            ).num_row_groups
+        )
+    ]
+
+
+def read_row_group(
+    path: str, index: int
+) -> pd.DataFrame:
+    # 平行讀取多個 row group, 單一 row group 內不再開 thread
+    return (
+        pq.ParquetFile(path)
+        .read_row_group(
+            index, use_threads=False
+        )
+        .to_pandas()
+    )
+
+
+def read_parquet(
+    parquet_dir: str,
+    workers: int = 4,
+) -> typing.Iterator[pd.DataFrame]:
+    """多個 thread 讀取 row group, 依照順序回傳,
+    最多預先讀取 workers * 2 個, 記憶體用量固定
+    """
+    row_group_list = get_row_group_list(
+        parquet_dir
+    )
+    with concurrent.futures.ThreadPoolExecutor(
+        workers
+    ) as executor:
+        future_queue = (
+            collections.deque()
+        )
+        for (
+            path,
+            index,
+        ) in row_group_list:
+            future_queue.append(
+                executor.submit(
+                    read_row_group,
+                    path,
+                    index,
+                )
+            )
+            if (
+                len(future_queue)
+                >= workers * 2
+            ):
+                yield future_queue.popleft().result()
+        while future_queue:
+            yield future_queue.popleft().result()
+
+
+def pack(
+    parquet_dir: str, zip_path: str
+):
+    with zipfile.ZipFile(
+        zip_path,
+        "w",
+        zipfile.ZIP_STORED,
+    ) as f:
+        for path in sorted(
+            glob.glob(
+                os.path.join(
+                    parquet_dir,
+                    "**",
+                    "*.parquet",
+                ),
+                recursive=True,
+            )
+        ):
+            f.write(
+                path,
+                os.path.relpath(
+                    path,
+                    os.path.dirname(
+                        parquet_dir
+                    ),
+                ),
+            )
+
+
+def unpack(
+    zip_path: str, path: str = "."
+):
+    """先解壓縮到 path 內的暫存資料夾, 完成後才 rename 成正式的資料夾,
+    中斷時不會留下不完整的 parquet 資料夾
+    """
+    os.makedirs(path, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(
+        prefix=".unpack-", dir=path
+    )
+    try:
+        with zipfile.ZipFile(
+            zip_path
+        ) as f:
+            f.extractall(temp_dir)
+        for name in os.listdir(
+            temp_dir
+        ):
+            os.replace(
+                os.path.join(
+                    temp_dir, name
+                ),
+                os.path.join(
+                    path, name
+                ),
+            )
+    finally:
+        shutil.rmtree(
+            temp_dir, ignore_errors=True
+        )
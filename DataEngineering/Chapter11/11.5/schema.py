@@ -0,0 +1,129 @@
+"""
+由 create_*_sql() 的 CREATE TABLE 解析欄位型態,
+讀取 csv, parquet 時使用, 不需要每個 chunk 重新推斷型態
+"""
+
+import re
+import typing
+
+# `欄位名稱` 型態, 只有欄位定義以 ` 開頭, PRIMARY KEY, PARTITION 等不會符合
+COLUMN_PATTERN = re.compile(
+    r"^\s*`(\w+)`\s+(\w+)",
+    re.MULTILINE,
+)
+# 欄位名稱與整行定義, 判斷是否 NOT NULL
+NOT_NULL_PATTERN = re.compile(
+    r"^\s*`(\w+)`\s+(.*)$",
+    re.MULTILINE,
+)
+# mysql 型態對應 arrow 型態, float 使用 double, 避免轉換時產生誤差
+ARROW_TYPE = {
+    "varchar": "string",
+    "bigint": "int64",
+    "int": "int32",
+    "float": "float64",
+    "date": "date32",
+    "datetime": "timestamp",
+}
+# mysql 型態對應 pandas dtype, 可以是空值的整數欄位使用 Int64
+PANDAS_DTYPE = {
+    "varchar": "str",
+    "bigint": "int64",
+    "int": "int32",
+    "float": "float64",
+}
+NULLABLE_PANDAS_DTYPE = {
+    "bigint": "Int64",
+    "int": "Int32",
+}
+DATE_TYPE_LIST = ["date", "datetime"]
+
+
+def get_column_list(
+    sql: str,
+) -> typing.List[
+    typing.Tuple[str, str]
+]:
+    """回傳 (欄位名稱, 小寫的 mysql 型態)"""
+    return [
+        (name, type_.lower())
+        for name, type_ in COLUMN_PATTERN.findall(
+            sql
+        )
+    ]
+
+
+def get_not_null_set(
+    sql: str,
+) -> typing.Set[str]:
+    return {
+        name
+        for name, definition in NOT_NULL_PATTERN.findall(
+            sql
+        )
+        if "NOT NULL"
+        in definition.upper()
+    }
+
+
+def get_dtype_dict(
+    sql: str,
+) -> typing.Dict[str, str]:
+    """pd.read_csv 的 dtype, 日期欄位由 get_parse_dates 處理"""
+    not_null_set = get_not_null_set(sql)
+    return {
+        name: (
+            PANDAS_DTYPE[type_]
+            if name in not_null_set
+            else NULLABLE_PANDAS_DTYPE.get(
+                type_,
+                PANDAS_DTYPE[type_],
+            )
+        )
+        for name, type_ in get_column_list(
+            sql
+        )
+        if type_ not in DATE_TYPE_LIST
+    }
+
+
+def get_parse_dates(
+    sql: str,
+) -> typing.List[str]:
+    return [
+        name
+        for name, type_ in get_column_list(
+            sql
+        )
+        if type_ in DATE_TYPE_LIST
+    ]
+
+
+def get_date_column(sql: str) -> str:
+    """第一個 date 欄位, parquet 依照此欄位的年度分割"""
+    for name, type_ in get_column_list(
+        sql
+    ):
+        if type_ == "date":
+            return name
+    return ""
+
+
+def get_arrow_type_dict(
+    sql: str,
+) -> typing.Dict[str, typing.Any]:
+    import pyarrow as pa
+
+    type_dict = {}
+    for name, type_ in get_column_list(
+        sql
+    ):
+        arrow_type = ARROW_TYPE[type_]
+        type_dict[name] = (
+            pa.timestamp("s")
+            if arrow_type == "timestamp"
+            else getattr(
+                pa, arrow_type
+            )()
+        )
+    return type_dict
@@ -1,15 +1,37 @@
-CREATE TABLE `taiwan_stock_price` (
-  `StockID` varchar(10) COLLATE utf8_unicode_ci NOT NULL,
-  `Transaction` bigint NOT NULL,
-  `TradeVolume` int NOT NULL,
-  `'TradeValue` bigint NOT NULL,
-  `Open` float NOT NULL,
-  `Max` float NOT NULL,
-  `Min` float NOT NULL,
-  `Close` float NOT NULL,
-  `Change` float NOT NULL,
-  `Date` date NOT NULL,
-  PRIMARY KEY(`StockID`, `Date`)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3 COLLATE=utf8_unicode_ci
-PARTITION BY KEY (StockID)
-PARTITIONS 10;
\ No newline at end of file
+CREATE TABLE `FinancialData`.`taiwan_stock_price`(
+    `StockID` VARCHAR(10) NOT NULL,
+    `TradeVolume` BIGINT NOT NULL,
+    `Transaction` INT NOT NULL,
+    `TradeValue` BIGINT NOT NULL,
+    `Open` FLOAT NOT NULL,
+    `Max` FLOAT NOT NULL,
+    `Min` FLOAT NOT NULL,
+    `Close` FLOAT NOT NULL,
+    `Change` FLOAT NOT NULL,
+    `Date` DATE NOT NULL,
+    PRIMARY KEY(`StockID`, `Date`),
+    INDEX `idx_date_stock`(`Date`, `StockID`, `Close`)
+)
+PARTITION BY RANGE(YEAR(Date)) (
+    PARTITION p2005 VALUES LESS THAN (2006),
+    PARTITION p2006 VALUES LESS THAN (2007),
+    PARTITION p2007 VALUES LESS THAN (2008),
+    PARTITION p2008 VALUES LESS THAN (2009),
+    PARTITION p2009 VALUES LESS THAN (2010),
+    PARTITION p2010 VALUES LESS THAN (2011),
+    PARTITION p2011 VALUES LESS THAN (2012),
+    PARTITION p2012 VALUES LESS THAN (2013),
+    PARTITION p2013 VALUES LESS THAN (2014),
+    PARTITION p2014 VALUES LESS THAN (2015),
+    PARTITION p2015 VALUES LESS THAN (2016),
+    PARTITION p2016 VALUES LESS THAN (2017),
+    PARTITION p2017 VALUES LESS THAN (2018),
+    PARTITION p2018 VALUES LESS THAN (2019),
+    PARTITION p2019 VALUES LESS THAN (2020),
+    PARTITION p2020 VALUES LESS THAN (2021),
+    PARTITION p2021 VALUES LESS THAN (2022),
+    PARTITION p2022 VALUES LESS THAN (2023),
+    PARTITION p2023 VALUES LESS THAN (2024),
+    PARTITION p2024 VALUES LESS THAN (2025),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
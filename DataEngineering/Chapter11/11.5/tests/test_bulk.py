@@ -0,0 +1,219 @@
+import zlib
+
+import pandas as pd
+import pytest
+
+from bulk import (
+    Checkpoint,
+    check_empty,
+    drop_secondary_index,
+    get_drop_index_sql,
+    get_index_sql_list,
+)
+from loader import get_checksum
+
+
+def test_checkpoint(tmp_path):
+    path = str(
+        tmp_path / "checkpoint.json"
+    )
+    checkpoint = Checkpoint.load(
+        path, "taiwan_stock_price", 10
+    )
+    assert checkpoint.done == {}
+    checkpoint.commit(0, 10, 100)
+    checkpoint.commit(2, 5, 50)
+    result = Checkpoint.load(
+        path, "taiwan_stock_price", 10
+    )
+    assert result.done == {
+        0: (10, 100),
+        2: (5, 50),
+    }
+    assert result.rows == 15
+    assert result.checksum == 150
+
+
+def test_checkpoint_chunk_size_changed(
+    tmp_path,
+):
+    path = str(
+        tmp_path / "checkpoint.json"
+    )
+    Checkpoint.load(
+        path, "taiwan_stock_price", 10
+    ).commit(0, 10, 100)
+    with pytest.raises(ValueError):
+        Checkpoint.load(
+            path,
+            "taiwan_stock_price",
+            20,
+        )
+
+
+def test_get_index_sql_list():
+    statistics = [
+        ("PRIMARY", 0, "StockID", None),
+        ("PRIMARY", 0, "Date", None),
+        ("idx_date", 1, "Date", None),
+        ("uq_name", 0, "StockID", None),
+        ("uq_name", 0, "Name", 8),
+    ]
+    index_sql_list = get_index_sql_list(
+        statistics
+    )
+    assert index_sql_list == [
+        "ADD INDEX `idx_date`(`Date`)",
+        "ADD UNIQUE INDEX `uq_name`(`StockID`, `Name`(8))",
+    ]
+    assert (
+        get_drop_index_sql(
+            "taiwan_stock_price",
+            index_sql_list,
+        )
+        == "ALTER TABLE `taiwan_stock_price` "
+        "DROP INDEX `idx_date`, DROP INDEX `uq_name`"
+    )
+
+
+def test_get_checksum():
+    df = pd.DataFrame(
+        dict(
+            StockID=["0050", "2330"],
+            Date=[
+                pd.Timestamp(
+                    "2021-01-04"
+                ),
+                pd.Timestamp(
+                    "2021-01-05"
+                ),
+            ],
+            Close=[1.0, 2.0],
+        )
+    )
+    # 與 mysql SUM(CRC32(CONCAT_WS('|', StockID, Date))) 相同
+    assert get_checksum(
+        df, ["StockID", "Date"]
+    ) == zlib.crc32(
+        b"0050|2021-01-04"
+    ) + zlib.crc32(
+        b"2330|2021-01-05"
+    )
+    assert get_checksum(df, []) == 0
+
+
+class FakeResult:
+    def __init__(self, row_list):
+        self.row_list = row_list
+
+    def fetchall(self):
+        return self.row_list
+
+    def fetchone(self):
+        return (
+            self.row_list[0]
+            if self.row_list
+            else None
+        )
+
+
+class FakeConnection:
+    """information_schema.STATISTICS 與 ALTER TABLE,
+    fail=True 時 ALTER 失敗
+    """
+
+    def __init__(
+        self, statistics, fail=False
+    ):
+        self.statistics = statistics
+        self.fail = fail
+        self.alter_list = []
+
+    def execute(self, sql):
+        if sql.startswith("ALTER"):
+            if self.fail:
+                raise RuntimeError(
+                    "lock wait timeout"
+                )
+            self.alter_list.append(sql)
+            self.statistics = [
+                row
+                for row in self.statistics
+                if row[0] == "PRIMARY"
+            ]
+            return FakeResult([])
+        # STATISTICS 與 SELECT 1 FROM table 都回傳 statistics
+        return FakeResult(
+            self.statistics
+        )
+
+
+def test_drop_secondary_index_failed(
+    tmp_path,
+):
+    """
+    測試 ALTER 失敗時, 不記錄已移除, 重跑時以第一次記錄的 index 移除,
+    ALTER 成功後才記錄已移除
+    """
+    path = str(
+        tmp_path / "checkpoint.json"
+    )
+    statistics = [
+        ("PRIMARY", 0, "StockID", None),
+        ("idx_date", 1, "Date", None),
+    ]
+    checkpoint = Checkpoint.load(
+        path, "taiwan_stock_price", 10
+    )
+    with pytest.raises(RuntimeError):
+        drop_secondary_index(
+            FakeConnection(
+                statistics, fail=True
+            ),
+            checkpoint,
+        )
+    result = Checkpoint.load(
+        path, "taiwan_stock_price", 10
+    )
+    assert not result.index_dropped
+    assert result.index_sql_list == [
+        "ADD INDEX `idx_date`(`Date`)"
+    ]
+    mysql_conn = FakeConnection(
+        statistics
+    )
+    drop_secondary_index(
+        mysql_conn, result
+    )
+    assert mysql_conn.alter_list == [
+        "ALTER TABLE `taiwan_stock_price` "
+        "DROP INDEX `idx_date`"
+    ]
+    result = Checkpoint.load(
+        path, "taiwan_stock_price", 10
+    )
+    assert result.index_dropped
+    # ALTER 成功但記錄前中斷, index 已經不存在, 保留原本的記錄, 不再 ALTER
+    result.index_dropped = False
+    mysql_conn = FakeConnection(
+        mysql_conn.statistics
+    )
+    drop_secondary_index(
+        mysql_conn, result
+    )
+    assert mysql_conn.alter_list == []
+    assert result.index_sql_list == [
+        "ADD INDEX `idx_date`(`Date`)"
+    ]
+
+
+def test_check_empty():
+    check_empty(
+        FakeConnection([]),
+        "taiwan_stock_price",
+    )
+    with pytest.raises(ValueError):
+        check_empty(
+            FakeConnection([(1,)]),
+            "taiwan_stock_price",
+        )
@@ -0,0 +1,99 @@
+import gzip
+
+import pandas as pd
+import pytest
+
+from csv_reader import (
+    get_csv_path,
+    read_csv,
+)
+from upload_data2mysql import (
+    create_taiwan_stock_price_sql,
+)
+
+CSV = (
+    "StockID,TradeVolume,Transaction,TradeValue,"
+    "Open,Max,Min,Close,Change,Date\n"
+    "0050,100,10,1000,1.0,2.0,0.5,1.5,0.5,2021-01-04\n"
+    "0056,200,20,2000,2.0,3.0,1.5,2.5,-0.5,2021-01-04\n"
+    "2330,300,30,3000,3.0,4.0,2.5,3.5,0.0,2021-01-05\n"
+)
+
+
+@pytest.mark.parametrize(
+    "engine", ["pandas", "pyarrow"]
+)
+@pytest.mark.parametrize(
+    "suffix", ["", ".gz"]
+)
+def test_read_csv(
+    tmp_path, engine, suffix
+):
+    path = str(
+        tmp_path
+        / f"taiwan_stock_price.csv{suffix}"
+    )
+    with (
+        gzip.open(path, "wb")
+        if suffix
+        else open(path, "wb")
+    ) as f:
+        f.write(CSV.encode("utf8"))
+    df_list = list(
+        read_csv(
+            path,
+            create_taiwan_stock_price_sql(),
+            chunk_size=2,
+            engine=engine,
+        )
+    )
+    assert [
+        len(df) for df in df_list
+    ] == [2, 1]
+    df = pd.concat(
+        df_list, ignore_index=True
+    )
+    assert df["StockID"].tolist() == [
+        "0050",
+        "0056",
+        "2330",
+    ]
+    assert (
+        str(df["TradeVolume"].dtype)
+        == "int64"
+    )
+    assert df["Date"].dtype.kind == "M"
+    assert df["Date"][
+        2
+    ] == pd.Timestamp("2021-01-05")
+
+
+def test_get_csv_path(
+    tmp_path, monkeypatch
+):
+    monkeypatch.chdir(tmp_path)
+    assert (
+        get_csv_path(
+            "taiwan_stock_price"
+        )
+        == "taiwan_stock_price.csv"
+    )
+    (
+        tmp_path
+        / "taiwan_stock_price.csv.gz"
+    ).write_bytes(b"")
+    assert (
+        get_csv_path(
+            "taiwan_stock_price"
+        )
+        == "taiwan_stock_price.csv.gz"
+    )
+
+
+def test_read_csv_engine():
+    with pytest.raises(ValueError):
+        read_csv(
+            "taiwan_stock_price.csv",
+            create_taiwan_stock_price_sql(),
+            engine="c",
+        )
@@ -0,0 +1,219 @@
+import gzip
+import hashlib
+import http.server
+import os
+import re
+import socketserver
+import threading
+
+import pytest
+
+import download
+
+DATA = bytes(range(256)) * 40
+
+
+class RangeHandler(
+    http.server.BaseHTTPRequestHandler
+):
+    """支援 Range 的 release, 記錄每次 GET 的 Range"""
+
+    file_dict = {}
+    range_list = []
+
+    def log_message(self, *args):
+        pass
+
+    def send_file_header(
+        self, body: bytes, status: int
+    ):
+        self.send_response(status)
+        self.send_header(
+            "Content-Length",
+            str(len(body)),
+        )
+        self.send_header(
+            "Accept-Ranges", "bytes"
+        )
+        self.end_headers()
+
+    def get_body(self) -> bytes:
+        name = self.path.lstrip("/")
+        if name not in self.file_dict:
+            self.send_error(404)
+            return None
+        return self.file_dict[name]
+
+    def do_HEAD(self):
+        body = self.get_body()
+        if body is not None:
+            self.send_file_header(
+                body, 200
+            )
+
+    def do_GET(self):
+        body = self.get_body()
+        if body is None:
+            return
+        match = re.match(
+            r"bytes=(\d+)-(\d+)",
+            self.headers.get(
+                "Range", ""
+            ),
+        )
+        if match is None:
+            self.send_file_header(
+                body, 200
+            )
+            self.wfile.write(body)
+            return
+        start, end = (
+            int(match.group(1)),
+            int(match.group(2)),
+        )
+        self.range_list.append(
+            (start, end)
+        )
+        body = body[start : end + 1]
+        self.send_file_header(body, 206)
+        self.wfile.write(body)
+
+
+class Server(
+    socketserver.ThreadingMixIn,
+    http.server.HTTPServer,
+):
+    daemon_threads = True
+
+
+@pytest.fixture
+def base_url(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    RangeHandler.file_dict = {
+        "data.csv": DATA,
+        "data.csv.gz": gzip.compress(
+            DATA
+        ),
+    }
+    RangeHandler.range_list = []
+    server = Server(
+        ("127.0.0.1", 0), RangeHandler
+    )
+    thread = threading.Thread(
+        target=server.serve_forever,
+        daemon=True,
+    )
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_part_list():
+    assert download.get_part_list(
+        10, 4
+    ) == [(0, 3), (4, 7), (8, 9)]
+
+
+def test_download(base_url):
+    path = download.download(
+        f"{base_url}/data.csv",
+        "data.csv",
+        sha256=hashlib.sha256(
+            DATA
+        ).hexdigest(),
+        workers=4,
+        part_size=1000,
+    )
+    with open(path, "rb") as f:
+        assert f.read() == DATA
+    assert (
+        len(RangeHandler.range_list)
+        == 11
+    )
+    assert not [
+        name
+        for name in os.listdir(".")
+        if ".part" in name
+    ]
+
+
+def test_download_resume(base_url):
+    # 上次中斷, 第一段只下載 100 bytes
+    with open(
+        download.get_part_path(
+            "data.csv", 0
+        ),
+        "wb",
+    ) as f:
+        f.write(DATA[:100])
+    download.download(
+        f"{base_url}/data.csv",
+        "data.csv",
+        part_size=1000,
+    )
+    with open("data.csv", "rb") as f:
+        assert f.read() == DATA
+    assert (
+        100,
+        999,
+    ) in RangeHandler.range_list
+    assert (
+        0,
+        999,
+    ) not in RangeHandler.range_list
+
+
+def test_download_checksum_mismatch(
+    base_url,
+):
+    with pytest.raises(ValueError):
+        download.download(
+            f"{base_url}/data.csv",
+            "data.csv",
+            sha256="0" * 64,
+            part_size=1000,
+        )
+    assert not os.path.exists(
+        "data.csv"
+    )
+
+
+def test_fetch_gz(base_url, tmp_path):
+    manifest_dir = tmp_path / "release"
+    manifest_dir.mkdir()
+    (
+        manifest_dir / "data.csv.gz"
+    ).write_bytes(
+        RangeHandler.file_dict[
+            "data.csv.gz"
+        ]
+    )
+    manifest = download.create_manifest(
+        [
+            str(
+                manifest_dir
+                / "data.csv.gz"
+            )
+        ]
+    )
+    path = download.fetch(
+        base_url,
+        "data.csv.gz",
+        manifest,
+    )
+    assert path == "data.csv"
+    with open(path, "rb") as f:
+        assert f.read() == DATA
+    assert not os.path.exists(
+        "data.csv.gz"
+    )
+
+
+def test_get_manifest_not_found(
+    base_url,
+):
+    assert (
+        download.get_manifest(base_url)
+        == {}
+    )
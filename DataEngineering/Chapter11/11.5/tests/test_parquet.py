@@ -0,0 +1,152 @@
+import datetime
+import os
+import zipfile
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from parquet import (
+    csv2parquet,
+    get_row_group_list,
+    pack,
+    read_parquet,
+    unpack,
+)
+
+TYPE_DICT = {
+    "StockID": pa.string(),
+    "Close": pa.float64(),
+    "Date": pa.date32(),
+}
+
+
+def write_csv(tmp_path) -> str:
+    path = str(tmp_path / "price.csv")
+    pd.DataFrame(
+        dict(
+            StockID=["0050"] * 3
+            + ["2330"] * 2,
+            Close=[
+                1.0,
+                2.0,
+                3.0,
+                4.0,
+                5.0,
+            ],
+            Date=[
+                "2020-12-30",
+                "2020-12-31",
+                "2021-01-04",
+                "2020-12-31",
+                "2021-01-04",
+            ],
+        )
+    ).to_csv(path, index=False)
+    return path
+
+
+def test_csv2parquet(tmp_path):
+    parquet_dir = str(
+        tmp_path / "price.parquet"
+    )
+    rows = csv2parquet(
+        write_csv(tmp_path),
+        parquet_dir,
+        type_dict=TYPE_DICT,
+        date_column="Date",
+        row_group_size=2,
+    )
+    assert rows == 5
+    assert sorted(
+        os.listdir(parquet_dir)
+    ) == ["year=2020", "year=2021"]
+    row_group_list = get_row_group_list(
+        parquet_dir
+    )
+    # 2020 有 3 筆, 分成 2 個 row group
+    assert [
+        index
+        for _, index in row_group_list
+    ] == [0, 1, 0]
+    df = pd.concat(
+        read_parquet(
+            parquet_dir, workers=2
+        ),
+        ignore_index=True,
+    )
+    # StockID 保留開頭的 0, Date 為日期
+    assert df["StockID"].tolist() == [
+        "0050",
+        "0050",
+        "2330",
+        "0050",
+        "2330",
+    ]
+    assert df["Date"].tolist()[
+        0
+    ] == datetime.date(2020, 12, 30)
+
+
+def test_pack(tmp_path):
+    parquet_dir = str(
+        tmp_path / "price.parquet"
+    )
+    csv2parquet(
+        write_csv(tmp_path),
+        parquet_dir,
+        type_dict=TYPE_DICT,
+        date_column="Date",
+    )
+    zip_path = str(
+        tmp_path / "price.parquet.zip"
+    )
+    pack(parquet_dir, zip_path)
+    target = tmp_path / "download"
+    unpack(zip_path, str(target))
+    assert len(
+        get_row_group_list(
+            str(
+                target / "price.parquet"
+            )
+        )
+    ) == len(
+        get_row_group_list(parquet_dir)
+    )
+
+
+def test_unpack_interrupted(
+    tmp_path, monkeypatch
+):
+    """
+    測試解壓縮中斷時, 不會留下不完整的 parquet 資料夾
+    """
+    parquet_dir = str(
+        tmp_path / "price.parquet"
+    )
+    csv2parquet(
+        write_csv(tmp_path),
+        parquet_dir,
+        type_dict=TYPE_DICT,
+        date_column="Date",
+    )
+    zip_path = str(
+        tmp_path / "price.parquet.zip"
+    )
+    pack(parquet_dir, zip_path)
+
+    def extractall(self, path):
+        self.extract(
+            self.namelist()[0], path
+        )
+        raise OSError("disk full")
+
+    monkeypatch.setattr(
+        zipfile.ZipFile,
+        "extractall",
+        extractall,
+    )
+    target = tmp_path / "download"
+    with pytest.raises(OSError):
+        unpack(zip_path, str(target))
+    assert os.listdir(str(target)) == []
@@ -0,0 +1,81 @@
+import pyarrow as pa
+
+from schema import (
+    get_arrow_type_dict,
+    get_column_list,
+    get_date_column,
+    get_dtype_dict,
+    get_parse_dates,
+)
+from upload_data2mysql import (
+    create_taiwan_stock_holding_shares_per_sql,
+    create_taiwan_stock_price_sql,
+)
+
+
+def test_get_column_list():
+    assert get_column_list(
+        create_taiwan_stock_price_sql()
+    ) == [
+        ("StockID", "varchar"),
+        ("TradeVolume", "bigint"),
+        ("Transaction", "int"),
+        ("TradeValue", "bigint"),
+        ("Open", "float"),
+        ("Max", "float"),
+        ("Min", "float"),
+        ("Close", "float"),
+        ("Change", "float"),
+        ("Date", "date"),
+    ]
+
+
+def test_get_date_column():
+    assert (
+        get_date_column(
+            create_taiwan_stock_price_sql()
+        )
+        == "Date"
+    )
+    assert get_date_column("") == ""
+
+
+def test_get_arrow_type_dict():
+    type_dict = get_arrow_type_dict(
+        create_taiwan_stock_holding_shares_per_sql()
+    )
+    assert type_dict == {
+        "HoldingSharesLevel": pa.string(),
+        "people": pa.int32(),
+        "unit": pa.int64(),
+        "percent": pa.float64(),
+        "stock_id": pa.string(),
+        "date": pa.date32(),
+        "update_time": pa.timestamp(
+            "s"
+        ),
+    }
+
+
+def test_get_dtype_dict():
+    assert get_dtype_dict(
+        create_taiwan_stock_holding_shares_per_sql()
+    ) == {
+        "HoldingSharesLevel": "str",
+        "people": "Int32",
+        "unit": "Int64",
+        "percent": "float64",
+        "stock_id": "str",
+    }
+    assert (
+        get_dtype_dict(
+            create_taiwan_stock_price_sql()
+        )["TradeVolume"]
+        == "int64"
+    )
+
+
+def test_get_parse_dates():
+    assert get_parse_dates(
+        create_taiwan_stock_holding_shares_per_sql()
+    ) == ["date", "update_time"]
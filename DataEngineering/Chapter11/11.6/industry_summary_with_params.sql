@@ -0,0 +1,8 @@
+SELECT industry_category AS '產業別',
+       TradeValue AS '成交金額',
+       Advancers AS '上漲家數',
+       Decliners AS '下跌家數',
+       Date AS date
+FROM taiwan_stock_industry_summary
+WHERE Date >= '{{date.start}}'
+  AND Date <= '{{date.end}}'
\ No newline at end of file
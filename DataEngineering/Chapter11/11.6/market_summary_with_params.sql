@@ -0,0 +1,8 @@
+SELECT Date AS date,
+       TradeValue AS '成交金額',
+       Advancers AS '上漲家數',
+       Decliners AS '下跌家數',
+       Unchanged AS '平盤家數'
+FROM taiwan_stock_market_summary
+WHERE Date >= '{{date.start}}'
+  AND Date <= '{{date.end}}'
\ No newline at end of file
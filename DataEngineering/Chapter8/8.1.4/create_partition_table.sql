@@ -10,7 +10,8 @@ CREATE TABLE `FinancialData`.`taiwan_stock_price`(
     `Close` FLOAT NOT NULL,
     `Change` FLOAT NOT NULL,
     `Date` DATE NOT NULL,
-    PRIMARY KEY(`StockID`, `Date`)
+    PRIMARY KEY(`StockID`, `Date`),
+    INDEX `idx_date_stock`(`Date`, `StockID`, `Close`)
 )
 PARTITION BY RANGE(YEAR(Date)) (
     PARTITION p2005 VALUES LESS THAN (2006),
@@ -32,10 +33,10 @@ PARTITION BY RANGE(YEAR(Date)) (
     PARTITION p2021 VALUES LESS THAN (2022),
     PARTITION p2022 VALUES LESS THAN (2023),
     PARTITION p2023 VALUES LESS THAN (2024),
-    PARTITION p2024 VALUES LESS THAN (2025)
- 
+    PARTITION p2024 VALUES LESS THAN (2025),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
 );
- 
+
 CREATE TABLE `FinancialData`.`taiwan_futures_daily`(
     `Date` DATE NOT NULL,
     `FuturesID` VARCHAR(10) NOT NULL,
@@ -50,7 +51,131 @@ CREATE TABLE `FinancialData`.`taiwan_futures_daily`(
     `SettlementPrice` FLOAT NOT NULL,
     `OpenInterest` INT NOT NULL,
     `TradingSession` VARCHAR(11) NOT NULL,
-    PRIMARY KEY(`FuturesID`, `Date`)
+    PRIMARY KEY(`FuturesID`, `ContractDate`, `TradingSession`, `Date`)
+)
+PARTITION BY RANGE(YEAR(Date)) (
+    PARTITION p2005 VALUES LESS THAN (2006),
+    PARTITION p2006 VALUES LESS THAN (2007),
+    PARTITION p2007 VALUES LESS THAN (2008),
+    PARTITION p2008 VALUES LESS THAN (2009),
+    PARTITION p2009 VALUES LESS THAN (2010),
+    PARTITION p2010 VALUES LESS THAN (2011),
+    PARTITION p2011 VALUES LESS THAN (2012),
+    PARTITION p2012 VALUES LESS THAN (2013),
+    PARTITION p2013 VALUES LESS THAN (2014),
+    PARTITION p2014 VALUES LESS THAN (2015),
+    PARTITION p2015 VALUES LESS THAN (2016),
+    PARTITION p2016 VALUES LESS THAN (2017),
+    PARTITION p2017 VALUES LESS THAN (2018),
+    PARTITION p2018 VALUES LESS THAN (2019),
+    PARTITION p2019 VALUES LESS THAN (2020),
+    PARTITION p2020 VALUES LESS THAN (2021),
+    PARTITION p2021 VALUES LESS THAN (2022),
+    PARTITION p2022 VALUES LESS THAN (2023),
+    PARTITION p2023 VALUES LESS THAN (2024),
+    PARTITION p2024 VALUES LESS THAN (2025),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+CREATE TABLE `FinancialData`.`scheduler_run_log`(
+    `dataset` VARCHAR(64) NOT NULL,
+    `last_date` DATE NOT NULL,
+    `update_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY(`dataset`)
+);
+
+CREATE TABLE `FinancialData`.`taiwan_stock_indicator`(
+    `StockID` VARCHAR(10) NOT NULL,
+    `Date` DATE NOT NULL,
+    `ma_5` DOUBLE NULL,
+    `ma_20` DOUBLE NULL,
+    `ma_60` DOUBLE NULL,
+    `rsi_14` DOUBLE NULL,
+    `bband_upper_20` DOUBLE NULL,
+    `bband_lower_20` DOUBLE NULL,
+    PRIMARY KEY(`StockID`, `Date`)
+);
+
+CREATE TABLE `FinancialData`.`taiwan_stock_indicator_state`(
+    `StockID` VARCHAR(10) NOT NULL,
+    `Date` DATE NOT NULL,
+    `State` TEXT NOT NULL,
+    PRIMARY KEY(`StockID`)
+);
+
+CREATE TABLE `FinancialData`.`data_version`(
+    `version` BIGINT NOT NULL AUTO_INCREMENT,
+    `dataset` VARCHAR(64) NOT NULL,
+    `start_date` DATE NOT NULL,
+    `end_date` DATE NOT NULL,
+    `update_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY(`version`),
+    INDEX `idx_dataset_version`(`dataset`, `version`)
+);
+
+CREATE TABLE `FinancialData`.`data_version_consumer`(
+    `consumer` VARCHAR(64) NOT NULL,
+    `version` BIGINT NOT NULL,
+    PRIMARY KEY(`consumer`)
+);
+
+CREATE TABLE `FinancialData`.`schema_migration`(
+    `name` VARCHAR(255) NOT NULL,
+    `applied_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY(`name`)
+);
+
+CREATE TABLE `FinancialData`.`taiwan_stock_market_summary`(
+    `Date` DATE NOT NULL,
+    `StockCount` INT NOT NULL,
+    `TradeVolume` BIGINT NOT NULL,
+    `TradeValue` BIGINT NOT NULL,
+    `Transaction` BIGINT NOT NULL,
+    `Advancers` INT NOT NULL,
+    `Decliners` INT NOT NULL,
+    `Unchanged` INT NOT NULL,
+    PRIMARY KEY(`Date`)
+);
+
+CREATE TABLE `FinancialData`.`taiwan_stock_price_month`(
+    `StockID` VARCHAR(10) NOT NULL,
+    `Month` DATE NOT NULL,
+    `StartDate` DATE NOT NULL,
+    `EndDate` DATE NOT NULL,
+    `Open` FLOAT NOT NULL,
+    `Max` FLOAT NOT NULL,
+    `Min` FLOAT NOT NULL,
+    `Close` FLOAT NOT NULL,
+    `TradeVolume` BIGINT NOT NULL,
+    `TradeValue` BIGINT NOT NULL,
+    `Transaction` BIGINT NOT NULL,
+    PRIMARY KEY(`StockID`, `Month`),
+    INDEX `idx_month`(`Month`)
+);
+
+CREATE TABLE `FinancialData`.`taiwan_stock_industry_summary`(
+    `industry_category` VARCHAR(32) NOT NULL,
+    `Date` DATE NOT NULL,
+    `StockCount` INT NOT NULL,
+    `TradeVolume` BIGINT NOT NULL,
+    `TradeValue` BIGINT NOT NULL,
+    `Advancers` INT NOT NULL,
+    `Decliners` INT NOT NULL,
+    `Unchanged` INT NOT NULL,
+    PRIMARY KEY(`industry_category`, `Date`),
+    INDEX `idx_date`(`Date`)
+);
+
+CREATE TABLE `FinancialData`.`taiwan_stock_investor_price`(
+    `stock_id` VARCHAR(10) NOT NULL,
+    `date` DATE NOT NULL,
+    `Close` FLOAT NOT NULL,
+    `Foreign_Investor` BIGINT NOT NULL,
+    `Foreign_Dealer_Self` BIGINT NOT NULL,
+    `Investment_Trust` BIGINT NOT NULL,
+    `Dealer_self` BIGINT NOT NULL,
+    `Dealer_Hedging` BIGINT NOT NULL,
+    PRIMARY KEY(`stock_id`, `date`)
 )
 PARTITION BY RANGE(YEAR(Date)) (
     PARTITION p2005 VALUES LESS THAN (2006),
@@ -72,6 +197,12 @@ PARTITION BY RANGE(YEAR(Date)) (
     PARTITION p2021 VALUES LESS THAN (2022),
     PARTITION p2022 VALUES LESS THAN (2023),
     PARTITION p2023 VALUES LESS THAN (2024),
-    PARTITION p2024 VALUES LESS THAN (2025)
+    PARTITION p2024 VALUES LESS THAN (2025),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+CREATE TABLE `FinancialData`.`taiwan_stock_name`(
+    `stock_name` VARCHAR(30) NOT NULL,
+    `stock_id` VARCHAR(32) NOT NULL,
+    PRIMARY KEY(`stock_name`)
 );
- 
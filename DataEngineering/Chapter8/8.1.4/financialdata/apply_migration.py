@@ -0,0 +1,78 @@
+"""
+依序執行 migration 資料夾中尚未執行過的 sql, 執行過的檔名記錄在 schema_migration,
+重複執行時會跳過, 連線設定與爬蟲相同 (由 local.ini 產生的 .env):
+    pipenv run python financialdata/apply_migration.py
+由 create_partition_table.sql 建立的資料庫, 已經包含全部 migration, 只記錄不執行:
+    pipenv run python financialdata/apply_migration.py --baseline
+"""
+
+import os
+import sys
+
+from financialdata.backend import db
+from financialdata.schema.migration import (
+    get_pending_migration,
+    get_schema_migration_table_sql,
+    split_statement,
+)
+from loguru import logger
+
+MIGRATION_DIR = os.path.join(
+    os.path.dirname(
+        os.path.dirname(
+            os.path.abspath(__file__)
+        )
+    ),
+    "migration",
+)
+
+
+def apply_migration(
+    baseline: bool = False,
+):
+    mysql_conn = (
+        db.router.mysql_financialdata_conn
+    )
+    mysql_conn.execute(
+        get_schema_migration_table_sql()
+    )
+    applied_set = {
+        name
+        for (
+            name,
+        ) in mysql_conn.execute(
+            "SELECT name FROM schema_migration"
+        )
+    }
+    for name in get_pending_migration(
+        os.listdir(MIGRATION_DIR),
+        applied_set,
+    ):
+        if not baseline:
+            logger.info(f"apply {name}")
+            with open(
+                os.path.join(
+                    MIGRATION_DIR, name
+                ),
+                encoding="utf8",
+            ) as f:
+                # DDL 會隱含 commit, 失敗時停止, 不記錄此檔案, 修正後重跑
+                for (
+                    statement
+                ) in split_statement(
+                    f.read()
+                ):
+                    mysql_conn.execute(
+                        statement
+                    )
+        mysql_conn.execute(
+            "INSERT INTO schema_migration(name) VALUES (%s)",
+            (name,),
+        )
+
+
+if __name__ == "__main__":
+    apply_migration(
+        baseline=sys.argv[1:]
+        == ["--baseline"]
+    )
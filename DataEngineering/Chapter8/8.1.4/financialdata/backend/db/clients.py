@@ -5,17 +5,28 @@ from financialdata.config import (
     MYSQL_DATA_PORT,
     MYSQL_DATA_DATABASE,
 )
+from financialdata import tracing
 from sqlalchemy import (
     create_engine,
     engine,
+    event,
 )
 
 
-def get_mysql_financialdata_conn() -> engine.base.Connection:
+def get_mysql_financialdata_conn() -> (
+    engine.base.Connection
+):
     address = (
         f"mysql+pymysql://{MYSQL_DATA_USER}:{MYSQL_DATA_PASSWORD}"
         f"@{MYSQL_DATA_HOST}:{MYSQL_DATA_PORT}/{MYSQL_DATA_DATABASE}"
     )
     engine = create_engine(address)
+    # SQL 加上 trace 註解
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        tracing.annotate_sql,
+        retval=True,
+    )
     connect = engine.connect()
     return connect
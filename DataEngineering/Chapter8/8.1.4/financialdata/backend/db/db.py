@@ -1,9 +1,23 @@
+import contextlib
+import datetime
 import typing
 
 import pandas as pd
 import pymysql
 from loguru import logger
 from sqlalchemy import engine
+from financialdata.schema.rollup import (
+    Rollup,
+    get_refresh_sql_list,
+    get_rollup_list,
+    get_rollup_lock_name,
+)
+from financialdata.schema.registry import (
+    SCHEMA_DICT,
+    TableSchema,
+    get_upsert_params,
+    get_upsert_sql,
+)
 
 
 def update2mysql_by_pandas(
@@ -85,11 +99,51 @@ def build_df_update_sql(
     return sql_list
 
 
+def update2mysql_by_upsert(
+    df: pd.DataFrame,
+    schema: TableSchema,
+    mysql_conn: engine.base.Connection,
+):
+    """registry 有定義的 table, 使用 prepared upsert,
+    整批資料一次 executemany, 不需要逐筆組 SQL
+    """
+    logger.info(
+        "update2mysql_by_upsert"
+    )
+    columns = [
+        column
+        for column in schema.column_names
+        if column in df.columns
+    ]
+    sql = get_upsert_sql(
+        schema, columns
+    )
+    trans = mysql_conn.begin()
+    try:
+        mysql_conn.execute(
+            sql,
+            get_upsert_params(
+                df, columns
+            ),
+        )
+        trans.commit()
+    except Exception as e:
+        trans.rollback()
+        logger.info(e)
+
+
 def update2mysql_by_sql(
     df: pd.DataFrame,
     table: str,
     mysql_conn: engine.base.Connection,
 ):
+    if table in SCHEMA_DICT:
+        update2mysql_by_upsert(
+            df=df,
+            schema=SCHEMA_DICT[table],
+            mysql_conn=mysql_conn,
+        )
+        return
     sql = build_df_update_sql(table, df)
     commit(
         sql=sql, mysql_conn=mysql_conn
@@ -130,6 +184,148 @@ def commit(
         logger.info(e)
 
 
+def get_date_range(
+    df: pd.DataFrame,
+) -> typing.Optional[
+    typing.Tuple[str, str]
+]:
+    date_col = (
+        "Date"
+        if "Date" in df.columns
+        else "date"
+    )
+    if date_col not in df.columns:
+        return None
+    return (
+        str(df[date_col].min()),
+        str(df[date_col].max()),
+    )
+
+
+def bump_data_version(
+    df: pd.DataFrame,
+    table: str,
+    mysql_conn: engine.base.Connection,
+):
+    """data_version 新增一筆, version 為 auto increment, 只會遞增,
+    api 依照 version 產生 ETag, 並讓 cache 失效
+    """
+    date_range = get_date_range(df)
+    if date_range is None:
+        return
+    value = [
+        pymysql.converters.escape_string(
+            v
+        )
+        for v in (table,) + date_range
+    ]
+    sql = """INSERT INTO `data_version`(`dataset`,`start_date`,`end_date`)
+        VALUES ('{}','{}','{}')
+        """.format(
+        *value
+    )
+    commit(
+        sql=sql, mysql_conn=mysql_conn
+    )
+
+
+# 等待其他 worker 重算同一個彙總 table 的秒數
+ROLLUP_LOCK_TIMEOUT = 600
+
+
+def get_table_list(
+    mysql_conn: engine.base.Connection,
+) -> typing.List[str]:
+    return [
+        row[0]
+        for row in mysql_conn.execute(
+            "SHOW TABLES"
+        ).fetchall()
+    ]
+
+
+@contextlib.contextmanager
+def hold_rollup_lock(
+    rollup: Rollup,
+    mysql_conn: engine.base.Connection,
+):
+    """使用 MySQL GET_LOCK, 同一個彙總 table 同時只有一個 worker 重算"""
+    lock_name = get_rollup_lock_name(
+        rollup
+    )
+    result = mysql_conn.execute(
+        f"SELECT GET_LOCK('{lock_name}', {ROLLUP_LOCK_TIMEOUT})"
+    ).scalar()
+    if result != 1:
+        raise TimeoutError(
+            f"get lock {lock_name} timeout"
+        )
+    try:
+        yield
+    finally:
+        mysql_conn.execute(
+            f"SELECT RELEASE_LOCK('{lock_name}')"
+        )
+
+
+def refresh_rollup(
+    rollup: Rollup,
+    start_date: typing.Optional[
+        datetime.date
+    ],
+    end_date: typing.Optional[
+        datetime.date
+    ],
+    mysql_conn: engine.base.Connection,
+):
+    """DELETE 與 INSERT 在同一個 transaction, 任一個失敗時全部 rollback,
+    不使用 commit, commit 會略過失敗的 SQL, 造成只有 DELETE 生效
+    """
+    with hold_rollup_lock(
+        rollup, mysql_conn
+    ), mysql_conn.begin():
+        for sql in get_refresh_sql_list(
+            rollup, start_date, end_date
+        ):
+            mysql_conn.execute(sql)
+
+
+def refresh_rollups(
+    df: pd.DataFrame,
+    table: str,
+    mysql_conn: engine.base.Connection,
+):
+    """重算以 table 為來源的彙總 table, 只包含這次寫入的日期,
+    略過 source 還沒建立的彙總 table
+    """
+    date_range = get_date_range(df)
+    start_date, end_date = (
+        [
+            pd.Timestamp(date).date()
+            for date in date_range
+        ]
+        if date_range is not None
+        else [None, None]
+    )
+    for rollup in get_rollup_list(
+        source=table,
+        exist_table_list=get_table_list(
+            mysql_conn
+        ),
+    ):
+        if (
+            rollup.unit != "all"
+            and start_date is None
+        ):
+            continue
+        refresh_rollup(
+            rollup,
+            start_date,
+            end_date,
+            mysql_conn,
+        )
+
+
 def upload_data(
     df: pd.DataFrame,
     table: str,
@@ -151,3 +347,13 @@ def upload_data(
                 table=table,
                 mysql_conn=mysql_conn,
             )
+        # 資料已寫入, 先更新版本, 彙總 table 重算失敗時, api 的 cache 仍會失效
+        bump_data_version(
+            df, table, mysql_conn
+        )
+        try:
+            refresh_rollups(
+                df, table, mysql_conn
+            )
+        except Exception as e:
+            logger.info(e)
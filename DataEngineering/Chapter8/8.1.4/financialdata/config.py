@@ -34,3 +34,34 @@ MESSAGE_QUEUE_PORT = int(
         "MESSAGE_QUEUE_PORT", "5672"
     )
 )
+
+# metrics, 預設關閉
+METRICS_ENABLED = bool(
+    int(
+        os.environ.get(
+            "METRICS_ENABLED", "0"
+        )
+    )
+)
+# worker /metrics 的 port, 0 代表不啟動, 第 n 個子進程使用 METRICS_PORT + n
+METRICS_PORT = int(
+    os.environ.get("METRICS_PORT", "0")
+)
+# node_exporter textfile collector 路徑, 空字串代表不寫檔
+METRICS_TEXTFILE = os.environ.get(
+    "METRICS_TEXTFILE", ""
+)
+
+# tracing exporter class 路徑, 空字串代表不啟用,
+# 例如 financialdata.tracing.JsonLinesExporter
+TRACE_EXPORTER = os.environ.get(
+    "TRACE_EXPORTER", ""
+)
+TRACE_FILE = os.environ.get(
+    "TRACE_FILE", "traces.jsonl"
+)
+
+# 爬蟲原始資料的保存資料夾, 重新爬取時直接讀取, 空字串代表不保存
+RAW_ARCHIVE_DIR = os.environ.get(
+    "RAW_ARCHIVE_DIR", ""
+)
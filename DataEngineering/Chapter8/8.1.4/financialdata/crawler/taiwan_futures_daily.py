@@ -1,10 +1,18 @@
 import datetime
 import io
+import pathlib
 import time
 import typing
 
 import pandas as pd
 import requests
+from financialdata import (
+    metrics,
+    tracing,
+)
+from financialdata.config import (
+    RAW_ARCHIVE_DIR,
+)
 from financialdata.schema.dataset import (
     check_schema,
 )
@@ -38,7 +46,7 @@ def colname_zh2en(
 ) -> pd.DataFrame:
     """資料欄位轉換, 英文有助於接下來存入資料庫"""
     colname_dict = {
-        "交易日期": "date",
+        "交易日期": "Date",
         "契約": "FuturesID",
         "到期月份(週別)": "ContractDate",
         "開盤價": "Open",
@@ -74,7 +82,7 @@ def clean_data(
     df: pd.DataFrame,
 ) -> pd.DataFrame:
     """資料清理"""
-    df["date"] = df["date"].str.replace(
+    df["Date"] = df["Date"].str.replace(
         "/", "-"
     )
     df["ChangePer"] = df[
@@ -95,9 +103,9 @@ def clean_data(
             }
         )
     else:
-        df[
-            "TradingSession"
-        ] = "Position"
+        df["TradingSession"] = (
+            "Position"
+        )
     for col in [
         "Open",
         "Max",
@@ -118,6 +126,45 @@ def clean_data(
     return df
 
 
+def get_archive_path(
+    date: str,
+) -> typing.Optional[pathlib.Path]:
+    """期交所原始 csv 的保存路徑, 沒有設定 RAW_ARCHIVE_DIR 時不保存"""
+    if not RAW_ARCHIVE_DIR:
+        return None
+    return (
+        pathlib.Path(RAW_ARCHIVE_DIR)
+        / "taiwan_futures_daily"
+        / f"{date}.csv"
+    )
+
+
+def parse_content(
+    content: bytes,
+) -> pd.DataFrame:
+    """期交所回傳的 csv, 假日或錯誤時回傳的是 html,
+    無法解析或不是期貨資料時, 回傳空的 DataFrame
+    """
+    if not content:
+        return pd.DataFrame()
+    try:
+        df = pd.read_csv(
+            io.StringIO(
+                content.decode("big5")
+            ),
+            index_col=False,
+        )
+    except (
+        UnicodeDecodeError,
+        pd.errors.ParserError,
+        pd.errors.EmptyDataError,
+    ):
+        return pd.DataFrame()
+    if "交易日期" not in df.columns:
+        return pd.DataFrame()
+    return df
+
+
 def crawler_futures(
     date: str,
 ) -> pd.DataFrame:
@@ -133,25 +180,50 @@ def crawler_futures(
             "-", "/"
         ),
     }
-    # 避免被期交所 ban ip, 在每次爬蟲時, 先 sleep 5 秒
-    time.sleep(5)
-    resp = requests.post(
-        url,
-        headers=futures_header(),
-        data=form_data,
+    archive_path = get_archive_path(
+        date
     )
-    if resp.ok:
-        if resp.content:
-            df = pd.read_csv(
-                io.StringIO(
-                    resp.content.decode(
-                        "big5"
-                    )
-                ),
-                index_col=False,
+    if (
+        archive_path is not None
+        and archive_path.exists()
+    ):
+        # 重新爬取時, 直接讀取 archive, 不需要再次請求期交所
+        df = parse_content(
+            archive_path.read_bytes()
+        )
+        if len(df) > 0:
+            return df
+    with tracing.start_span(
+        "fetch", url=url
+    ):
+        # 避免被期交所 ban ip, 在每次爬蟲時, 先 sleep 5 秒
+        with metrics.timer("sleep"):
+            time.sleep(5)
+        with metrics.timer("http"):
+            resp = requests.post(
+                url,
+                headers=futures_header(),
+                data=form_data,
             )
-    else:
+    metrics.inc(
+        "financialdata_fetch_bytes_total",
+        len(resp.content),
+    )
+    if not resp.ok:
         return pd.DataFrame()
+    df = parse_content(resp.content)
+    # 只保存可以解析的資料, 假日或錯誤頁面下次重新請求
+    if (
+        archive_path is not None
+        and len(df) > 0
+    ):
+        archive_path.parent.mkdir(
+            parents=True,
+            exist_ok=True,
+        )
+        archive_path.write_bytes(
+            resp.content
+        )
     return df
 
 
@@ -194,6 +266,40 @@ def gen_parameter_list(
     return parameter_list
 
 
+def gen_task_paramter_list(
+    start_date: str, end_date: str
+) -> typing.List[typing.Dict[str, str]]:
+    """建立 task 參數列表, 排除掉周末非交易日,
+    期貨任務發送到 taifex queue
+    """
+    start_date = (
+        datetime.datetime.strptime(
+            start_date, "%Y-%m-%d"
+        ).date()
+    )
+    end_date = (
+        datetime.datetime.strptime(
+            end_date, "%Y-%m-%d"
+        ).date()
+    )
+    days = (
+        end_date - start_date
+    ).days + 1
+    date_list = [
+        start_date
+        + datetime.timedelta(days=day)
+        for day in range(days)
+    ]
+    return [
+        dict(
+            date=str(d),
+            data_source="taifex",
+        )
+        for d in date_list
+        if d.weekday() not in [5, 6]
+    ]
+
+
 def crawler(
     parameter: typing.Dict[
         str,
@@ -202,17 +308,29 @@ def crawler(
                 str, int, float
             ]
         ],
-    ]
+    ],
 ) -> pd.DataFrame:
     date = parameter.get("date", "")
     df = crawler_futures(date)
+    # 假日或錯誤頁面, 沒有資料
+    if len(df) == 0:
+        return df
     # 欄位中英轉換
-    df = colname_zh2en(df.copy())
+    with metrics.timer(
+        "parse"
+    ), tracing.start_span("parse"):
+        df = colname_zh2en(df.copy())
     # 資料清理
-    df = clean_data(df.copy())
+    with metrics.timer(
+        "clear_data"
+    ), tracing.start_span("clear_data"):
+        df = clean_data(df.copy())
     # # 檢查資料型態
-    df = check_schema(
-        df.copy(),
-        dataset="TaiwanFuturesDaily",
-    )
+    with metrics.timer(
+        "check_schema"
+    ), tracing.start_span("validate"):
+        df = check_schema(
+            df.copy(),
+            dataset="TaiwanFuturesDaily",
+        )
     return df
@@ -1,9 +1,10 @@
 """
-由於書本排版, 
+由於書本排版,
 這裡使用 black -l 40 taiwan_stock_price.py
 調整程式最大行數,
 使用者可再自行調整
 """
+
 import datetime
 import time
 import typing
@@ -11,6 +12,10 @@ import typing
 import pandas as pd
 import requests
 from loguru import logger
+from financialdata import (
+    metrics,
+    tracing,
+)
 from financialdata.schema.dataset import (
     check_schema,
 )
@@ -178,22 +183,40 @@ def crawler_tpex(
     url = url.format(
         date=convert_date(date)
     )
-    # 避免被櫃買中心 ban ip, 在每次爬蟲時, 先 sleep 5 秒
-    time.sleep(5)
-    # request method
-    res = requests.get(
-        url, headers=tpex_header()
-    )
+    with tracing.start_span(
+        "fetch", url=url
+    ):
+        # 避免被櫃買中心 ban ip, 在每次爬蟲時, 先 sleep 5 秒
+        with metrics.timer("sleep"):
+            time.sleep(5)
+        # request method
+        with metrics.timer("http"):
+            res = requests.get(
+                url,
+                headers=tpex_header(),
+            )
     data = res.json().get("aaData", [])
+    metrics.inc(
+        "financialdata_fetch_bytes_total",
+        len(res.content),
+    )
     df = pd.DataFrame(data)
     if not data or len(df) == 0:
         return pd.DataFrame()
-    # 櫃買中心回傳的資料, 並無資料欄位, 因此這裡我們直接用 index 取特定欄位
-    df = df[[0, 2, 3, 4, 5, 6, 7, 8, 9]]
-    # 欄位中英轉換
-    df = set_column(df.copy())
-    df["Date"] = date
-    df = clear_data(df.copy())
+    with metrics.timer(
+        "parse"
+    ), tracing.start_span("parse"):
+        # 櫃買中心回傳的資料, 並無資料欄位, 因此這裡我們直接用 index 取特定欄位
+        df = df[
+            [0, 2, 3, 4, 5, 6, 7, 8, 9]
+        ]
+        # 欄位中英轉換
+        df = set_column(df.copy())
+        df["Date"] = date
+    with metrics.timer(
+        "clear_data"
+    ), tracing.start_span("clear_data"):
+        df = clear_data(df.copy())
     return df
 
 
@@ -210,18 +233,28 @@ def crawler_twse(
     url = url.format(
         date=date.replace("-", "")
     )
-    # 避免被證交所 ban ip, 在每次爬蟲時, 先 sleep 5 秒
-    time.sleep(5)
-    # request method
-    res = requests.get(
-        url, headers=twse_header()
-    )
+    with tracing.start_span(
+        "fetch", url=url
+    ):
+        # 避免被證交所 ban ip, 在每次爬蟲時, 先 sleep 5 秒
+        with metrics.timer("sleep"):
+            time.sleep(5)
+        # request method
+        with metrics.timer("http"):
+            res = requests.get(
+                url,
+                headers=twse_header(),
+            )
     # 2009 年以後的資料, 股價在 response 中的 data9
     # 2009 年以後的資料, 股價在 response 中的 data8
     # 不同格式, 在證交所的資料中, 是很常見的,
     # 沒資料的情境也要考慮進去，例如現在週六沒有交易，但在 2007 年週六是有交易的
     df = pd.DataFrame()
     try:
+        metrics.inc(
+            "financialdata_fetch_bytes_total",
+            len(res.content),
+        )
         if "data9" in res.json():
             df = pd.DataFrame(
                 res.json()["data9"]
@@ -248,12 +281,18 @@ def crawler_twse(
     if len(df) == 0:
         return pd.DataFrame()
     # 欄位中英轉換
-    df = colname_zh2en(
-        df.copy(), colname
-    )
-    df["Date"] = date
-    df = convert_change(df.copy())
-    df = clear_data(df.copy())
+    with metrics.timer(
+        "parse"
+    ), tracing.start_span("parse"):
+        df = colname_zh2en(
+            df.copy(), colname
+        )
+        df["Date"] = date
+        df = convert_change(df.copy())
+    with metrics.timer(
+        "clear_data"
+    ), tracing.start_span("clear_data"):
+        df = clear_data(df.copy())
     return df
 
 
@@ -297,7 +336,7 @@ def crawler(
                 str, int, float
             ]
         ],
-    ]
+    ],
 ) -> pd.DataFrame:
     logger.info(parameter)
     date = parameter.get("date", "")
@@ -308,8 +347,11 @@ def crawler(
         df = crawler_twse(date)
     elif data_source == "tpex":
         df = crawler_tpex(date)
-    df = check_schema(
-        df.copy(),
-        dataset="TaiwanStockPrice",
-    )
+    with metrics.timer(
+        "check_schema"
+    ), tracing.start_span("validate"):
+        df = check_schema(
+            df.copy(),
+            dataset="TaiwanStockPrice",
+        )
     return df
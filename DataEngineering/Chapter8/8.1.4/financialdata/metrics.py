@@ -0,0 +1,261 @@
+"""
+爬蟲任務的 metrics, 記錄每個階段的耗時, 資料筆數, 下載量,
+輸出 Prometheus text 格式, 可用 /metrics 或 textfile collector 收集,
+METRICS_ENABLED 沒開啟時, 所有函數直接 return, 幾乎沒有額外成本
+"""
+
+import contextlib
+import os
+import threading
+import time
+import typing
+from http.server import (
+    BaseHTTPRequestHandler,
+    HTTPServer,
+)
+
+from loguru import logger
+from financialdata.config import (
+    METRICS_ENABLED,
+)
+
+# histogram 的 bucket, 單位秒, 涵蓋 sleep 5 秒與上傳資料庫
+BUCKETS = (
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+LABEL_NAMES = ("dataset", "source")
+
+_lock = threading.Lock()
+_context = threading.local()
+# {(name, labels): value}
+_counter = {}
+# {(name, labels): [bucket counts..., sum, count]}
+_histogram = {}
+
+
+def set_labels(
+    dataset: str = "", source: str = ""
+):
+    """設定目前任務的 labels, 之後的 timer, inc 都會帶上"""
+    _context.labels = (
+        ("dataset", dataset),
+        ("source", source),
+    )
+
+
+def get_labels() -> typing.Tuple:
+    return getattr(
+        _context,
+        "labels",
+        tuple(
+            (name, "")
+            for name in LABEL_NAMES
+        ),
+    )
+
+
+def inc(
+    name: str,
+    value: float = 1,
+    **labels,
+):
+    """counter 累加, 例如資料筆數, 下載 bytes"""
+    if not METRICS_ENABLED:
+        return
+    key = (
+        name,
+        get_labels()
+        + tuple(sorted(labels.items())),
+    )
+    with _lock:
+        _counter[key] = (
+            _counter.get(key, 0) + value
+        )
+
+
+def observe(
+    name: str, value: float, **labels
+):
+    """histogram 記錄一次觀測值"""
+    if not METRICS_ENABLED:
+        return
+    key = (
+        name,
+        get_labels()
+        + tuple(sorted(labels.items())),
+    )
+    with _lock:
+        if key not in _histogram:
+            _histogram[key] = [0] * (
+                len(BUCKETS) + 2
+            )
+        data = _histogram[key]
+        for i, bucket in enumerate(
+            BUCKETS
+        ):
+            if value <= bucket:
+                data[i] += 1
+        data[-2] += value
+        data[-1] += 1
+
+
+@contextlib.contextmanager
+def timer(stage: str):
+    """記錄 with 區塊的耗時, 寫入 stage_duration_seconds"""
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(
+            "financialdata_stage_duration_seconds",
+            time.perf_counter() - start,
+            stage=stage,
+        )
+
+
+def format_labels(
+    labels: typing.Tuple,
+) -> str:
+    return ",".join(
+        f'{name}="{value}"'
+        for name, value in labels
+    )
+
+
+def render() -> str:
+    """轉成 Prometheus text 格式"""
+    lines = []
+    with _lock:
+        counter = sorted(
+            _counter.items()
+        )
+        histogram = sorted(
+            (key, list(data))
+            for key, data in _histogram.items()
+        )
+    type_set = set()
+    for (
+        name,
+        labels,
+    ), value in counter:
+        if name not in type_set:
+            type_set.add(name)
+            lines.append(
+                f"# TYPE {name} counter"
+            )
+        lines.append(
+            f"{name}{{{format_labels(labels)}}} {value}"
+        )
+    for (
+        name,
+        labels,
+    ), data in histogram:
+        if name not in type_set:
+            type_set.add(name)
+            lines.append(
+                f"# TYPE {name} histogram"
+            )
+        label_str = format_labels(
+            labels
+        )
+        for bucket, count in zip(
+            BUCKETS, data
+        ):
+            lines.append(
+                f'{name}_bucket{{{label_str},le="{bucket}"}} {count}'
+            )
+        lines.append(
+            f'{name}_bucket{{{label_str},le="+Inf"}} {data[-1]}'
+        )
+        lines.append(
+            f"{name}_sum{{{label_str}}} {data[-2]}"
+        )
+        lines.append(
+            f"{name}_count{{{label_str}}} {data[-1]}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: str):
+    """node_exporter textfile collector,
+    先寫暫存檔再 rename, 避免 collector 讀到寫一半的檔案
+    """
+    if not METRICS_ENABLED or not path:
+        return
+    tmp_path = (
+        f"{path}.{os.getpid()}.tmp"
+    )
+    with open(
+        tmp_path, "w", encoding="utf8"
+    ) as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+
+
+class MetricsHandler(
+    BaseHTTPRequestHandler
+):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        content = render().encode(
+            "utf8"
+        )
+        self.send_response(200)
+        self.send_header(
+            "Content-Type",
+            "text/plain; version=0.0.4",
+        )
+        self.send_header(
+            "Content-Length",
+            str(len(content)),
+        )
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_http_server(
+    port: int,
+) -> typing.Optional[HTTPServer]:
+    """在背景 thread 啟動 /metrics, port 無法使用時不啟動, 不影響爬蟲"""
+    if not METRICS_ENABLED or not port:
+        return None
+    try:
+        server = HTTPServer(
+            ("0.0.0.0", port),
+            MetricsHandler,
+        )
+    except OSError as e:
+        logger.info(
+            f"metrics port {port}, {e}"
+        )
+        return None
+    thread = threading.Thread(
+        target=server.serve_forever,
+        daemon=True,
+    )
+    thread.start()
+    return server
+
+
+def clear():
+    with _lock:
+        _counter.clear()
+        _histogram.clear()
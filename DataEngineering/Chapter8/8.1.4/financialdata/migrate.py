@@ -0,0 +1,258 @@
+"""
+線上更換 table 結構, 依照 registry 建立 shadow table, 分批複製, 驗證後 RENAME 交換,
+最後重新發送爬蟲任務, 補回舊結構下被覆蓋的資料, 例如:
+    pipenv run python financialdata/migrate.py taiwan_futures_daily all
+    pipenv run python financialdata/migrate.py taiwan_futures_daily validate
+"""
+
+import datetime
+import sys
+import typing
+
+from financialdata.backend import db
+from financialdata.producer import (
+    Update,
+)
+from financialdata.schema.migration import (
+    STEP_LIST,
+    compare_checksum,
+    get_checksum_sql,
+    get_chunk_list,
+    get_copy_sql,
+    get_lock_sql,
+    get_shadow_table,
+    get_shadow_table_sql,
+    get_swap_sql,
+    get_version_comment_sql,
+    parse_version_comment,
+)
+from financialdata.schema.registry import (
+    TableSchema,
+    get_schema,
+)
+from loguru import logger
+
+# 每次複製的天數, 一段一個 transaction
+CHUNK_DAYS = 31
+
+
+def get_date_range(
+    table: str,
+) -> typing.Tuple[
+    typing.Optional[datetime.date],
+    typing.Optional[datetime.date],
+]:
+    return tuple(
+        db.router.mysql_financialdata_conn.execute(
+            f"SELECT MIN(`Date`), MAX(`Date`) FROM `{table}`"
+        ).fetchone()
+    )
+
+
+def get_last_version() -> int:
+    return (
+        db.router.mysql_financialdata_conn.execute(
+            "SELECT MAX(version) FROM data_version"
+        ).scalar()
+        or 0
+    )
+
+
+def create_shadow_table(
+    schema: TableSchema,
+):
+    sql = get_shadow_table_sql(schema)
+    logger.info(sql)
+    db.router.mysql_financialdata_conn.execute(
+        sql
+    )
+
+
+def copy_chunk(
+    schema: TableSchema,
+    start: str,
+    end: str,
+):
+    logger.info(
+        f"copy {schema.table} {start} ~ {end}"
+    )
+    db.router.mysql_financialdata_conn.execute(
+        get_copy_sql(schema),
+        (start, end),
+    )
+
+
+def copy_update(
+    schema: TableSchema, version: int
+) -> int:
+    """複製 data_version 中, version 之後有更新的日期, 直到沒有新的更新,
+    回傳最後複製的 version
+    """
+    while True:
+        update_list = db.router.mysql_financialdata_conn.execute(
+            f"""
+            SELECT version, start_date, end_date
+            FROM data_version
+            WHERE dataset = '{schema.table}'
+            AND version > {version}
+            ORDER BY version
+            """
+        ).fetchall()
+        if not update_list:
+            return version
+        for (
+            version,
+            start_date,
+            end_date,
+        ) in update_list:
+            for (
+                start,
+                end,
+            ) in get_chunk_list(
+                start_date,
+                end_date,
+                CHUNK_DAYS,
+            ):
+                copy_chunk(
+                    schema, start, end
+                )
+
+
+def get_copied_version(
+    schema: TableSchema,
+) -> int:
+    comment = db.router.mysql_financialdata_conn.execute(
+        f"""
+        SELECT TABLE_COMMENT FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE()
+        AND TABLE_NAME = '{get_shadow_table(schema.table)}'
+        """
+    ).scalar()
+    version = parse_version_comment(
+        comment
+    )
+    if version is None:
+        raise ValueError(
+            f"{schema.table} run copy before swap"
+        )
+    return version
+
+
+def copy_data(schema: TableSchema):
+    """分批複製, 複製期間爬蟲仍然寫入原本的 table,
+    依照 data_version 再次複製期間有更新的日期, 直到沒有新的更新,
+    完成時的 version 記錄在 shadow table, swap 時從這裡繼續
+    """
+    version = get_last_version()
+    start_date, end_date = (
+        get_date_range(schema.table)
+    )
+    if start_date is not None:
+        for (
+            start,
+            end,
+        ) in get_chunk_list(
+            start_date,
+            end_date,
+            CHUNK_DAYS,
+        ):
+            copy_chunk(
+                schema, start, end
+            )
+    version = copy_update(
+        schema, version
+    )
+    db.router.mysql_financialdata_conn.execute(
+        get_version_comment_sql(
+            schema.table, version
+        )
+    )
+
+
+def validate(schema: TableSchema):
+    """每年的筆數與 checksum 需要一致, 不一致時中止, 不會交換"""
+    checksum_list = [
+        db.router.mysql_financialdata_conn.execute(
+            get_checksum_sql(
+                schema, table
+            )
+        ).fetchall()
+        for table in [
+            schema.table,
+            get_shadow_table(
+                schema.table
+            ),
+        ]
+    ]
+    year_list = compare_checksum(
+        *checksum_list
+    )
+    if year_list:
+        raise ValueError(
+            f"{schema.table} mismatch years: {year_list}, run copy again"
+        )
+    logger.info(
+        f"{schema.table} validate ok"
+    )
+
+
+def swap(schema: TableSchema):
+    """鎖住原本的 table, 複製 copy 之後才寫入的更新, 再 RENAME,
+    鎖住期間爬蟲的寫入會等待, 不會寫入即將變成 _old 的 table
+    """
+    version = get_copied_version(schema)
+    conn = (
+        db.router.mysql_financialdata_conn
+    )
+    conn.execute(
+        get_lock_sql(schema.table)
+    )
+    try:
+        copy_update(schema, version)
+        sql = get_swap_sql(schema.table)
+        logger.info(sql)
+        conn.execute(sql)
+    finally:
+        conn.execute("UNLOCK TABLES")
+
+
+def backfill(schema: TableSchema):
+    """舊結構下被覆蓋的資料, 只能重新爬取,
+    有原始資料 archive 的日期, 爬蟲直接讀取 archive
+    """
+    start_date, end_date = (
+        get_date_range(schema.table)
+    )
+    if start_date is None:
+        return
+    Update(
+        schema.table,
+        str(start_date),
+        str(end_date),
+    )
+
+
+STEP_FUNC = {
+    "create": create_shadow_table,
+    "copy": copy_data,
+    "validate": validate,
+    "swap": swap,
+    "backfill": backfill,
+}
+
+
+def migrate(table: str, step: str):
+    schema = get_schema(table)
+    step_list = (
+        STEP_LIST
+        if step == "all"
+        else [step]
+    )
+    for step in step_list:
+        logger.info(f"{table} {step}")
+        STEP_FUNC[step](schema)
+
+
+if __name__ == "__main__":
+    table, step = sys.argv[1:]
+    migrate(table, step)
@@ -0,0 +1,70 @@
+"""
+檢查 RANGE partition, 提早建立未來的 partition,
+避免新年度的資料寫入失敗, scheduler 每天執行一次, 也可以手動執行:
+    pipenv run python financialdata/partition.py
+"""
+
+import datetime
+import typing
+
+from financialdata.backend import db
+from financialdata.schema.partition import (
+    get_partition_sql,
+)
+from financialdata.schema.registry import (
+    get_partition_table_list,
+)
+from loguru import logger
+
+
+def get_partition_list(
+    table: str,
+) -> typing.List[
+    typing.Tuple[str, str]
+]:
+    sql = f"""
+    SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+    FROM information_schema.PARTITIONS
+    WHERE TABLE_SCHEMA = DATABASE()
+    AND TABLE_NAME = '{table}'
+    ORDER BY PARTITION_ORDINAL_POSITION
+    """
+    return [
+        (name, description)
+        for name, description in db.router.mysql_financialdata_conn.execute(
+            sql
+        ).fetchall()
+        if name
+    ]
+
+
+def ensure_partitions(
+    today: datetime.date = None,
+):
+    today = (
+        today or datetime.date.today()
+    )
+    for (
+        item
+    ) in get_partition_table_list():
+        sql = get_partition_sql(
+            item,
+            get_partition_list(
+                item.table
+            ),
+            today,
+        )
+        if sql is None:
+            logger.info(
+                f"{item.table} partition is up to date"
+            )
+            continue
+        logger.info(sql)
+        # DDL 會自動 commit, 不需要 transaction
+        db.router.mysql_financialdata_conn.execute(
+            sql
+        )
+
+
+if __name__ == "__main__":
+    ensure_partitions()
@@ -3,6 +3,7 @@ import sys
 
 from loguru import logger
 
+from financialdata import tracing
 from financialdata.backend import db
 from financialdata.tasks.task import (
     crawler,
@@ -26,20 +27,39 @@ def Update(
         start_date=start_date,
         end_date=end_date,
     )
-    # 用 for loop 發送任務
-    for parameter in parameter_list:
-        logger.info(
-            f"{dataset}, {parameter}"
-        )
-        task = crawler.s(
-            dataset, parameter
-        )
-        # queue 參數，可以指定要發送到特定 queue 列隊中
-        task.apply_async(
-            queue=parameter.get(
-                "data_source", ""
+    with tracing.start_span(
+        "producer.Update",
+        dataset=dataset,
+        start_date=start_date,
+        end_date=end_date,
+    ):
+        # 用 for loop 發送任務
+        for parameter in parameter_list:
+            logger.info(
+                f"{dataset}, {parameter}"
+            )
+            task = crawler.s(
+                dataset, parameter
             )
-        )
+            # 每個任務一個 span, trace id 透過 headers 傳給 worker
+            with tracing.start_span(
+                "producer.send",
+                dataset=dataset,
+                date=parameter.get(
+                    "date"
+                ),
+                source=parameter.get(
+                    "data_source"
+                ),
+            ):
+                # queue 參數，可以指定要發送到特定 queue 列隊中
+                task.apply_async(
+                    queue=parameter.get(
+                        "data_source",
+                        "",
+                    ),
+                    headers=tracing.inject(),
+                )
 
     db.router.close_connection()
 
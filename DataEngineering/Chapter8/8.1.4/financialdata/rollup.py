@@ -0,0 +1,81 @@
+"""
+重新計算彙總 table 的全部資料, 例如建立新的彙總 table, 或 taiwan_stock_info 更新產業別後:
+    pipenv run python financialdata/rollup.py
+    pipenv run python financialdata/rollup.py taiwan_stock_price_month
+不經過 upload_data 寫入 source 後 (例如 Chapter11 的 bulk load), 重算以它為 source 的彙總 table:
+    pipenv run python financialdata/rollup.py --source taiwan_stock_info
+"""
+
+import argparse
+import datetime
+import sys
+import typing
+
+from financialdata.backend import db
+from financialdata.schema.rollup import (
+    Rollup,
+    get_rollup_list,
+)
+from loguru import logger
+
+
+def rebuild(rollup: Rollup):
+    """依照第一個 source 的日期範圍, 每年重算一次, 避免單一 transaction 過大"""
+    if rollup.unit == "all":
+        logger.info(
+            f"rebuild {rollup.table}"
+        )
+        db.refresh_rollup(
+            rollup,
+            None,
+            None,
+            db.router.mysql_financialdata_conn,
+        )
+        return
+    start_date, end_date = (
+        db.router.mysql_financialdata_conn.execute(
+            f"SELECT MIN(`Date`), MAX(`Date`) FROM `{rollup.source_list[0]}`"
+        ).fetchone()
+    )
+    if start_date is None:
+        return
+    for year in range(
+        start_date.year,
+        end_date.year + 1,
+    ):
+        logger.info(
+            f"rebuild {rollup.table} {year}"
+        )
+        db.refresh_rollup(
+            rollup,
+            datetime.date(year, 1, 1),
+            datetime.date(year, 12, 31),
+            db.router.mysql_financialdata_conn,
+        )
+
+
+def parse_args(
+    argv: typing.List[str],
+) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "table", nargs="?", default=""
+    )
+    parser.add_argument(
+        "--source", default=""
+    )
+    return parser.parse_args(argv)
+
+
+def main(
+    table: str = "", source: str = ""
+):
+    for rollup in get_rollup_list(
+        source=source, table=table
+    ):
+        rebuild(rollup)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    main(args.table, source=args.source)
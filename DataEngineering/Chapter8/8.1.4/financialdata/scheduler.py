@@ -1,48 +1,188 @@
 import time
 import datetime
+import typing
 
 from apscheduler.schedulers.background import (
     BackgroundScheduler,
 )
+from apscheduler.triggers.cron import (
+    CronTrigger,
+)
+from financialdata import partition
+from financialdata.backend import db
+from financialdata.backend.db import (
+    clients,
+)
 from financialdata.producer import (
     Update,
 )
+from financialdata.schema.partition import (
+    PARTITION_CRON,
+)
+from financialdata.schema.schedule import (
+    SCHEDULE_LIST,
+    TIMEZONE,
+    ScheduleItem,
+    get_missed_date_range,
+    get_trigger,
+)
 from loguru import logger
+from sqlalchemy import engine
+
+SCHEDULER_LOCK_NAME = (
+    "financialdata_scheduler"
+)
+
+
+def acquire_scheduler_lock(
+    mysql_conn: engine.base.Connection,
+) -> bool:
+    """使用 MySQL GET_LOCK, 同時啟動多個 scheduler 時,
+    只有拿到 lock 的 scheduler 會發送任務, 避免重複發送
+    """
+    result = mysql_conn.execute(
+        f"SELECT GET_LOCK('{SCHEDULER_LOCK_NAME}', 0)"
+    ).scalar()
+    return result == 1
+
+
+def check_scheduler_lock(
+    mysql_conn: engine.base.Connection,
+) -> bool:
+    """確認 lock 仍在自己的連線上, 連線斷掉時 lock 會被釋放"""
+    try:
+        result = mysql_conn.execute(
+            f"SELECT IS_USED_LOCK('{SCHEDULER_LOCK_NAME}') = CONNECTION_ID()"
+        ).scalar()
+        return result == 1
+    except Exception as e:
+        logger.info(e)
+        return False
+
+
+def get_last_run_date(
+    dataset: str,
+) -> typing.Optional[datetime.date]:
+    """上次發送任務的資料日期"""
+    sql = f"""
+    select last_date from scheduler_run_log
+    where dataset = '{dataset}'
+    """
+    return db.router.mysql_financialdata_conn.execute(
+        sql
+    ).scalar()
 
 
-def sent_crawler_task():
-    # 將此段，改成發送任務的程式碼
-    # logger.info(f"sent_crawler_task {dataset}")
-    today = (
-        datetime.datetime.today()
-        .date()
-        .strftime("%Y-%m-%d")
+def set_last_run_date(
+    dataset: str, date: str
+):
+    sql = f"""
+    INSERT INTO scheduler_run_log(dataset, last_date)
+    VALUES ('{dataset}', '{date}')
+    ON DUPLICATE KEY UPDATE
+    last_date = GREATEST(last_date, VALUES(last_date))
+    """
+    db.commit(
+        sql=sql,
+        mysql_conn=db.router.mysql_financialdata_conn,
+    )
+
+
+def sent_crawler_task(
+    item: ScheduleItem,
+):
+    """發送上次紀錄之後, 所有尚未發送的日期,
+    排程正常時只會是當天, scheduler 停機後重啟, 則會一次補上中間漏掉的日期
+    """
+    now = datetime.datetime.now(
+        get_trigger(item).timezone
+    )
+    last_date = get_last_run_date(
+        item.dataset
+    )
+    date_range = get_missed_date_range(
+        item, last_date, now
+    )
+    if date_range is None:
+        logger.info(
+            f"{item.dataset} already sent, last_date: {last_date}"
+        )
+        return
+    start_date, end_date = date_range
+    logger.info(
+        f"sent_crawler_task {item.dataset} {start_date} ~ {end_date}"
     )
     Update(
-        dataset="taiwan_stock_price",
-        start_date=today,
-        end_date=today,
+        dataset=item.dataset,
+        start_date=start_date,
+        end_date=end_date,
     )
+    set_last_run_date(
+        item.dataset, end_date
+    )
+
+
+def catch_up():
+    """啟動時, 補發 scheduler 停機期間漏掉的任務"""
+    for item in SCHEDULE_LIST:
+        sent_crawler_task(item)
 
 
-def main():
+def main() -> typing.Tuple[
+    BackgroundScheduler,
+    engine.base.Connection,
+]:
+    # lock 使用獨立的連線, 因為 Update 結束時會關閉 router 的連線
+    lock_conn = (
+        clients.get_mysql_financialdata_conn()
+    )
+    # 其他 scheduler 正在執行, 作為備援, 每分鐘重試
+    while not acquire_scheduler_lock(
+        lock_conn
+    ):
+        logger.info(
+            "scheduler lock is held by another scheduler, wait"
+        )
+        time.sleep(60)
+    # 先確認 partition 足夠, 再補發任務
+    partition.ensure_partitions()
+    catch_up()
     scheduler = BackgroundScheduler(
-        timezone="Asia/Taipei"
+        timezone=TIMEZONE
     )
-    # 與 crontab 類似，設定何時執行，有小時、分鐘、秒參數，* 星號代表任意時間點
     scheduler.add_job(
-        id="sent_crawler_task",
-        func=sent_crawler_task,
-        trigger="cron",
-        hour="15",
-        minute="0",
-        day_of_week="mon-fri",
-    )
-    logger.info("sent_crawler_task")
+        id="ensure_partitions",
+        func=partition.ensure_partitions,
+        trigger=CronTrigger.from_crontab(
+            PARTITION_CRON,
+            timezone=TIMEZONE,
+        ),
+    )
+    # 根據排程註冊表, 每個 dataset 各自一個 cron job
+    for item in SCHEDULE_LIST:
+        scheduler.add_job(
+            id=f"sent_crawler_task_{item.dataset}",
+            func=sent_crawler_task,
+            trigger=get_trigger(item),
+            kwargs=dict(item=item),
+        )
+        logger.info(
+            f"sent_crawler_task {item.dataset} {item.cron}"
+        )
     scheduler.start()
+    return scheduler, lock_conn
 
 
 if __name__ == "__main__":
-    main()
+    scheduler, lock_conn = main()
     while True:
-        time.sleep(600)
+        time.sleep(60)
+        # lock 遺失時, 停止發送任務, 交給其他 scheduler
+        if not check_scheduler_lock(
+            lock_conn
+        ):
+            logger.info(
+                "lost scheduler lock, shutdown"
+            )
+            scheduler.shutdown()
+            break
@@ -1,52 +1,29 @@
-from pydantic import BaseModel
-import importlib
-
 import pandas as pd
 
+from financialdata.schema.registry import (
+    get_model,
+    get_schema,
+    validate,
+)
 
-class TaiwanStockPrice(BaseModel):
-    StockID: str
-    TradeVolume: int
-    Transaction: int
-    TradeValue: int
-    Open: float
-    Max: float
-    Min: float
-    Close: float
-    Change: float
-    Date: str
-
-
-class TaiwanFuturesDaily(BaseModel):
-    Date: str
-    FuturesID: str
-    ContractDate: str
-    Open: float
-    Max: float
-    Min: float
-    Close: float
-    Change: float
-    ChangePer: float
-    Volume: float
-    SettlementPrice: float
-    OpenInterest: int
-    TradingSession: str
+# 單筆資料的 model, 由 registry 產生
+TaiwanStockPrice = get_model(
+    get_schema("taiwan_stock_price")
+)
+TaiwanFuturesDaily = get_model(
+    get_schema("taiwan_futures_daily")
+)
 
 
 def check_schema(
     df: pd.DataFrame, dataset: str
 ) -> pd.DataFrame:
-    """檢查資料型態, 確保每次要上傳資料庫前, 型態正確"""
-    df_dict = df.to_dict("records")
-    schema = getattr(
-        importlib.import_module(
-            "financialdata.schema.dataset"
-        ),
-        dataset,
+    """檢查資料型態, 確保每次要上傳資料庫前, 型態正確,
+    dataset 可以是 TaiwanStockPrice 或 taiwan_stock_price
+    """
+    # 休市日爬蟲回傳空的 DataFrame, 直接回傳
+    if len(df) == 0:
+        return df
+    return validate(
+        df, get_schema(dataset)
     )
-    df_schema = [
-        schema(**dd).__dict__
-        for dd in df_dict
-    ]
-    df = pd.DataFrame(df_schema)
-    return df
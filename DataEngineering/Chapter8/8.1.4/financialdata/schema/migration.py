@@ -0,0 +1,234 @@
+import datetime
+import typing
+
+from financialdata.schema.registry import (
+    TableSchema,
+    get_column_list_sql,
+    get_create_table_sql,
+    get_schema,
+    get_update_sql,
+)
+
+# 線上更換 table 結構的步驟, 依序執行
+STEP_LIST = [
+    "create",
+    "copy",
+    "validate",
+    "swap",
+    "backfill",
+]
+
+
+def get_shadow_table(table: str) -> str:
+    return f"{table}_new"
+
+
+def get_old_table(table: str) -> str:
+    return f"{table}_old"
+
+
+def get_shadow_table_sql(
+    schema: TableSchema,
+) -> str:
+    """依照 registry 的新結構, 建立 shadow table"""
+    return get_create_table_sql(
+        schema.copy(
+            update=dict(
+                table=get_shadow_table(
+                    schema.table
+                )
+            )
+        )
+    )
+
+
+def get_chunk_list(
+    start_date: datetime.date,
+    end_date: datetime.date,
+    chunk_days: int,
+) -> typing.List[
+    typing.Tuple[str, str]
+]:
+    """start_date ~ end_date (包含) 切成多段 [start, end),
+    每段一個 transaction, 避免長時間鎖住原本的 table
+    """
+    chunk_list = []
+    start = start_date
+    while start <= end_date:
+        end = min(
+            start
+            + datetime.timedelta(
+                days=chunk_days
+            ),
+            end_date
+            + datetime.timedelta(
+                days=1
+            ),
+        )
+        chunk_list.append(
+            (str(start), str(end))
+        )
+        start = end
+    return chunk_list
+
+
+def get_copy_sql(
+    schema: TableSchema,
+) -> str:
+    """複製 [start, end) 的資料到 shadow table,
+    重複執行結果相同, 中斷後可以重跑
+    """
+    columns = get_column_list_sql(
+        schema.column_names
+    )
+    return (
+        f"INSERT INTO `{get_shadow_table(schema.table)}`({columns}) "
+        f"SELECT {columns} FROM `{schema.table}` "
+        "WHERE `Date` >= %s AND `Date` < %s "
+        + get_update_sql(
+            schema, schema.column_names
+        )
+    )
+
+
+def get_checksum_sql(
+    schema: TableSchema, table: str
+) -> str:
+    """每年的筆數與內容 checksum, 用來比對兩個 table 的資料是否一致"""
+    return (
+        "SELECT YEAR(`Date`), COUNT(*), "
+        "SUM(CRC32(CONCAT_WS('|',"
+        + get_column_list_sql(
+            schema.column_names
+        )
+        + "))) "
+        f"FROM `{table}` "
+        "GROUP BY YEAR(`Date`) "
+        "ORDER BY YEAR(`Date`)"
+    )
+
+
+def compare_checksum(
+    source_list: typing.List[
+        typing.Tuple[int, int, int]
+    ],
+    target_list: typing.List[
+        typing.Tuple[int, int, int]
+    ],
+) -> typing.List[int]:
+    """回傳 (年度, 筆數, checksum) 不一致的年度"""
+    source_dict = {
+        int(year): (
+            int(count),
+            int(checksum or 0),
+        )
+        for year, count, checksum in source_list
+    }
+    target_dict = {
+        int(year): (
+            int(count),
+            int(checksum or 0),
+        )
+        for year, count, checksum in target_list
+    }
+    return sorted(
+        year
+        for year in set(source_dict)
+        | set(target_dict)
+        if source_dict.get(year)
+        != target_dict.get(year)
+    )
+
+
+# shadow table 的 COMMENT, 記錄 copy 完成時的 data_version
+VERSION_COMMENT = (
+    "copied data_version {}"
+)
+
+
+def get_version_comment_sql(
+    table: str, version: int
+) -> str:
+    """記錄在 shadow table 上, 分開執行 copy 與 swap 時也能取得"""
+    return (
+        f"ALTER TABLE `{get_shadow_table(table)}` "
+        f"COMMENT = '{VERSION_COMMENT.format(int(version))}'"
+    )
+
+
+def parse_version_comment(
+    comment: str,
+) -> typing.Optional[int]:
+    prefix = VERSION_COMMENT.format("")
+    if not (comment or "").startswith(
+        prefix
+    ):
+        return None
+    return int(comment[len(prefix) :])
+
+
+def get_lock_sql(table: str) -> str:
+    """swap 前鎖住原本的 table, 爬蟲的寫入等待到 RENAME 之後,
+    LOCK TABLES 期間只能使用有鎖的 table, data_version 用來查詢更新
+    """
+    return (
+        f"LOCK TABLES `{table}` WRITE, "
+        f"`{get_shadow_table(table)}` WRITE, "
+        "`data_version` READ"
+    )
+
+
+def get_swap_sql(table: str) -> str:
+    """RENAME 多個 table 是 atomic, 不會有查不到 table 的時間,
+    原本的 table 保留為 _old, 確認沒問題後再手動 drop
+    """
+    return (
+        f"RENAME TABLE `{table}` TO `{get_old_table(table)}`, "
+        f"`{get_shadow_table(table)}` TO `{table}`"
+    )
+
+
+def get_schema_migration_table_sql() -> (
+    str
+):
+    """既有的資料庫沒有 schema_migration, 第一次執行 migration 時建立"""
+    return get_create_table_sql(
+        get_schema("schema_migration")
+    ).replace(
+        "CREATE TABLE",
+        "CREATE TABLE IF NOT EXISTS",
+        1,
+    )
+
+
+def get_pending_migration(
+    name_list: typing.List[str],
+    applied_set: typing.Set[str],
+) -> typing.List[str]:
+    """依照檔名排序, 只回傳尚未執行過的 .sql"""
+    return sorted(
+        name
+        for name in name_list
+        if name.endswith(".sql")
+        and name not in applied_set
+    )
+
+
+def split_statement(
+    content: str,
+) -> typing.List[str]:
+    """去掉 -- 註解, 依照 ; 切成多個 statement"""
+    content = "\n".join(
+        line
+        for line in content.splitlines()
+        if not line.strip().startswith(
+            "--"
+        )
+    )
+    return [
+        statement.strip()
+        for statement in content.split(
+            ";"
+        )
+        if statement.strip()
+    ]
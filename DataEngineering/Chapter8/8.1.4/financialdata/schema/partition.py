@@ -0,0 +1,149 @@
+import datetime
+import typing
+
+from pydantic import BaseModel
+
+# 每天檢查一次, 提早建立未來的 partition
+PARTITION_CRON = "0 1 * * *"
+MAXVALUE_PARTITION = "pmax"
+
+
+class PartitionTable(BaseModel):
+    """RANGE partition 設定, 每個 table 一筆, 在 registry 的 TableSchema 設定"""
+
+    table: str
+    # year: RANGE(YEAR(Date)), p2025
+    # month: RANGE(TO_DAYS(Date)), p202501
+    unit: str
+    # 提早建立幾個未來的 partition
+    ahead: int
+
+
+def to_days(date: datetime.date) -> int:
+    """與 mysql TO_DAYS 相同"""
+    return date.toordinal() + 365
+
+
+def from_days(
+    days: int,
+) -> datetime.date:
+    return datetime.date.fromordinal(
+        days - 365
+    )
+
+
+def next_period(
+    unit: str, date: datetime.date
+) -> datetime.date:
+    """下一個年度或月份的第一天"""
+    if unit == "year":
+        return datetime.date(
+            date.year + 1, 1, 1
+        )
+    if date.month == 12:
+        return datetime.date(
+            date.year + 1, 1, 1
+        )
+    return datetime.date(
+        date.year, date.month + 1, 1
+    )
+
+
+def get_partition_name(
+    unit: str, date: datetime.date
+) -> str:
+    if unit == "year":
+        return f"p{date.year}"
+    return (
+        f"p{date.year}{date.month:02d}"
+    )
+
+
+def get_partition_value(
+    unit: str, date: datetime.date
+) -> str:
+    """VALUES LESS THAN 的值, date 為下一個 partition 的第一天"""
+    if unit == "year":
+        return str(date.year)
+    return str(to_days(date))
+
+
+def get_upper_bound(
+    unit: str,
+    partition_list: typing.List[
+        typing.Tuple[str, str]
+    ],
+) -> typing.Optional[datetime.date]:
+    """既有的 partition (名稱, PARTITION_DESCRIPTION),
+    回傳最後一個非 MAXVALUE partition 的上限日期 (不包含)
+    """
+    value_list = [
+        int(description)
+        for name, description in partition_list
+        if description
+        and description != "MAXVALUE"
+    ]
+    if not value_list:
+        return None
+    value = max(value_list)
+    if unit == "year":
+        return datetime.date(
+            value, 1, 1
+        )
+    return from_days(value)
+
+
+def get_partition_sql(
+    item: PartitionTable,
+    partition_list: typing.List[
+        typing.Tuple[str, str]
+    ],
+    today: datetime.date,
+) -> typing.Optional[str]:
+    """需要新增的 partition, 涵蓋到 today 之後 ahead 個週期,
+    有 pmax 時, 從 pmax 切出新的 partition, 不需要新增時回傳 None
+    """
+    upper_bound = get_upper_bound(
+        item.unit, partition_list
+    )
+    if upper_bound is None:
+        return None
+    # 需要涵蓋到的日期 (不包含)
+    target = next_period(
+        item.unit, today
+    )
+    for _ in range(item.ahead):
+        target = next_period(
+            item.unit, target
+        )
+    definition_list = []
+    start = upper_bound
+    while start < target:
+        end = next_period(
+            item.unit, start
+        )
+        definition_list.append(
+            f"PARTITION {get_partition_name(item.unit, start)} "
+            f"VALUES LESS THAN ({get_partition_value(item.unit, end)})"
+        )
+        start = end
+    if not definition_list:
+        return None
+    if MAXVALUE_PARTITION in [
+        name
+        for name, _ in partition_list
+    ]:
+        definition_list.append(
+            f"PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN MAXVALUE"
+        )
+        return (
+            f"ALTER TABLE `{item.table}` "
+            f"REORGANIZE PARTITION {MAXVALUE_PARTITION} INTO ("
+            + ", ".join(definition_list)
+            + ")"
+        )
+    return (
+        f"ALTER TABLE `{item.table}` ADD PARTITION ("
+        + ", ".join(definition_list)
+        + ")"
+    )
@@ -0,0 +1,945 @@
+"""
+每個 table 只在這裡定義一次, 由定義產生
+mysql DDL, pandas / arrow 型態, 上傳前的檢查, 與 upsert SQL,
+重新產生 create_partition_table.sql:
+    pipenv run python financialdata/schema/registry.py > create_partition_table.sql
+只輸出一個 table, 例如 Chapter11/11.5 上傳使用的 DDL:
+    pipenv run python financialdata/schema/registry.py taiwan_stock_price
+"""
+
+import datetime
+import re
+import sys
+import typing
+
+import numpy as np
+import pandas as pd
+from pydantic import (
+    BaseModel,
+    create_model,
+)
+
+from financialdata.schema.partition import (
+    MAXVALUE_PARTITION,
+    PartitionTable,
+    get_partition_name,
+    get_partition_value,
+    next_period,
+)
+
+DATABASE = "FinancialData"
+
+# mysql 型態, 對應 pandas dtype,
+# DATE 上傳前統一轉成 YYYY-MM-DD 字串
+PANDAS_DTYPE = {
+    "VARCHAR": "object",
+    "TEXT": "object",
+    "INT": "int64",
+    "BIGINT": "int64",
+    "FLOAT": "float64",
+    "DOUBLE": "float64",
+    "DATE": "object",
+    "DATETIME": "object",
+}
+# 可以是 null 的整數欄位, 使用 pandas nullable 型態
+NULLABLE_PANDAS_DTYPE = {
+    "INT": "Int64",
+    "BIGINT": "Int64",
+}
+# mysql 型態, 對應 arrow 型態, 與 api 輸出一致
+ARROW_TYPE = {
+    "VARCHAR": "string",
+    "TEXT": "string",
+    "INT": "int64",
+    "BIGINT": "int64",
+    "FLOAT": "float32",
+    "DOUBLE": "float64",
+    "DATE": "date32",
+    "DATETIME": "timestamp[s]",
+}
+# mysql 型態, 對應 pydantic 型態
+PYTHON_TYPE = {
+    "VARCHAR": str,
+    "TEXT": str,
+    "INT": int,
+    "BIGINT": int,
+    "FLOAT": float,
+    "DOUBLE": float,
+    "DATE": str,
+    "DATETIME": str,
+}
+
+
+class Column(BaseModel):
+    name: str
+    # mysql 型態, 例如 VARCHAR(10), BIGINT
+    type: str
+    nullable: bool = False
+    # 其他設定, 例如 AUTO_INCREMENT, DEFAULT CURRENT_TIMESTAMP
+    extra: str = ""
+
+
+class Index(BaseModel):
+    name: str
+    columns: typing.List[str]
+
+
+class TableSchema(BaseModel):
+    table: str
+    # 爬蟲使用的名稱, 例如 check_schema(df, "TaiwanStockPrice")
+    dataset: str = ""
+    columns: typing.List[Column]
+    primary_key: typing.List[str]
+    index_list: typing.List[Index] = []
+    # RANGE partition, 建表時建立 partition_start ~ partition_end,
+    # 之後由 ensure_partitions 提早建立
+    partition: typing.Optional[
+        PartitionTable
+    ] = None
+    partition_start: str = ""
+    partition_end: str = ""
+    # 例如 COMPRESSED, 空字串為 mysql 預設
+    row_format: str = ""
+
+    @property
+    def column_names(
+        self,
+    ) -> typing.List[str]:
+        return [
+            column.name
+            for column in self.columns
+        ]
+
+
+def price_columns(
+    *names: str,
+) -> typing.List[Column]:
+    return [
+        Column(name=name, type="FLOAT")
+        for name in names
+    ]
+
+
+def count_columns(
+    *names: str,
+) -> typing.List[Column]:
+    return [
+        Column(name=name, type="INT")
+        for name in names
+    ]
+
+
+# 法人名稱, taiwan_stock_investor_price 每種法人一個買賣超欄位
+INVESTOR_NAME_LIST = [
+    "Foreign_Investor",
+    "Foreign_Dealer_Self",
+    "Investment_Trust",
+    "Dealer_self",
+    "Dealer_Hedging",
+]
+
+
+# schema 註冊表, 順序與 create_partition_table.sql 一致
+SCHEMA_LIST = [
+    TableSchema(
+        table="taiwan_stock_price",
+        dataset="TaiwanStockPrice",
+        columns=[
+            Column(
+                name="StockID",
+                type="VARCHAR(10)",
+            ),
+            Column(
+                name="TradeVolume",
+                type="BIGINT",
+            ),
+            Column(
+                name="Transaction",
+                type="INT",
+            ),
+            Column(
+                name="TradeValue",
+                type="BIGINT",
+            ),
+            *price_columns(
+                "Open",
+                "Max",
+                "Min",
+                "Close",
+                "Change",
+            ),
+            Column(
+                name="Date", type="DATE"
+            ),
+        ],
+        primary_key=["StockID", "Date"],
+        index_list=[
+            Index(
+                name="idx_date_stock",
+                columns=[
+                    "Date",
+                    "StockID",
+                    "Close",
+                ],
+            )
+        ],
+        partition=PartitionTable(
+            table="taiwan_stock_price",
+            unit="year",
+            ahead=2,
+        ),
+        partition_start="2005-01-01",
+        partition_end="2024-12-31",
+    ),
+    TableSchema(
+        table="taiwan_futures_daily",
+        dataset="TaiwanFuturesDaily",
+        columns=[
+            Column(
+                name="Date", type="DATE"
+            ),
+            Column(
+                name="FuturesID",
+                type="VARCHAR(10)",
+            ),
+            Column(
+                name="ContractDate",
+                type="VARCHAR(30)",
+            ),
+            *price_columns(
+                "Open",
+                "Max",
+                "Min",
+                "Close",
+                "Change",
+                "ChangePer",
+                "Volume",
+                "SettlementPrice",
+            ),
+            Column(
+                name="OpenInterest",
+                type="INT",
+            ),
+            Column(
+                name="TradingSession",
+                type="VARCHAR(11)",
+            ),
+        ],
+        # 同一天有多個到期月份, 與一般, 盤後兩個交易時段
+        primary_key=[
+            "FuturesID",
+            "ContractDate",
+            "TradingSession",
+            "Date",
+        ],
+        partition=PartitionTable(
+            table="taiwan_futures_daily",
+            unit="year",
+            ahead=2,
+        ),
+        partition_start="2005-01-01",
+        partition_end="2024-12-31",
+    ),
+    TableSchema(
+        table="scheduler_run_log",
+        columns=[
+            Column(
+                name="dataset",
+                type="VARCHAR(64)",
+            ),
+            Column(
+                name="last_date",
+                type="DATE",
+            ),
+            Column(
+                name="update_time",
+                type="DATETIME",
+                extra="DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP",
+            ),
+        ],
+        primary_key=["dataset"],
+    ),
+    TableSchema(
+        table="taiwan_stock_indicator",
+        columns=[
+            Column(
+                name="StockID",
+                type="VARCHAR(10)",
+            ),
+            Column(
+                name="Date", type="DATE"
+            ),
+            *[
+                Column(
+                    name=name,
+                    type="DOUBLE",
+                    nullable=True,
+                )
+                for name in [
+                    "ma_5",
+                    "ma_20",
+                    "ma_60",
+                    "rsi_14",
+                    "bband_upper_20",
+                    "bband_lower_20",
+                ]
+            ],
+        ],
+        primary_key=["StockID", "Date"],
+    ),
+    TableSchema(
+        table="taiwan_stock_indicator_state",
+        columns=[
+            Column(
+                name="StockID",
+                type="VARCHAR(10)",
+            ),
+            Column(
+                name="Date", type="DATE"
+            ),
+            Column(
+                name="State",
+                type="TEXT",
+            ),
+        ],
+        primary_key=["StockID"],
+    ),
+    TableSchema(
+        table="data_version",
+        columns=[
+            Column(
+                name="version",
+                type="BIGINT",
+                extra="AUTO_INCREMENT",
+            ),
+            Column(
+                name="dataset",
+                type="VARCHAR(64)",
+            ),
+            Column(
+                name="start_date",
+                type="DATE",
+            ),
+            Column(
+                name="end_date",
+                type="DATE",
+            ),
+            Column(
+                name="update_time",
+                type="DATETIME",
+                extra="DEFAULT CURRENT_TIMESTAMP",
+            ),
+        ],
+        primary_key=["version"],
+        index_list=[
+            Index(
+                name="idx_dataset_version",
+                columns=[
+                    "dataset",
+                    "version",
+                ],
+            )
+        ],
+    ),
+    TableSchema(
+        table="data_version_consumer",
+        columns=[
+            Column(
+                name="consumer",
+                type="VARCHAR(64)",
+            ),
+            Column(
+                name="version",
+                type="BIGINT",
+            ),
+        ],
+        primary_key=["consumer"],
+    ),
+    # migration 資料夾中已經執行過的檔案
+    TableSchema(
+        table="schema_migration",
+        columns=[
+            Column(
+                name="name",
+                type="VARCHAR(255)",
+            ),
+            Column(
+                name="applied_time",
+                type="DATETIME",
+                extra="DEFAULT CURRENT_TIMESTAMP",
+            ),
+        ],
+        primary_key=["name"],
+    ),
+    TableSchema(
+        table="taiwan_stock_market_summary",
+        columns=[
+            Column(
+                name="Date", type="DATE"
+            ),
+            *count_columns(
+                "StockCount"
+            ),
+            Column(
+                name="TradeVolume",
+                type="BIGINT",
+            ),
+            Column(
+                name="TradeValue",
+                type="BIGINT",
+            ),
+            Column(
+                name="Transaction",
+                type="BIGINT",
+            ),
+            *count_columns(
+                "Advancers",
+                "Decliners",
+                "Unchanged",
+            ),
+        ],
+        primary_key=["Date"],
+    ),
+    TableSchema(
+        table="taiwan_stock_price_month",
+        columns=[
+            Column(
+                name="StockID",
+                type="VARCHAR(10)",
+            ),
+            # 每月第一天
+            Column(
+                name="Month",
+                type="DATE",
+            ),
+            Column(
+                name="StartDate",
+                type="DATE",
+            ),
+            Column(
+                name="EndDate",
+                type="DATE",
+            ),
+            *price_columns(
+                "Open",
+                "Max",
+                "Min",
+                "Close",
+            ),
+            Column(
+                name="TradeVolume",
+                type="BIGINT",
+            ),
+            Column(
+                name="TradeValue",
+                type="BIGINT",
+            ),
+            Column(
+                name="Transaction",
+                type="BIGINT",
+            ),
+        ],
+        primary_key=[
+            "StockID",
+            "Month",
+        ],
+        index_list=[
+            Index(
+                name="idx_month",
+                columns=["Month"],
+            )
+        ],
+    ),
+    TableSchema(
+        table="taiwan_stock_industry_summary",
+        columns=[
+            Column(
+                name="industry_category",
+                type="VARCHAR(32)",
+            ),
+            Column(
+                name="Date", type="DATE"
+            ),
+            *count_columns(
+                "StockCount"
+            ),
+            Column(
+                name="TradeVolume",
+                type="BIGINT",
+            ),
+            Column(
+                name="TradeValue",
+                type="BIGINT",
+            ),
+            *count_columns(
+                "Advancers",
+                "Decliners",
+                "Unchanged",
+            ),
+        ],
+        primary_key=[
+            "industry_category",
+            "Date",
+        ],
+        index_list=[
+            Index(
+                name="idx_date",
+                columns=["Date"],
+            )
+        ],
+    ),
+    # 法人買賣超 (買超為正, 賣超為負) 與收盤價
+    TableSchema(
+        table="taiwan_stock_investor_price",
+        columns=[
+            Column(
+                name="stock_id",
+                type="VARCHAR(10)",
+            ),
+            Column(
+                name="date", type="DATE"
+            ),
+            Column(
+                name="Close",
+                type="FLOAT",
+            ),
+            *[
+                Column(
+                    name=name,
+                    type="BIGINT",
+                )
+                for name in INVESTOR_NAME_LIST
+            ],
+        ],
+        primary_key=[
+            "stock_id",
+            "date",
+        ],
+        partition=PartitionTable(
+            table="taiwan_stock_investor_price",
+            unit="year",
+            ahead=2,
+        ),
+        partition_start="2005-01-01",
+        partition_end="2024-12-31",
+    ),
+    TableSchema(
+        table="taiwan_stock_name",
+        columns=[
+            Column(
+                name="stock_name",
+                type="VARCHAR(30)",
+            ),
+            Column(
+                name="stock_id",
+                type="VARCHAR(32)",
+            ),
+        ],
+        primary_key=["stock_name"],
+    ),
+]
+SCHEMA_DICT = {
+    schema.table: schema
+    for schema in SCHEMA_LIST
+}
+DATASET_DICT = {
+    schema.dataset: schema
+    for schema in SCHEMA_LIST
+    if schema.dataset
+}
+
+
+def get_schema(
+    name: str,
+) -> TableSchema:
+    """table 名稱或 dataset 名稱都可以"""
+    if name in SCHEMA_DICT:
+        return SCHEMA_DICT[name]
+    return DATASET_DICT[name]
+
+
+def get_partition_table_list() -> (
+    typing.List[PartitionTable]
+):
+    return [
+        schema.partition
+        for schema in SCHEMA_LIST
+        if schema.partition is not None
+    ]
+
+
+def get_base_type(
+    column_type: str,
+) -> str:
+    """VARCHAR(10) -> VARCHAR"""
+    return column_type.split("(")[
+        0
+    ].upper()
+
+
+def get_varchar_length(
+    column_type: str,
+) -> typing.Optional[int]:
+    match = re.match(
+        r"VARCHAR\((\d+)\)",
+        column_type,
+        re.IGNORECASE,
+    )
+    if match is None:
+        return None
+    return int(match.group(1))
+
+
+def get_dtype_dict(
+    schema: TableSchema,
+) -> typing.Dict[str, str]:
+    """pandas dtype, 例如 read_csv(dtype=...) 使用"""
+    dtype_dict = {}
+    for column in schema.columns:
+        base_type = get_base_type(
+            column.type
+        )
+        if (
+            column.nullable
+            and base_type
+            in NULLABLE_PANDAS_DTYPE
+        ):
+            dtype_dict[column.name] = (
+                NULLABLE_PANDAS_DTYPE[
+                    base_type
+                ]
+            )
+        else:
+            dtype_dict[column.name] = (
+                PANDAS_DTYPE[base_type]
+            )
+    return dtype_dict
+
+
+def get_arrow_schema(
+    schema: TableSchema,
+):
+    """arrow schema, pyarrow 只有用到時才需要安裝"""
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            pa.field(
+                column.name,
+                pa.type_for_alias(
+                    ARROW_TYPE[
+                        get_base_type(
+                            column.type
+                        )
+                    ]
+                ),
+                nullable=column.nullable,
+            )
+            for column in schema.columns
+        ]
+    )
+
+
+def get_model(
+    schema: TableSchema,
+) -> typing.Type[BaseModel]:
+    """單筆資料的 pydantic model"""
+    field_dict = {}
+    for column in schema.columns:
+        python_type = PYTHON_TYPE[
+            get_base_type(column.type)
+        ]
+        if column.nullable:
+            field_dict[column.name] = (
+                typing.Optional[
+                    python_type
+                ],
+                None,
+            )
+        else:
+            field_dict[column.name] = (
+                python_type,
+                ...,
+            )
+    return create_model(
+        schema.dataset or schema.table,
+        **field_dict,
+    )
+
+
+def validate(
+    df: pd.DataFrame,
+    schema: TableSchema,
+) -> pd.DataFrame:
+    """整個欄位一次轉換型態, 取代逐筆檢查,
+    回傳欄位順序與 schema 一致, index 從 0 開始,
+    缺少欄位, 無法轉換, 或不可為 null 的欄位有 null 時, raise ValueError
+    """
+    missing_list = [
+        name
+        for name in schema.column_names
+        if name not in df.columns
+    ]
+    if missing_list:
+        raise ValueError(
+            f"{schema.table} missing columns: {missing_list}"
+        )
+    df = df[
+        schema.column_names
+    ].reset_index(drop=True)
+    dtype_dict = get_dtype_dict(schema)
+    result = {}
+    for column in schema.columns:
+        series = df[column.name]
+        base_type = get_base_type(
+            column.type
+        )
+        null_mask = series.isna()
+        if (
+            null_mask.any()
+            and not column.nullable
+        ):
+            raise ValueError(
+                f"{schema.table}.{column.name} has null value"
+            )
+        if base_type in (
+            "INT",
+            "BIGINT",
+            "FLOAT",
+            "DOUBLE",
+        ):
+            series = pd.to_numeric(
+                series, errors="raise"
+            )
+            if base_type in (
+                "INT",
+                "BIGINT",
+            ) and (
+                series.dtype.kind == "f"
+            ):
+                # 與 int() 相同, 小數無條件捨去
+                series = np.trunc(
+                    series
+                )
+            series = series.astype(
+                dtype_dict[column.name]
+            )
+        elif base_type in (
+            "DATE",
+            "DATETIME",
+        ):
+            date_format = (
+                "%Y-%m-%d"
+                if base_type == "DATE"
+                else "%Y-%m-%d %H:%M:%S"
+            )
+            series = pd.to_datetime(
+                series, errors="raise"
+            ).dt.strftime(date_format)
+        else:
+            series = series.where(
+                null_mask,
+                series.astype(str),
+            )
+            length = get_varchar_length(
+                column.type
+            )
+            if (
+                length is not None
+                and (
+                    series.str.len()
+                    > length
+                ).any()
+            ):
+                raise ValueError(
+                    f"{schema.table}.{column.name} longer than {length}"
+                )
+        result[column.name] = series
+    return pd.DataFrame(
+        result,
+        columns=schema.column_names,
+    )
+
+
+def get_column_list_sql(
+    columns: typing.List[str],
+) -> str:
+    return ",".join(
+        f"`{column}`"
+        for column in columns
+    )
+
+
+def get_update_sql(
+    schema: TableSchema,
+    columns: typing.List[str],
+) -> str:
+    """ON DUPLICATE KEY UPDATE, 更新 primary key 以外的欄位"""
+    update_list = [
+        column
+        for column in columns
+        if column
+        not in schema.primary_key
+    ] or list(columns)
+    return (
+        "ON DUPLICATE KEY UPDATE "
+        + ",".join(
+            f"`{column}`=VALUES(`{column}`)"
+            for column in update_list
+        )
+    )
+
+
+def get_upsert_sql(
+    schema: TableSchema,
+    columns: typing.List[str] = None,
+) -> str:
+    """prepared upsert, 搭配 executemany, 每筆資料一個 tuple,
+    pymysql 會合併成一個多筆的 INSERT
+    """
+    columns = (
+        columns or schema.column_names
+    )
+    return (
+        f"INSERT INTO `{schema.table}`("
+        + get_column_list_sql(columns)
+        + ") VALUES ("
+        + ",".join(
+            ["%s"] * len(columns)
+        )
+        + ") "
+        + get_update_sql(
+            schema, columns
+        )
+    )
+
+
+def get_upsert_params(
+    df: pd.DataFrame,
+    columns: typing.List[str],
+) -> typing.List[typing.Tuple]:
+    """NaN 轉成 None, numpy 型態轉成 python 型態"""
+    df = df[columns].astype(object)
+    df = df.where(df.notna(), None)
+    return [
+        tuple(row)
+        for row in df.itertuples(
+            index=False, name=None
+        )
+    ]
+
+
+def get_column_sql(
+    column: Column,
+) -> str:
+    sql = (
+        f"    `{column.name}` {column.type} "
+        + (
+            "NULL"
+            if column.nullable
+            else "NOT NULL"
+        )
+    )
+    if column.extra:
+        sql += f" {column.extra}"
+    return sql
+
+
+def to_date(
+    date: str,
+) -> datetime.date:
+    return datetime.datetime.strptime(
+        date, "%Y-%m-%d"
+    ).date()
+
+
+def get_partition_ddl(
+    schema: TableSchema,
+) -> str:
+    unit = schema.partition.unit
+    expression = (
+        "YEAR(Date)"
+        if unit == "year"
+        else "TO_DAYS(Date)"
+    )
+    start = to_date(
+        schema.partition_start
+    )
+    end = to_date(schema.partition_end)
+    definition_list = []
+    while start <= end:
+        upper = next_period(unit, start)
+        definition_list.append(
+            f"    PARTITION {get_partition_name(unit, start)} "
+            f"VALUES LESS THAN ({get_partition_value(unit, upper)})"
+        )
+        start = upper
+    definition_list.append(
+        f"    PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN MAXVALUE"
+    )
+    return (
+        f"PARTITION BY RANGE({expression}) (\n"
+        + ",\n".join(definition_list)
+        + "\n)"
+    )
+
+
+def get_create_table_sql(
+    schema: TableSchema,
+) -> str:
+    line_list = [
+        get_column_sql(column)
+        for column in schema.columns
+    ]
+    line_list.append(
+        "    PRIMARY KEY("
+        + ", ".join(
+            f"`{column}`"
+            for column in schema.primary_key
+        )
+        + ")"
+    )
+    for index in schema.index_list:
+        line_list.append(
+            f"    INDEX `{index.name}`("
+            + ", ".join(
+                f"`{column}`"
+                for column in index.columns
+            )
+            + ")"
+        )
+    sql = (
+        f"CREATE TABLE `{DATABASE}`.`{schema.table}`(\n"
+        + ",\n".join(line_list)
+        + "\n)"
+    )
+    if schema.row_format:
+        sql += f"\nROW_FORMAT={schema.row_format}"
+    if schema.partition is not None:
+        sql += "\n" + get_partition_ddl(
+            schema
+        )
+    return sql + ";\n"
+
+
+def get_ddl() -> str:
+    """create_partition_table.sql 的內容"""
+    return (
+        f"CREATE DATABASE `{DATABASE}`;\n"
+        + "\n".join(
+            get_create_table_sql(schema)
+            for schema in SCHEMA_LIST
+        )
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        print(
+            get_create_table_sql(
+                get_schema(sys.argv[1])
+            ),
+            end="",
+        )
+    else:
+        print(get_ddl(), end="")
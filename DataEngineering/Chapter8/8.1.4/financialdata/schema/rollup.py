@@ -0,0 +1,242 @@
+import datetime
+import typing
+
+from pydantic import BaseModel
+
+from financialdata.schema.registry import (
+    INVESTOR_NAME_LIST,
+    get_column_list_sql,
+    get_schema,
+)
+
+
+class Rollup(BaseModel):
+    """由 source table 彙總的 table, 寫入 source 時, 只重算受影響的日期"""
+
+    table: str
+    # 任一個 source 寫入時都需要重算, 第一個決定 rebuild 的日期範圍
+    source_list: typing.List[str]
+    # 只用來 join, 寫入時不重算, 例如產業別更新後需要手動 rebuild
+    join_list: typing.List[str] = []
+    # day: 重算受影響的日期, month: 重算受影響的整個月份,
+    # all: 資料量小, 每次全部重算
+    unit: str
+    # 刪除舊資料時使用的日期欄位
+    date_column: str = ""
+    # 欄位順序與 registry 一致, {start_date} ~ {end_date} 為 [start, end)
+    select_sql: str
+
+
+# 依照 Change 計算上漲, 下跌, 平盤家數
+CHANGE_COUNT_SQL = """
+SUM(price.`Change` > 0),
+SUM(price.`Change` < 0),
+SUM(price.`Change` = 0)
+"""
+
+ROLLUP_LIST = [
+    Rollup(
+        table="taiwan_stock_market_summary",
+        source_list=[
+            "taiwan_stock_price"
+        ],
+        unit="day",
+        date_column="Date",
+        select_sql=f"""
+        SELECT price.Date, COUNT(*),
+        SUM(price.TradeVolume), SUM(price.TradeValue), SUM(price.`Transaction`),
+        {CHANGE_COUNT_SQL}
+        FROM taiwan_stock_price AS price
+        WHERE price.Date >= '{{start_date}}' AND price.Date < '{{end_date}}'
+        GROUP BY price.Date
+        """,
+    ),
+    Rollup(
+        table="taiwan_stock_price_month",
+        source_list=[
+            "taiwan_stock_price"
+        ],
+        unit="month",
+        date_column="Month",
+        select_sql="""
+        SELECT price.StockID, price.Month,
+        MIN(price.Date), MAX(price.Date),
+        MAX(price.FirstOpen), MAX(price.Max), MIN(price.Min), MAX(price.LastClose),
+        SUM(price.TradeVolume), SUM(price.TradeValue), SUM(price.`Transaction`)
+        FROM (
+            SELECT StockID, Date, Max, Min,
+            TradeVolume, TradeValue, `Transaction`,
+            Date - INTERVAL (DAYOFMONTH(Date) - 1) DAY AS Month,
+            FIRST_VALUE(Open) OVER (
+                PARTITION BY StockID, YEAR(Date), MONTH(Date) ORDER BY Date
+            ) AS FirstOpen,
+            FIRST_VALUE(Close) OVER (
+                PARTITION BY StockID, YEAR(Date), MONTH(Date) ORDER BY Date DESC
+            ) AS LastClose
+            FROM taiwan_stock_price
+            WHERE Date >= '{start_date}' AND Date < '{end_date}'
+        ) AS price
+        GROUP BY price.StockID, price.Month
+        """,
+    ),
+    Rollup(
+        table="taiwan_stock_industry_summary",
+        source_list=[
+            "taiwan_stock_price"
+        ],
+        join_list=["taiwan_stock_info"],
+        unit="day",
+        date_column="Date",
+        select_sql=f"""
+        SELECT info.industry_category, price.Date, COUNT(*),
+        SUM(price.TradeVolume), SUM(price.TradeValue),
+        {CHANGE_COUNT_SQL}
+        FROM taiwan_stock_price AS price
+        INNER JOIN taiwan_stock_info AS info ON info.stock_id = price.StockID
+        WHERE price.Date >= '{{start_date}}' AND price.Date < '{{end_date}}'
+        GROUP BY info.industry_category, price.Date
+        """,
+    ),
+    Rollup(
+        table="taiwan_stock_investor_price",
+        source_list=[
+            "taiwan_stock_price",
+            "taiwan_stock_institutional_investors",
+        ],
+        unit="day",
+        date_column="date",
+        select_sql="""
+        SELECT price.StockID, price.Date, price.Close,
+        """
+        + ",\n".join(
+            f"SUM(IF(investors.name = '{name}', investors.buy - investors.sell, 0))"
+            for name in INVESTOR_NAME_LIST
+        )
+        + """
+        FROM taiwan_stock_price AS price
+        INNER JOIN taiwan_stock_institutional_investors AS investors
+        ON investors.stock_id = price.StockID AND investors.date = price.Date
+        WHERE price.Date >= '{start_date}' AND price.Date < '{end_date}'
+        GROUP BY price.StockID, price.Date, price.Close
+        """,
+    ),
+    # 股票名稱查詢股票代碼, redash 依照名稱查詢時使用
+    Rollup(
+        table="taiwan_stock_name",
+        source_list=[
+            "taiwan_stock_info"
+        ],
+        unit="all",
+        select_sql="""
+        SELECT stock_name, MIN(stock_id)
+        FROM taiwan_stock_info
+        WHERE stock_name IS NOT NULL
+        GROUP BY stock_name
+        """,
+    ),
+]
+
+
+def get_rollup_list(
+    source: str = "",
+    table: str = "",
+    exist_table_list: typing.Optional[
+        typing.List[str]
+    ] = None,
+) -> typing.List[Rollup]:
+    """exist_table_list 為資料庫中已建立的 table,
+    略過 source 或彙總 table 還沒建立的彙總, 例如只用 Chapter8 的 DDL 建立資料庫時,
+    沒有 taiwan_stock_info 與 taiwan_stock_institutional_investors
+    """
+    return [
+        rollup
+        for rollup in ROLLUP_LIST
+        if (
+            not source
+            or source
+            in rollup.source_list
+        )
+        and (
+            not table
+            or rollup.table == table
+        )
+        and (
+            exist_table_list is None
+            or all(
+                t in exist_table_list
+                for t in [rollup.table]
+                + rollup.source_list
+                + rollup.join_list
+            )
+        )
+    ]
+
+
+def get_rollup_lock_name(
+    rollup: Rollup,
+) -> str:
+    """同一個彙總 table 的重算依序執行,
+    twse 與 tpex 同時寫入同一天時, 兩個 DELETE + INSERT 的 gap lock 會互相 deadlock
+    """
+    return f"financialdata_rollup_{rollup.table}"
+
+
+def get_refresh_range(
+    unit: str,
+    start_date: datetime.date,
+    end_date: datetime.date,
+) -> typing.Tuple[str, str]:
+    """start_date ~ end_date (包含) 有新資料時, 需要重算的 [start, end),
+    月 K 需要從月初重算到月底
+    """
+    end = end_date + datetime.timedelta(
+        days=1
+    )
+    if unit == "month":
+        start_date = start_date.replace(
+            day=1
+        )
+        if end.day != 1:
+            end = (
+                end.replace(day=28)
+                + datetime.timedelta(
+                    days=4
+                )
+            ).replace(day=1)
+    return str(start_date), str(end)
+
+
+def get_refresh_sql_list(
+    rollup: Rollup,
+    start_date: datetime.date = None,
+    end_date: datetime.date = None,
+) -> typing.List[str]:
+    """刪除區間內的舊資料後重新彙總, 在同一個 transaction 執行,
+    unit 為 all 時, 不需要日期
+    """
+    columns = get_column_list_sql(
+        get_schema(
+            rollup.table
+        ).column_names
+    )
+    if rollup.unit == "all":
+        return [
+            f"DELETE FROM `{rollup.table}`",
+            f"INSERT INTO `{rollup.table}`({columns}) "
+            + rollup.select_sql,
+        ]
+    start, end = get_refresh_range(
+        rollup.unit,
+        start_date,
+        end_date,
+    )
+    return [
+        f"DELETE FROM `{rollup.table}` "
+        f"WHERE `{rollup.date_column}` >= '{start}' "
+        f"AND `{rollup.date_column}` < '{end}'",
+        f"INSERT INTO `{rollup.table}`({columns}) "
+        + rollup.select_sql.format(
+            start_date=start,
+            end_date=end,
+        ),
+    ]
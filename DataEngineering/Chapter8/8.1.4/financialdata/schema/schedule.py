@@ -0,0 +1,146 @@
+import datetime
+import typing
+
+from apscheduler.triggers.cron import (
+    CronTrigger,
+)
+from pydantic import BaseModel
+
+TIMEZONE = "Asia/Taipei"
+
+
+class ScheduleItem(BaseModel):
+    """排程設定, 每個 dataset 一筆"""
+
+    dataset: str
+    # crontab 格式, 分 時 日 月 星期
+    cron: str
+    # 收盤時間, HH:MM
+    market_close: str
+    # 收盤後, 資料需要多久才會公布 (分鐘)
+    close_offset: int
+
+
+# 排程註冊表, 新增 dataset 只需要在這裡加一筆
+SCHEDULE_LIST = [
+    ScheduleItem(
+        dataset="taiwan_stock_price",
+        cron="0 15 * * mon-fri",
+        market_close="13:30",
+        close_offset=90,
+    ),
+    ScheduleItem(
+        dataset="taiwan_futures_daily",
+        cron="0 15 * * mon-fri",
+        market_close="13:45",
+        close_offset=75,
+    ),
+]
+
+
+def get_trigger(
+    item: ScheduleItem,
+) -> CronTrigger:
+    return CronTrigger.from_crontab(
+        item.cron, timezone=TIMEZONE
+    )
+
+
+def get_data_date(
+    item: ScheduleItem,
+    fire_time: datetime.datetime,
+) -> datetime.date:
+    """排程觸發時, 對應要爬取的資料日期,
+    例如 15:00 觸發, 收盤 13:30 + 90 分鐘後資料已公布, 爬當天,
+    若在資料公布前觸發, 則爬前一天
+    """
+    hour, minute = (
+        item.market_close.split(":")
+    )
+    ready = datetime.timedelta(
+        hours=int(hour),
+        minutes=int(minute)
+        + item.close_offset,
+    )
+    return (fire_time - ready).date()
+
+
+def get_fire_time_list(
+    item: ScheduleItem,
+    start: datetime.datetime,
+    end: datetime.datetime,
+) -> typing.List[datetime.datetime]:
+    """列出 start ~ end 之間, 所有排程觸發時間"""
+    trigger = get_trigger(item)
+    fire_time_list = []
+    fire_time = (
+        trigger.get_next_fire_time(
+            None, start
+        )
+    )
+    while (
+        fire_time and fire_time <= end
+    ):
+        fire_time_list.append(fire_time)
+        fire_time = (
+            trigger.get_next_fire_time(
+                fire_time,
+                fire_time
+                + datetime.timedelta(
+                    seconds=1
+                ),
+            )
+        )
+    return fire_time_list
+
+
+def get_missed_date_range(
+    item: ScheduleItem,
+    last_date: typing.Optional[
+        datetime.date
+    ],
+    now: datetime.datetime,
+) -> typing.Optional[
+    typing.Tuple[str, str]
+]:
+    """根據上次發送任務的資料日期 last_date,
+    找出到 now 為止, 尚未發送的資料日期,
+    合併成一段 (start_date, end_date), 只需要發送一次 Update
+    """
+    if last_date is None:
+        # 沒有紀錄, 只發送最近一次排程
+        start = (
+            now
+            - datetime.timedelta(days=7)
+        )
+    else:
+        start = (
+            datetime.datetime.combine(
+                last_date
+                + datetime.timedelta(
+                    days=1
+                ),
+                datetime.time(),
+                tzinfo=now.tzinfo,
+            )
+        )
+    date_list = [
+        get_data_date(item, fire_time)
+        for fire_time in get_fire_time_list(
+            item, start, now
+        )
+    ]
+    if last_date is None:
+        date_list = date_list[-1:]
+    else:
+        date_list = [
+            date
+            for date in date_list
+            if date > last_date
+        ]
+    if not date_list:
+        return None
+    return (
+        str(min(date_list)),
+        str(max(date_list)),
+    )
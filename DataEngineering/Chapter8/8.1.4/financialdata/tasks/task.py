@@ -1,30 +1,82 @@
 import importlib
 import typing
 
+from financialdata import (
+    metrics,
+    tracing,
+)
 from financialdata.backend import db
+from financialdata.config import (
+    METRICS_TEXTFILE,
+)
 from financialdata.tasks.worker import (
     app,
 )
 
 
 # 註冊 task, 有註冊的 task 才可以變成任務發送給 rabbitmq
-@app.task()
+# bind=True, 才能從 self.request 拿到 producer 傳來的 trace headers
+@app.task(bind=True)
 def crawler(
+    self,
     dataset: str,
     parameter: typing.Dict[str, str],
 ):
-    # 使用 getattr, importlib,
-    # 根據不同 dataset, 使用相對應的 crawler 收集資料
-    # 爬蟲
-    df = getattr(
-        importlib.import_module(
-            f"financialdata.crawler.{dataset}"
+    # metrics 依照 dataset, 資料來源分開統計
+    metrics.set_labels(
+        dataset=dataset,
+        source=parameter.get(
+            "data_source", ""
         ),
-        "crawler",
-    )(parameter=parameter)
-    # 上傳資料庫
-    db.upload_data(
-        df,
-        dataset,
-        db.router.mysql_financialdata_conn,
     )
+    status = "success"
+    try:
+        # 接續 producer 的 trace
+        with metrics.timer(
+            "task"
+        ), tracing.start_span(
+            "task.crawler",
+            parent=tracing.extract(
+                self.request
+            ),
+            dataset=dataset,
+            date=parameter.get("date"),
+            source=parameter.get(
+                "data_source"
+            ),
+        ):
+            # 使用 getattr, importlib,
+            # 根據不同 dataset, 使用相對應的 crawler 收集資料
+            # 爬蟲
+            df = getattr(
+                importlib.import_module(
+                    f"financialdata.crawler.{dataset}"
+                ),
+                "crawler",
+            )(parameter=parameter)
+            metrics.inc(
+                "financialdata_rows_total",
+                len(df),
+            )
+            # 上傳資料庫
+            with metrics.timer(
+                "upload_data"
+            ), tracing.start_span(
+                "upload", rows=len(df)
+            ):
+                db.upload_data(
+                    df,
+                    dataset,
+                    db.router.mysql_financialdata_conn,
+                )
+    except Exception:
+        status = "fail"
+        raise
+    finally:
+        metrics.inc(
+            "financialdata_task_total",
+            status=status,
+        )
+        metrics.write_textfile(
+            METRICS_TEXTFILE
+        )
@@ -1,9 +1,17 @@
+from billiard.process import (
+    current_process,
+)
 from celery import Celery
+from celery.signals import (
+    worker_process_init,
+)
+from financialdata import metrics
 from financialdata.config import (
     WORKER_ACCOUNT,
     WORKER_PASSWORD,
     MESSAGE_QUEUE_HOST,
     MESSAGE_QUEUE_PORT,
+    METRICS_PORT,
 )
 
 broker = (
@@ -17,3 +25,20 @@ app = Celery(
     ],
     broker=broker,
 )
+
+
+# celery 實際執行任務的是子進程, 因此在子進程啟動 /metrics,
+# 多個子進程不能共用同一個 port, 使用 METRICS_PORT + 子進程編號,
+# 子進程重啟時會拿到相同的編號
+@worker_process_init.connect
+def start_metrics_server(**kwargs):
+    if not METRICS_PORT:
+        return
+    metrics.start_http_server(
+        METRICS_PORT
+        + getattr(
+            current_process(),
+            "index",
+            0,
+        )
+    )
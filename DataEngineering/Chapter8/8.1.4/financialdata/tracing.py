@@ -0,0 +1,401 @@
+"""
+追蹤一個 (dataset, date, source) 任務, 從 producer -> rabbitmq -> worker -> mysql 的完整路徑,
+producer 建立 span, 將 trace id 放進 celery task headers,
+worker 接續同一個 trace, 記錄 fetch, parse, validate, upload 每個階段,
+span 結束時交給 exporter 輸出, TRACE_EXPORTER 沒設定時, 不做任何事
+
+離線查看 trace:
+    python financialdata/tracing.py "traces/*.jsonl" taiwan_stock_price 2021-04-01 twse
+"""
+
+import contextlib
+import glob
+import importlib
+import json
+import sys
+import threading
+import time
+import typing
+import uuid
+from abc import ABC, abstractmethod
+
+from financialdata.config import (
+    TRACE_EXPORTER,
+    TRACE_FILE,
+)
+
+TRACE_ID_HEADER = "trace_id"
+PARENT_SPAN_ID_HEADER = "parent_span_id"
+
+_context = threading.local()
+_exporter = None
+
+
+class Span:
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: str,
+        attributes: typing.Dict[
+            str, str
+        ],
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[
+            :16
+        ]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_time = time.time()
+        self.end_time = None
+
+    def set_attribute(
+        self, key: str, value
+    ):
+        self.attributes[key] = value
+
+    def to_dict(
+        self,
+    ) -> typing.Dict[str, typing.Any]:
+        return dict(
+            name=self.name,
+            trace_id=self.trace_id,
+            span_id=self.span_id,
+            parent_id=self.parent_id,
+            start_time=self.start_time,
+            end_time=self.end_time,
+            attributes=self.attributes,
+        )
+
+
+class SpanExporter(ABC):
+    """exporter 介面, 自訂 exporter 繼承後實作 export"""
+
+    @abstractmethod
+    def export(
+        self,
+        span: typing.Dict[
+            str, typing.Any
+        ],
+    ):
+        pass
+
+
+class JsonLinesExporter(SpanExporter):
+    """每個 span 寫成一行 json, 方便離線查看"""
+
+    def __init__(
+        self, path: str = TRACE_FILE
+    ):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(
+        self,
+        span: typing.Dict[
+            str, typing.Any
+        ],
+    ):
+        line = json.dumps(
+            span, ensure_ascii=False
+        )
+        with self._lock:
+            with open(
+                self.path,
+                "a",
+                encoding="utf8",
+            ) as f:
+                f.write(line + "\n")
+
+
+def get_exporter() -> (
+    typing.Optional[SpanExporter]
+):
+    """TRACE_EXPORTER 為 exporter class 的路徑,
+    例如 financialdata.tracing.JsonLinesExporter
+    """
+    global _exporter
+    if (
+        _exporter is None
+        and TRACE_EXPORTER
+    ):
+        module, name = (
+            TRACE_EXPORTER.rsplit(
+                ".", 1
+            )
+        )
+        _exporter = getattr(
+            importlib.import_module(
+                module
+            ),
+            name,
+        )()
+    return _exporter
+
+
+def set_exporter(
+    exporter: typing.Optional[
+        SpanExporter
+    ],
+):
+    global _exporter
+    _exporter = exporter
+
+
+def get_current_span() -> (
+    typing.Optional[Span]
+):
+    stack = getattr(
+        _context, "stack", []
+    )
+    if stack:
+        return stack[-1]
+    return None
+
+
+@contextlib.contextmanager
+def start_span(
+    name: str,
+    parent: typing.Optional[
+        typing.Dict[str, str]
+    ] = None,
+    **attributes,
+):
+    """建立 span, 沒有指定 parent 時, 接續目前 thread 的 span,
+    parent 沒有 trace id 時 (例如沒有 trace headers 的 task), 建立新的 trace
+    """
+    exporter = get_exporter()
+    if exporter is None:
+        yield None
+        return
+    current_span = get_current_span()
+    if parent and parent.get(
+        TRACE_ID_HEADER
+    ):
+        trace_id = parent.get(
+            TRACE_ID_HEADER
+        )
+        parent_id = parent.get(
+            PARENT_SPAN_ID_HEADER
+        )
+    elif current_span:
+        trace_id = current_span.trace_id
+        parent_id = current_span.span_id
+    else:
+        trace_id = uuid.uuid4().hex
+        parent_id = None
+    span = Span(
+        name,
+        trace_id,
+        parent_id,
+        attributes,
+    )
+    if not hasattr(_context, "stack"):
+        _context.stack = []
+    _context.stack.append(span)
+    try:
+        yield span
+    except Exception as e:
+        span.set_attribute(
+            "error", str(e)
+        )
+        raise
+    finally:
+        _context.stack.pop()
+        span.end_time = time.time()
+        exporter.export(span.to_dict())
+
+
+def inject() -> typing.Dict[str, str]:
+    """目前 span 的 trace context, 放進 celery task headers"""
+    span = get_current_span()
+    if span is None:
+        return {}
+    return {
+        TRACE_ID_HEADER: span.trace_id,
+        PARENT_SPAN_ID_HEADER: span.span_id,
+    }
+
+
+def extract(
+    request,
+) -> typing.Dict[str, str]:
+    """從 celery task request 取出 trace context"""
+    headers = (
+        getattr(
+            request, "headers", None
+        )
+        or {}
+    )
+    return {
+        key: getattr(request, key, None)
+        or headers.get(key)
+        for key in [
+            TRACE_ID_HEADER,
+            PARENT_SPAN_ID_HEADER,
+        ]
+    }
+
+
+def annotate_sql(
+    conn,
+    cursor,
+    statement,
+    parameters,
+    context,
+    executemany,
+):
+    """sqlalchemy before_cursor_execute event,
+    在 SQL 前加上 trace 註解, 在 mysql processlist, slow log 可以對應回 trace
+    """
+    span = get_current_span()
+    if span is None:
+        return statement, parameters
+    span.set_attribute(
+        "sql_count",
+        span.attributes.get(
+            "sql_count", 0
+        )
+        + 1,
+    )
+    statement = (
+        f"/* trace_id={span.trace_id} "
+        f"span_id={span.span_id} */ {statement}"
+    )
+    return statement, parameters
+
+
+def load_span_list(
+    path: str,
+) -> typing.List[
+    typing.Dict[str, typing.Any]
+]:
+    span_list = []
+    for file in sorted(glob.glob(path)):
+        with open(
+            file, encoding="utf8"
+        ) as f:
+            span_list.extend(
+                json.loads(line)
+                for line in f
+                if line.strip()
+            )
+    return span_list
+
+
+def is_match(
+    span: typing.Dict[str, typing.Any],
+    key: typing.Dict[str, str],
+) -> bool:
+    return all(
+        span["attributes"].get(k) == v
+        for k, v in key.items()
+    )
+
+
+def format_trace(
+    span_list: typing.List[
+        typing.Dict[str, typing.Any]
+    ],
+    key: typing.Dict[str, str],
+) -> typing.List[str]:
+    """找出符合 (dataset, date, source) 的 span,
+    列出它的上層 span 與所有下層 span, 以及各自的耗時
+    """
+    span_dict = {
+        span["span_id"]: span
+        for span in span_list
+    }
+    children = {}
+    for span in sorted(
+        span_list,
+        key=lambda s: s["start_time"],
+    ):
+        children.setdefault(
+            span["parent_id"], []
+        ).append(span)
+
+    def format_span(span, depth):
+        duration = (
+            span["end_time"]
+            - span["start_time"]
+        )
+        return (
+            f"{'  ' * depth}{span['name']} "
+            f"{duration * 1000:.1f}ms "
+            f"{json.dumps(span['attributes'], ensure_ascii=False)}"
+        )
+
+    def walk(span, depth):
+        lines.append(
+            format_span(span, depth)
+        )
+        for child in children.get(
+            span["span_id"], []
+        ):
+            walk(child, depth + 1)
+
+    lines = []
+    matched_list = [
+        span
+        for span in span_list
+        if is_match(span, key)
+        # 只取最上層符合的 span, 下層的 span 會在 walk 中列出
+        and not (
+            span["parent_id"]
+            in span_dict
+            and is_match(
+                span_dict[
+                    span["parent_id"]
+                ],
+                key,
+            )
+        )
+    ]
+    for span in matched_list:
+        # 往上找到 root span
+        ancestor_list = []
+        parent = span_dict.get(
+            span["parent_id"]
+        )
+        while parent:
+            ancestor_list.insert(
+                0, parent
+            )
+            parent = span_dict.get(
+                parent["parent_id"]
+            )
+        lines.append(
+            f"trace_id: {span['trace_id']}"
+        )
+        for (
+            depth,
+            ancestor,
+        ) in enumerate(ancestor_list):
+            lines.append(
+                format_span(
+                    ancestor, depth
+                )
+            )
+        walk(span, len(ancestor_list))
+    return lines
+
+
+if __name__ == "__main__":
+    path = sys.argv[1]
+    key = dict(
+        zip(
+            [
+                "dataset",
+                "date",
+                "source",
+            ],
+            sys.argv[2:],
+        )
+    )
+    for line in format_trace(
+        load_span_list(path), key
+    ):
+        print(line)
@@ -0,0 +1,6 @@
+-- 某一天全市場的查詢 (where Date = ?), 原本 primary key (StockID, Date) 用不到,
+-- 需要掃描整個年度 partition, 加上 Date 開頭的 index,
+-- 包含 Close, 只查收盤價時不需要回到 primary key 讀取整筆資料
+ALTER TABLE `FinancialData`.`taiwan_stock_price`
+    ADD INDEX `idx_date_stock`(`Date`, `StockID`, `Close`),
+    ALGORITHM=INPLACE, LOCK=NONE;
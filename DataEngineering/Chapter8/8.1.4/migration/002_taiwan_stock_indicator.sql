@@ -0,0 +1,20 @@
+-- api 預先計算的技術指標, 資料不足的日期為 NULL
+CREATE TABLE IF NOT EXISTS `FinancialData`.`taiwan_stock_indicator`(
+    `StockID` VARCHAR(10) NOT NULL,
+    `Date` DATE NOT NULL,
+    `ma_5` DOUBLE NULL,
+    `ma_20` DOUBLE NULL,
+    `ma_60` DOUBLE NULL,
+    `rsi_14` DOUBLE NULL,
+    `bband_upper_20` DOUBLE NULL,
+    `bband_lower_20` DOUBLE NULL,
+    PRIMARY KEY(`StockID`, `Date`)
+);
+
+-- 每檔股票最後計算的日期, 以及接續計算需要的狀態 (json)
+CREATE TABLE IF NOT EXISTS `FinancialData`.`taiwan_stock_indicator_state`(
+    `StockID` VARCHAR(10) NOT NULL,
+    `Date` DATE NOT NULL,
+    `State` TEXT NOT NULL,
+    PRIMARY KEY(`StockID`)
+);
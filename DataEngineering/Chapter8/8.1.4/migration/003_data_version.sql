@@ -0,0 +1,11 @@
+-- upload_data 每次寫入資料, 新增一筆 version, 記錄 dataset 更新的日期區間,
+-- api 依照 version 產生 ETag, 並讓其他進程的 cache 失效
+CREATE TABLE IF NOT EXISTS `FinancialData`.`data_version`(
+    `version` BIGINT NOT NULL AUTO_INCREMENT,
+    `dataset` VARCHAR(64) NOT NULL,
+    `start_date` DATE NOT NULL,
+    `end_date` DATE NOT NULL,
+    `update_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY(`version`),
+    INDEX `idx_dataset_version`(`dataset`, `version`)
+);
@@ -0,0 +1,6 @@
+-- 超過最後一個 partition 的資料寫入 pmax, 不會寫入失敗,
+-- financialdata/partition.py 會提早從 pmax 切出新的年度 partition
+ALTER TABLE `FinancialData`.`taiwan_stock_price`
+    ADD PARTITION (PARTITION pmax VALUES LESS THAN MAXVALUE);
+ALTER TABLE `FinancialData`.`taiwan_futures_daily`
+    ADD PARTITION (PARTITION pmax VALUES LESS THAN MAXVALUE);
@@ -0,0 +1,42 @@
+-- taiwan_stock_price 的彙總 table, upload_data 寫入後只重算受影響的日期,
+-- 建立後執行 make rebuild-rollup 補上歷史資料
+CREATE TABLE IF NOT EXISTS `FinancialData`.`taiwan_stock_market_summary`(
+    `Date` DATE NOT NULL,
+    `StockCount` INT NOT NULL,
+    `TradeVolume` BIGINT NOT NULL,
+    `TradeValue` BIGINT NOT NULL,
+    `Transaction` BIGINT NOT NULL,
+    `Advancers` INT NOT NULL,
+    `Decliners` INT NOT NULL,
+    `Unchanged` INT NOT NULL,
+    PRIMARY KEY(`Date`)
+);
+
+CREATE TABLE IF NOT EXISTS `FinancialData`.`taiwan_stock_price_month`(
+    `StockID` VARCHAR(10) NOT NULL,
+    `Month` DATE NOT NULL,
+    `StartDate` DATE NOT NULL,
+    `EndDate` DATE NOT NULL,
+    `Open` FLOAT NOT NULL,
+    `Max` FLOAT NOT NULL,
+    `Min` FLOAT NOT NULL,
+    `Close` FLOAT NOT NULL,
+    `TradeVolume` BIGINT NOT NULL,
+    `TradeValue` BIGINT NOT NULL,
+    `Transaction` BIGINT NOT NULL,
+    PRIMARY KEY(`StockID`, `Month`),
+    INDEX `idx_month`(`Month`)
+);
+
+CREATE TABLE IF NOT EXISTS `FinancialData`.`taiwan_stock_industry_summary`(
+    `industry_category` VARCHAR(32) NOT NULL,
+    `Date` DATE NOT NULL,
+    `StockCount` INT NOT NULL,
+    `TradeVolume` BIGINT NOT NULL,
+    `TradeValue` BIGINT NOT NULL,
+    `Advancers` INT NOT NULL,
+    `Decliners` INT NOT NULL,
+    `Unchanged` INT NOT NULL,
+    PRIMARY KEY(`industry_category`, `Date`),
+    INDEX `idx_date`(`Date`)
+);
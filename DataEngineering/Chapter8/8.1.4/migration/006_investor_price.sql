@@ -0,0 +1,42 @@
+-- 法人買賣超與收盤價的 materialized join, 以及股票名稱查詢股票代碼,
+-- 建立後執行 make rebuild-rollup 補上歷史資料
+CREATE TABLE IF NOT EXISTS `FinancialData`.`taiwan_stock_investor_price`(
+    `stock_id` VARCHAR(10) NOT NULL,
+    `date` DATE NOT NULL,
+    `Close` FLOAT NOT NULL,
+    `Foreign_Investor` BIGINT NOT NULL,
+    `Foreign_Dealer_Self` BIGINT NOT NULL,
+    `Investment_Trust` BIGINT NOT NULL,
+    `Dealer_self` BIGINT NOT NULL,
+    `Dealer_Hedging` BIGINT NOT NULL,
+    PRIMARY KEY(`stock_id`, `date`)
+)
+PARTITION BY RANGE(YEAR(Date)) (
+    PARTITION p2005 VALUES LESS THAN (2006),
+    PARTITION p2006 VALUES LESS THAN (2007),
+    PARTITION p2007 VALUES LESS THAN (2008),
+    PARTITION p2008 VALUES LESS THAN (2009),
+    PARTITION p2009 VALUES LESS THAN (2010),
+    PARTITION p2010 VALUES LESS THAN (2011),
+    PARTITION p2011 VALUES LESS THAN (2012),
+    PARTITION p2012 VALUES LESS THAN (2013),
+    PARTITION p2013 VALUES LESS THAN (2014),
+    PARTITION p2014 VALUES LESS THAN (2015),
+    PARTITION p2015 VALUES LESS THAN (2016),
+    PARTITION p2016 VALUES LESS THAN (2017),
+    PARTITION p2017 VALUES LESS THAN (2018),
+    PARTITION p2018 VALUES LESS THAN (2019),
+    PARTITION p2019 VALUES LESS THAN (2020),
+    PARTITION p2020 VALUES LESS THAN (2021),
+    PARTITION p2021 VALUES LESS THAN (2022),
+    PARTITION p2022 VALUES LESS THAN (2023),
+    PARTITION p2023 VALUES LESS THAN (2024),
+    PARTITION p2024 VALUES LESS THAN (2025),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+CREATE TABLE IF NOT EXISTS `FinancialData`.`taiwan_stock_name`(
+    `stock_name` VARCHAR(30) NOT NULL,
+    `stock_id` VARCHAR(32) NOT NULL,
+    PRIMARY KEY(`stock_name`)
+);
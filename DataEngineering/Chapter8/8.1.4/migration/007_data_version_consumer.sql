@@ -0,0 +1,7 @@
+-- 依照 data_version 計算的 job (例如 api 的技術指標), 記錄處理到的 version,
+-- 重啟後從上次的 version 繼續
+CREATE TABLE IF NOT EXISTS `FinancialData`.`data_version_consumer`(
+    `consumer` VARCHAR(64) NOT NULL,
+    `version` BIGINT NOT NULL,
+    PRIMARY KEY(`consumer`)
+);
@@ -0,0 +1,134 @@
+from financialdata.crawler import (
+    taiwan_futures_daily,
+)
+from financialdata.crawler.taiwan_futures_daily import (
+    gen_task_paramter_list,
+)
+
+
+def test_gen_task_paramter_list():
+    """
+    測試建立期貨 task 參數列表, 2021-04-09 ~ 2021-04-12, 排除周末
+    """
+    result = gen_task_paramter_list(
+        start_date="2021-04-09",
+        end_date="2021-04-12",
+    )  # 執行結果
+    expected = [
+        {
+            "date": "2021-04-09",
+            "data_source": "taifex",
+        },
+        {
+            "date": "2021-04-12",
+            "data_source": "taifex",
+        },
+    ]
+    assert (
+        result == expected
+    )  # 檢查, 執行結果 == 預期結果
+
+
+def test_crawler_futures_archive(
+    mocker, tmp_path
+):
+    """
+    測試 archive 有原始資料時, 直接讀取, 不會請求期交所
+    """
+    mocker.patch.object(
+        taiwan_futures_daily,
+        "RAW_ARCHIVE_DIR",
+        str(tmp_path),
+    )
+    post = mocker.patch.object(
+        taiwan_futures_daily.requests,
+        "post",
+    )
+    path = (
+        tmp_path
+        / "taiwan_futures_daily"
+        / "2021-04-09.csv"
+    )
+    path.parent.mkdir()
+    path.write_bytes(
+        "交易日期,契約\n2021/04/09,TX\n".encode(
+            "big5"
+        )
+    )
+    df = taiwan_futures_daily.crawler_futures(
+        "2021-04-09"
+    )
+    assert not post.called
+    assert list(df.columns) == [
+        "交易日期",
+        "契約",
+    ]
+    assert df.loc[0, "契約"] == "TX"
+
+
+def test_crawler_futures_archive_invalid(
+    mocker, tmp_path
+):
+    """
+    測試期交所回傳錯誤頁面時, 不保存 archive, 下次重新請求
+    """
+    mocker.patch.object(
+        taiwan_futures_daily,
+        "RAW_ARCHIVE_DIR",
+        str(tmp_path),
+    )
+    mocker.patch.object(
+        taiwan_futures_daily.time,
+        "sleep",
+    )
+    post = mocker.patch.object(
+        taiwan_futures_daily.requests,
+        "post",
+    )
+    post.return_value.ok = True
+    post.return_value.content = (
+        "<html>查無資料</html>".encode(
+            "big5"
+        )
+    )
+    df = taiwan_futures_daily.crawler_futures(
+        "2021-04-10"
+    )
+    assert len(df) == 0
+    assert not (
+        tmp_path
+        / "taiwan_futures_daily"
+        / "2021-04-10.csv"
+    ).exists()
+
+
+def test_crawler_holiday(mocker):
+    """
+    測試假日期交所回傳 html 時, crawler 回傳空的 DataFrame, 不會出錯
+    """
+    mocker.patch.object(
+        taiwan_futures_daily,
+        "RAW_ARCHIVE_DIR",
+        "",
+    )
+    mocker.patch.object(
+        taiwan_futures_daily.time,
+        "sleep",
+    )
+    post = mocker.patch.object(
+        taiwan_futures_daily.requests,
+        "post",
+    )
+    post.return_value.ok = True
+    post.return_value.content = (
+        "<html>查無資料</html>".encode(
+            "big5"
+        )
+    )
+    df = taiwan_futures_daily.crawler(
+        dict(
+            date="2021-04-05",
+            data_source="taifex",
+        )
+    )
+    assert len(df) == 0
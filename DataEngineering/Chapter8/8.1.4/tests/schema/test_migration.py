@@ -0,0 +1,196 @@
+import datetime
+
+from financialdata.schema.migration import (
+    compare_checksum,
+    get_checksum_sql,
+    get_chunk_list,
+    get_copy_sql,
+    get_lock_sql,
+    get_pending_migration,
+    get_schema_migration_table_sql,
+    get_shadow_table_sql,
+    get_swap_sql,
+    get_version_comment_sql,
+    parse_version_comment,
+    split_statement,
+)
+from financialdata.schema.registry import (
+    get_schema,
+)
+
+schema = get_schema(
+    "taiwan_futures_daily"
+)
+
+
+def test_get_chunk_list():
+    """
+    測試切成 [start, end) 的區間, 最後一段包含 end_date
+    """
+    result = get_chunk_list(
+        datetime.date(2021, 1, 1),
+        datetime.date(2021, 3, 1),
+        31,
+    )
+    expected = [
+        ("2021-01-01", "2021-02-01"),
+        ("2021-02-01", "2021-03-02"),
+    ]
+    assert result == expected
+
+
+def test_get_shadow_table_sql():
+    sql = get_shadow_table_sql(schema)
+    assert sql.startswith(
+        "CREATE TABLE `FinancialData`.`taiwan_futures_daily_new`("
+    )
+    assert (
+        "PRIMARY KEY(`FuturesID`, `ContractDate`, `TradingSession`, `Date`)"
+        in sql
+    )
+    # registry 的 table 名稱不變
+    assert (
+        schema.table
+        == "taiwan_futures_daily"
+    )
+
+
+def test_get_copy_sql():
+    sql = get_copy_sql(schema)
+    assert sql.startswith(
+        "INSERT INTO `taiwan_futures_daily_new`(`Date`,`FuturesID`,"
+    )
+    assert (
+        "FROM `taiwan_futures_daily` WHERE `Date` >= %s AND `Date` < %s"
+        in sql
+    )
+    assert (
+        "`FuturesID`=VALUES" not in sql
+    )
+    assert (
+        "`Close`=VALUES(`Close`)" in sql
+    )
+
+
+def test_get_checksum_sql():
+    sql = get_checksum_sql(
+        schema,
+        "taiwan_futures_daily_new",
+    )
+    assert (
+        "FROM `taiwan_futures_daily_new`"
+        in sql
+    )
+    assert (
+        "GROUP BY YEAR(`Date`)" in sql
+    )
+
+
+def test_compare_checksum():
+    """
+    測試筆數或 checksum 不同, 或只有一邊有資料的年度
+    """
+    source_list = [
+        (2019, 10, 100),
+        (2020, 10, 100),
+        (2021, 10, 100),
+        (2022, 10, 100),
+    ]
+    target_list = [
+        (2019, 10, 100),
+        (2020, 9, 100),
+        (2021, 10, 101),
+    ]
+    assert compare_checksum(
+        source_list, target_list
+    ) == [2020, 2021, 2022]
+    assert (
+        compare_checksum(
+            source_list, source_list
+        )
+        == []
+    )
+
+
+def test_get_swap_sql():
+    assert get_swap_sql(
+        "taiwan_futures_daily"
+    ) == (
+        "RENAME TABLE `taiwan_futures_daily` TO `taiwan_futures_daily_old`, "
+        "`taiwan_futures_daily_new` TO `taiwan_futures_daily`"
+    )
+
+
+def test_version_comment():
+    """
+    測試 copy 完成的 version 記錄在 shadow table 的 COMMENT
+    """
+    sql = get_version_comment_sql(
+        "taiwan_futures_daily", 12
+    )
+    assert sql == (
+        "ALTER TABLE `taiwan_futures_daily_new` "
+        "COMMENT = 'copied data_version 12'"
+    )
+    assert (
+        parse_version_comment(
+            "copied data_version 12"
+        )
+        == 12
+    )
+    assert (
+        parse_version_comment("")
+        is None
+    )
+
+
+def test_get_lock_sql():
+    assert get_lock_sql(
+        "taiwan_futures_daily"
+    ) == (
+        "LOCK TABLES `taiwan_futures_daily` WRITE, "
+        "`taiwan_futures_daily_new` WRITE, "
+        "`data_version` READ"
+    )
+
+
+def test_get_pending_migration():
+    """
+    測試依照檔名排序, 跳過已經執行過的檔案
+    """
+    result = get_pending_migration(
+        [
+            "002_b.sql",
+            "001_a.sql",
+            "003_c.sql",
+            "README.md",
+        ],
+        {"001_a.sql"},
+    )
+    assert result == [
+        "002_b.sql",
+        "003_c.sql",
+    ]
+
+
+def test_split_statement():
+    content = """-- 說明; 包含分號
+ALTER TABLE `a`
+    ADD PARTITION (PARTITION pmax VALUES LESS THAN MAXVALUE);
+ALTER TABLE `b` ADD INDEX `idx`(`Date`);
+"""
+    assert split_statement(content) == [
+        "ALTER TABLE `a`\n"
+        "    ADD PARTITION (PARTITION pmax VALUES LESS THAN MAXVALUE)",
+        "ALTER TABLE `b` ADD INDEX `idx`(`Date`)",
+    ]
+
+
+def test_get_schema_migration_table_sql():
+    sql = (
+        get_schema_migration_table_sql()
+    )
+    assert sql.startswith(
+        "CREATE TABLE IF NOT EXISTS "
+        "`FinancialData`.`schema_migration`"
+    )
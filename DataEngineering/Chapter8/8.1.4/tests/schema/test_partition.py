@@ -0,0 +1,117 @@
+import datetime
+
+from financialdata.schema.partition import (
+    PartitionTable,
+    from_days,
+    get_partition_sql,
+    to_days,
+)
+
+YEAR_PARTITION_LIST = [
+    ("p2023", "2024"),
+    ("p2024", "2025"),
+]
+
+
+def test_to_days():
+    # mysql: SELECT TO_DAYS('2025-01-01') = 739617
+    assert (
+        to_days(
+            datetime.date(2025, 1, 1)
+        )
+        == 739617
+    )
+    assert from_days(
+        739617
+    ) == datetime.date(2025, 1, 1)
+
+
+def test_add_year_partition():
+    """
+    測試補上到今年之後 2 年的 partition
+    """
+    sql = get_partition_sql(
+        PartitionTable(
+            table="taiwan_stock_price",
+            unit="year",
+            ahead=2,
+        ),
+        YEAR_PARTITION_LIST,
+        datetime.date(2026, 10, 16),
+    )
+    assert sql == (
+        "ALTER TABLE `taiwan_stock_price` ADD PARTITION ("
+        "PARTITION p2025 VALUES LESS THAN (2026), "
+        "PARTITION p2026 VALUES LESS THAN (2027), "
+        "PARTITION p2027 VALUES LESS THAN (2028), "
+        "PARTITION p2028 VALUES LESS THAN (2029))"
+    )
+
+
+def test_reorganize_pmax():
+    """
+    測試有 pmax 時, 從 pmax 切出新的 partition
+    """
+    sql = get_partition_sql(
+        PartitionTable(
+            table="taiwan_stock_price",
+            unit="year",
+            ahead=1,
+        ),
+        YEAR_PARTITION_LIST
+        + [("pmax", "MAXVALUE")],
+        datetime.date(2025, 1, 2),
+    )
+    assert sql == (
+        "ALTER TABLE `taiwan_stock_price` "
+        "REORGANIZE PARTITION pmax INTO ("
+        "PARTITION p2025 VALUES LESS THAN (2026), "
+        "PARTITION p2026 VALUES LESS THAN (2027), "
+        "PARTITION pmax VALUES LESS THAN MAXVALUE)"
+    )
+
+
+def test_partition_up_to_date():
+    assert (
+        get_partition_sql(
+            PartitionTable(
+                table="taiwan_stock_price",
+                unit="year",
+                ahead=1,
+            ),
+            YEAR_PARTITION_LIST,
+            datetime.date(2023, 6, 1),
+        )
+        is None
+    )
+
+
+def test_add_month_partition():
+    """
+    測試月份 partition, 使用 TO_DAYS, 跨年
+    """
+    sql = get_partition_sql(
+        PartitionTable(
+            table="taiwan_futures_tick",
+            unit="month",
+            ahead=1,
+        ),
+        [
+            (
+                "p202411",
+                str(
+                    to_days(
+                        datetime.date(
+                            2024, 12, 1
+                        )
+                    )
+                ),
+            )
+        ],
+        datetime.date(2024, 12, 15),
+    )
+    assert sql == (
+        "ALTER TABLE `taiwan_futures_tick` ADD PARTITION ("
+        f"PARTITION p202412 VALUES LESS THAN ({to_days(datetime.date(2025, 1, 1))}), "
+        f"PARTITION p202501 VALUES LESS THAN ({to_days(datetime.date(2025, 2, 1))}))"
+    )
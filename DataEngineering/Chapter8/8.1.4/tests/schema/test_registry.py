@@ -0,0 +1,236 @@
+import pathlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from financialdata.schema.dataset import (
+    TaiwanStockPrice,
+    check_schema,
+)
+from financialdata.schema.registry import (
+    get_create_table_sql,
+    get_ddl,
+    get_dtype_dict,
+    get_partition_table_list,
+    get_schema,
+    get_upsert_params,
+    get_upsert_sql,
+    validate,
+)
+
+schema = get_schema(
+    "taiwan_stock_price"
+)
+
+
+def get_price_df() -> pd.DataFrame:
+    # 爬蟲回傳的欄位順序與型態, 與 table 不同
+    return pd.DataFrame(
+        [
+            {
+                "Date": "2021-01-05",
+                "StockID": 2330,
+                "TradeVolume": "39489388",
+                "Transaction": 36845.0,
+                "TradeValue": "21091596556",
+                "Open": "530",
+                "Max": 536,
+                "Min": "528",
+                "Close": "536",
+                "Change": "6.0",
+            }
+        ],
+        index=[5],
+    )
+
+
+def test_ddl_same_as_sql_file():
+    """
+    測試 create_partition_table.sql 由 registry 產生, 兩者一致
+    """
+    path = (
+        pathlib.Path(__file__).parents[
+            2
+        ]
+        / "create_partition_table.sql"
+    )
+    assert (
+        path.read_text(encoding="utf8")
+        == get_ddl()
+    )
+
+
+def test_chapter11_ddl_same_as_registry():
+    """
+    測試 Chapter11/11.5 上傳使用的 taiwan_stock_price DDL 由 registry 產生
+    """
+    path = (
+        pathlib.Path(__file__).parents[
+            4
+        ]
+        / "Chapter11"
+        / "11.5"
+        / "sql"
+        / "taiwan_stock_price.sql"
+    )
+    assert path.read_text(
+        encoding="utf8"
+    ) == get_create_table_sql(schema)
+
+
+def test_get_schema():
+    assert (
+        get_schema("TaiwanStockPrice")
+        is schema
+    )
+    assert [
+        item.table
+        for item in get_partition_table_list()
+    ] == [
+        "taiwan_stock_price",
+        "taiwan_futures_daily",
+        "taiwan_stock_investor_price",
+    ]
+
+
+def test_get_dtype_dict():
+    dtype_dict = get_dtype_dict(schema)
+    assert (
+        dtype_dict["TradeVolume"]
+        == "int64"
+    )
+    assert (
+        dtype_dict["Close"] == "float64"
+    )
+    assert (
+        get_dtype_dict(
+            get_schema(
+                "taiwan_stock_indicator"
+            )
+        )["ma_5"]
+        == "float64"
+    )
+
+
+def test_validate():
+    """
+    測試整個欄位轉換型態, 欄位順序與 table 一致, index 重新編號
+    """
+    df = validate(
+        get_price_df(), schema
+    )
+    assert (
+        list(df.columns)
+        == schema.column_names
+    )
+    assert list(df.index) == [0]
+    assert df.dtypes.astype(
+        str
+    ).to_dict() == get_dtype_dict(
+        schema
+    )
+    assert (
+        df.loc[0, "StockID"] == "2330"
+    )
+    assert (
+        df.loc[0, "TradeValue"]
+        == 21091596556
+    )
+    assert (
+        df.loc[0, "Date"]
+        == "2021-01-05"
+    )
+
+
+def test_validate_same_as_model():
+    """
+    測試檢查結果與逐筆的 pydantic model 相同
+    """
+    df = check_schema(
+        get_price_df(),
+        "TaiwanStockPrice",
+    )
+    expected = TaiwanStockPrice(
+        **get_price_df().to_dict(
+            "records"
+        )[0]
+    ).dict()
+    assert (
+        df.to_dict("records")[0]
+        == expected
+    )
+
+
+def test_check_schema_empty():
+    """
+    測試休市日的空 DataFrame 不做檢查
+    """
+    df = check_schema(
+        pd.DataFrame(),
+        "TaiwanStockPrice",
+    )
+    assert len(df) == 0
+
+
+@pytest.mark.parametrize(
+    "column, value",
+    [
+        ("Close", "--"),
+        ("Close", None),
+        ("StockID", "12345678901"),
+        ("Date", "2021-13-01"),
+    ],
+)
+def test_validate_error(column, value):
+    df = get_price_df()
+    df[column] = value
+    with pytest.raises(ValueError):
+        validate(df, schema)
+
+
+def test_validate_missing_column():
+    with pytest.raises(
+        ValueError, match="Close"
+    ):
+        validate(
+            get_price_df().drop(
+                columns=["Close"]
+            ),
+            schema,
+        )
+
+
+def test_get_upsert_sql():
+    sql = get_upsert_sql(
+        get_schema(
+            "taiwan_stock_indicator_state"
+        )
+    )
+    assert sql == (
+        "INSERT INTO `taiwan_stock_indicator_state`(`StockID`,`Date`,`State`) "
+        "VALUES (%s,%s,%s) ON DUPLICATE KEY UPDATE "
+        "`Date`=VALUES(`Date`),`State`=VALUES(`State`)"
+    )
+
+
+def test_get_upsert_params():
+    """
+    測試 numpy 型態轉成 python 型態, NaN 轉成 None
+    """
+    df = pd.DataFrame(
+        dict(
+            StockID=["2330", "2330"],
+            ma_5=[np.nan, 600.5],
+        )
+    )
+    params = get_upsert_params(
+        df, ["StockID", "ma_5"]
+    )
+    assert params == [
+        ("2330", None),
+        ("2330", 600.5),
+    ]
+    assert isinstance(
+        params[1][1], float
+    )
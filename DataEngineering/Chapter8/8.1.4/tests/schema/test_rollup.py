@@ -0,0 +1,353 @@
+import datetime
+import sqlite3
+
+import pytest
+
+from financialdata.schema.rollup import (
+    get_refresh_range,
+    get_refresh_sql_list,
+    get_rollup_list,
+    get_rollup_lock_name,
+)
+
+
+@pytest.mark.parametrize(
+    "unit, start_date, end_date, expected",
+    [
+        (
+            "day",
+            datetime.date(2021, 4, 1),
+            datetime.date(2021, 4, 1),
+            (
+                "2021-04-01",
+                "2021-04-02",
+            ),
+        ),
+        (
+            "month",
+            datetime.date(2021, 4, 6),
+            datetime.date(2021, 4, 6),
+            (
+                "2021-04-01",
+                "2021-05-01",
+            ),
+        ),
+        (
+            "month",
+            datetime.date(2021, 1, 5),
+            datetime.date(2021, 12, 31),
+            (
+                "2021-01-01",
+                "2022-01-01",
+            ),
+        ),
+    ],
+)
+def test_get_refresh_range(
+    unit, start_date, end_date, expected
+):
+    assert (
+        get_refresh_range(
+            unit, start_date, end_date
+        )
+        == expected
+    )
+
+
+def test_get_rollup_list():
+    assert [
+        rollup.table
+        for rollup in get_rollup_list(
+            source="taiwan_stock_price"
+        )
+    ] == [
+        "taiwan_stock_market_summary",
+        "taiwan_stock_price_month",
+        "taiwan_stock_industry_summary",
+        "taiwan_stock_investor_price",
+    ]
+    assert [
+        rollup.table
+        for rollup in get_rollup_list(
+            source="taiwan_stock_info"
+        )
+    ] == ["taiwan_stock_name"]
+    assert (
+        get_rollup_list(
+            source="taiwan_futures_daily"
+        )
+        == []
+    )
+
+
+def test_get_rollup_list_exist_table():
+    """
+    測試只用 Chapter8 的 DDL 建立資料庫時, 略過 source 不存在的彙總 table
+    """
+    assert [
+        rollup.table
+        for rollup in get_rollup_list(
+            source="taiwan_stock_price",
+            exist_table_list=[
+                "taiwan_stock_price",
+                "taiwan_stock_market_summary",
+                "taiwan_stock_price_month",
+                "taiwan_stock_industry_summary",
+                "taiwan_stock_investor_price",
+            ],
+        )
+    ] == [
+        "taiwan_stock_market_summary",
+        "taiwan_stock_price_month",
+    ]
+
+
+def test_get_rollup_lock_name():
+    lock_name = get_rollup_lock_name(
+        get_rollup_list(
+            table="taiwan_stock_industry_summary"
+        )[0]
+    )
+    assert (
+        lock_name
+        == "financialdata_rollup_taiwan_stock_industry_summary"
+    )
+    # mysql lock 名稱最長 64 字元
+    assert all(
+        len(
+            get_rollup_lock_name(rollup)
+        )
+        <= 64
+        for rollup in get_rollup_list()
+    )
+
+
+def create_price_conn() -> (
+    sqlite3.Connection
+):
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        "create table taiwan_stock_price "
+        "(StockID, TradeVolume, `Transaction`, TradeValue, Open, Max, Min, Close, `Change`, Date)"
+    )
+    conn.executemany(
+        "insert into taiwan_stock_price values (?,?,?,?,?,?,?,?,?,?)",
+        [
+            (
+                "2330",
+                100,
+                10,
+                60000,
+                598,
+                602,
+                594,
+                600,
+                2,
+                "2021-04-01",
+            ),
+            (
+                "2303",
+                200,
+                20,
+                10000,
+                50,
+                51,
+                49,
+                50,
+                -1,
+                "2021-04-01",
+            ),
+            (
+                "2317",
+                300,
+                30,
+                30000,
+                100,
+                101,
+                99,
+                100,
+                0,
+                "2021-04-01",
+            ),
+            (
+                "2330",
+                100,
+                10,
+                60000,
+                600,
+                605,
+                599,
+                603,
+                3,
+                "2021-04-06",
+            ),
+        ],
+    )
+    conn.execute(
+        "create table taiwan_stock_info (industry_category, stock_id)"
+    )
+    conn.executemany(
+        "insert into taiwan_stock_info values (?,?)",
+        [
+            ("半導體業", "2330"),
+            ("半導體業", "2303"),
+            ("其他電子業", "2317"),
+        ],
+    )
+    return conn
+
+
+def refresh(conn, table: str):
+    rollup = get_rollup_list(
+        table=table
+    )[0]
+    for sql in get_refresh_sql_list(
+        rollup,
+        datetime.date(2021, 4, 1),
+        datetime.date(2021, 4, 1),
+    ):
+        conn.execute(sql)
+    return conn.execute(
+        f"select * from {table} order by 1, 2"
+    ).fetchall()
+
+
+def test_refresh_market_summary():
+    """
+    測試只重算 2021-04-01, 重複執行結果相同, 使用 sqlite 代替 mysql
+    """
+    conn = create_price_conn()
+    conn.execute(
+        "create table taiwan_stock_market_summary "
+        "(Date, StockCount, TradeVolume, TradeValue, `Transaction`, Advancers, Decliners, Unchanged)"
+    )
+    for _ in range(2):
+        result = refresh(
+            conn,
+            "taiwan_stock_market_summary",
+        )
+    assert result == [
+        (
+            "2021-04-01",
+            3,
+            600,
+            100000,
+            60,
+            1,
+            1,
+            1,
+        )
+    ]
+
+
+def test_refresh_industry_summary():
+    conn = create_price_conn()
+    conn.execute(
+        "create table taiwan_stock_industry_summary "
+        "(industry_category, Date, StockCount, TradeVolume, TradeValue, Advancers, Decliners, Unchanged)"
+    )
+    result = refresh(
+        conn,
+        "taiwan_stock_industry_summary",
+    )
+    assert result == [
+        (
+            "其他電子業",
+            "2021-04-01",
+            1,
+            300,
+            30000,
+            0,
+            0,
+            1,
+        ),
+        (
+            "半導體業",
+            "2021-04-01",
+            2,
+            300,
+            70000,
+            1,
+            1,
+            0,
+        ),
+    ]
+
+
+def test_refresh_investor_price():
+    """
+    測試每種法人的買賣超, 與收盤價放在同一列
+    """
+    conn = create_price_conn()
+    conn.execute(
+        "create table taiwan_stock_institutional_investors (name, buy, sell, stock_id, date)"
+    )
+    conn.executemany(
+        "insert into taiwan_stock_institutional_investors values (?,?,?,?,?)",
+        [
+            (
+                "Foreign_Investor",
+                300,
+                100,
+                "2330",
+                "2021-04-01",
+            ),
+            (
+                "Investment_Trust",
+                10,
+                50,
+                "2330",
+                "2021-04-01",
+            ),
+            (
+                "Foreign_Investor",
+                1,
+                2,
+                "2330",
+                "2021-04-06",
+            ),
+        ],
+    )
+    conn.execute(
+        "create table taiwan_stock_investor_price "
+        "(stock_id, date, Close, Foreign_Investor, Foreign_Dealer_Self, "
+        "Investment_Trust, Dealer_self, Dealer_Hedging)"
+    )
+    conn.create_function(
+        "IF",
+        3,
+        lambda condition, a, b: (
+            a if condition else b
+        ),
+    )
+    result = refresh(
+        conn,
+        "taiwan_stock_investor_price",
+    )
+    assert result == [
+        (
+            "2330",
+            "2021-04-01",
+            600,
+            200,
+            0,
+            -40,
+            0,
+            0,
+        )
+    ]
+
+
+def test_refresh_stock_name():
+    rollup = get_rollup_list(
+        table="taiwan_stock_name"
+    )[0]
+    sql_list = get_refresh_sql_list(
+        rollup
+    )
+    assert sql_list[0] == (
+        "DELETE FROM `taiwan_stock_name`"
+    )
+    assert sql_list[1].startswith(
+        "INSERT INTO `taiwan_stock_name`(`stock_name`,`stock_id`)"
+    )
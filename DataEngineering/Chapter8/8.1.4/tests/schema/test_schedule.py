@@ -0,0 +1,149 @@
+import datetime
+
+from financialdata.schema.schedule import (
+    SCHEDULE_LIST,
+    ScheduleItem,
+    get_data_date,
+    get_fire_time_list,
+    get_missed_date_range,
+    get_trigger,
+)
+
+item = ScheduleItem(
+    dataset="taiwan_stock_price",
+    cron="0 15 * * mon-fri",
+    market_close="13:30",
+    close_offset=90,
+)
+
+
+def get_now(*args) -> datetime.datetime:
+    # 使用 trigger 的時區, 建立測試用的現在時間
+    return datetime.datetime(
+        *args,
+        tzinfo=datetime.timezone(
+            datetime.timedelta(hours=8)
+        ),
+    )
+
+
+def test_schedule_list():
+    """
+    測試排程註冊表, 每個 dataset 只有一筆, 且 cron 格式正確
+    """
+    dataset_list = [
+        item.dataset
+        for item in SCHEDULE_LIST
+    ]
+    assert len(dataset_list) == len(
+        set(dataset_list)
+    )
+    for schedule_item in SCHEDULE_LIST:
+        assert get_trigger(
+            schedule_item
+        )
+
+
+def test_get_data_date():
+    """
+    測試 15:00 觸發, 收盤 13:30 + 90 分鐘, 資料已公布, 爬當天
+    """
+    result = get_data_date(
+        item,
+        get_now(2021, 4, 12, 15, 0),
+    )
+    expected = datetime.date(
+        2021, 4, 12
+    )
+    assert result == expected
+
+
+def test_get_data_date_before_ready():
+    """
+    測試資料公布前觸發, 爬前一天
+    """
+    result = get_data_date(
+        item,
+        get_now(2021, 4, 12, 14, 0),
+    )
+    expected = datetime.date(
+        2021, 4, 11
+    )
+    assert result == expected
+
+
+def test_get_fire_time_list():
+    """
+    測試 2021-04-09 (五) ~ 2021-04-13 (二), 跳過周末
+    """
+    result = get_fire_time_list(
+        item,
+        get_now(2021, 4, 9),
+        get_now(2021, 4, 13, 23, 0),
+    )
+    expected = [
+        datetime.date(2021, 4, 9),
+        datetime.date(2021, 4, 12),
+        datetime.date(2021, 4, 13),
+    ]
+    assert [
+        fire_time.date()
+        for fire_time in result
+    ] == expected
+
+
+def test_get_missed_date_range():
+    """
+    測試 scheduler 停機, 上次發送 2021-04-07, 重啟時間 2021-04-13 16:00,
+    補發 2021-04-08 ~ 2021-04-13, 合併成一段
+    """
+    result = get_missed_date_range(
+        item,
+        datetime.date(2021, 4, 7),
+        get_now(2021, 4, 13, 16, 0),
+    )
+    expected = (
+        "2021-04-08",
+        "2021-04-13",
+    )
+    assert result == expected
+
+
+def test_get_missed_date_range_already_sent():
+    """
+    測試當天已經發送過, 不重複發送
+    """
+    result = get_missed_date_range(
+        item,
+        datetime.date(2021, 4, 13),
+        get_now(2021, 4, 13, 16, 0),
+    )
+    assert result is None
+
+
+def test_get_missed_date_range_before_fire():
+    """
+    測試當天排程時間還沒到, 不發送
+    """
+    result = get_missed_date_range(
+        item,
+        datetime.date(2021, 4, 12),
+        get_now(2021, 4, 13, 10, 0),
+    )
+    assert result is None
+
+
+def test_get_missed_date_range_no_record():
+    """
+    測試沒有紀錄時, 只發送最近一次排程
+    """
+    result = get_missed_date_range(
+        item,
+        None,
+        get_now(2021, 4, 13, 10, 0),
+    )
+    expected = (
+        "2021-04-12",
+        "2021-04-12",
+    )
+    assert result == expected
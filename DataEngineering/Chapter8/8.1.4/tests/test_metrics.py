@@ -0,0 +1,125 @@
+import socket
+
+from financialdata import metrics
+
+
+def test_disabled(mocker):
+    """
+    測試 metrics 沒開啟時, 不會記錄任何資料
+    """
+    mocker.patch(
+        "financialdata.metrics.METRICS_ENABLED",
+        False,
+    )
+    metrics.clear()
+    with metrics.timer("sleep"):
+        pass
+    metrics.inc(
+        "financialdata_rows_total"
+    )
+    assert metrics.render() == "\n"
+
+
+def test_timer(mocker):
+    """
+    測試 timer 依照 dataset, source, stage 記錄 histogram
+    """
+    mocker.patch(
+        "financialdata.metrics.METRICS_ENABLED",
+        True,
+    )
+    metrics.clear()
+    metrics.set_labels(
+        dataset="taiwan_stock_price",
+        source="twse",
+    )
+    with metrics.timer("sleep"):
+        pass
+    result = metrics.render()
+    labels = 'dataset="taiwan_stock_price",source="twse",stage="sleep"'
+    assert (
+        "# TYPE financialdata_stage_duration_seconds histogram"
+        in result
+    )
+    assert (
+        f'financialdata_stage_duration_seconds_bucket{{{labels},le="0.01"}} 1'
+        in result
+    )
+    assert (
+        f"financialdata_stage_duration_seconds_count{{{labels}}} 1"
+        in result
+    )
+
+
+def test_inc(mocker):
+    """
+    測試 counter 累加
+    """
+    mocker.patch(
+        "financialdata.metrics.METRICS_ENABLED",
+        True,
+    )
+    metrics.clear()
+    metrics.set_labels(
+        dataset="taiwan_stock_price",
+        source="tpex",
+    )
+    metrics.inc(
+        "financialdata_rows_total", 100
+    )
+    metrics.inc(
+        "financialdata_rows_total", 50
+    )
+    result = metrics.render()
+    expected = (
+        "# TYPE financialdata_rows_total counter\n"
+        'financialdata_rows_total{dataset="taiwan_stock_price",source="tpex"} 150\n'
+    )
+    assert result == expected
+
+
+def test_write_textfile(
+    mocker, tmp_path
+):
+    """
+    測試 textfile collector 寫檔
+    """
+    mocker.patch(
+        "financialdata.metrics.METRICS_ENABLED",
+        True,
+    )
+    metrics.clear()
+    metrics.inc(
+        "financialdata_task_total"
+    )
+    path = str(
+        tmp_path / "financialdata.prom"
+    )
+    metrics.write_textfile(path)
+    with open(
+        path, encoding="utf8"
+    ) as f:
+        assert (
+            f.read() == metrics.render()
+        )
+
+
+def test_start_http_server_port_in_use(
+    mocker,
+):
+    """
+    測試 port 已被使用時, 不啟動也不拋出例外
+    """
+    mocker.patch(
+        "financialdata.metrics.METRICS_ENABLED",
+        True,
+    )
+    with socket.socket() as sock:
+        sock.bind(("0.0.0.0", 0))
+        sock.listen()
+        assert (
+            metrics.start_http_server(
+                sock.getsockname()[1]
+            )
+            is None
+        )
@@ -0,0 +1,216 @@
+import json
+
+from financialdata import tracing
+
+
+class ListExporter(
+    tracing.SpanExporter
+):
+    def __init__(self):
+        self.span_list = []
+
+    def export(self, span):
+        self.span_list.append(span)
+
+
+def test_disabled():
+    """
+    測試沒有 exporter 時, span 不做任何事
+    """
+    tracing.set_exporter(None)
+    with tracing.start_span(
+        "fetch"
+    ) as span:
+        assert span is None
+    assert tracing.inject() == {}
+
+
+def test_start_span():
+    """
+    測試巢狀 span, 下層 span 接續上層的 trace id
+    """
+    exporter = ListExporter()
+    tracing.set_exporter(exporter)
+    with tracing.start_span(
+        "producer.Update"
+    ) as root:
+        with tracing.start_span(
+            "producer.send"
+        ) as child:
+            headers = tracing.inject()
+    tracing.set_exporter(None)
+    assert headers == {
+        "trace_id": root.trace_id,
+        "parent_span_id": child.span_id,
+    }
+    assert (
+        child.trace_id == root.trace_id
+    )
+    assert (
+        child.parent_id == root.span_id
+    )
+    # 下層 span 先結束, 先輸出
+    assert [
+        span["name"]
+        for span in exporter.span_list
+    ] == [
+        "producer.send",
+        "producer.Update",
+    ]
+
+
+def test_extract():
+    """
+    測試 worker 從 celery request 取出 trace context, 接續 producer 的 trace
+    """
+
+    class Request:
+        trace_id = "abc"
+        parent_span_id = "123"
+        headers = None
+
+    exporter = ListExporter()
+    tracing.set_exporter(exporter)
+    with tracing.start_span(
+        "task.crawler",
+        parent=tracing.extract(
+            Request()
+        ),
+    ) as span:
+        pass
+    tracing.set_exporter(None)
+    assert span.trace_id == "abc"
+    assert span.parent_id == "123"
+
+
+def test_extract_without_headers():
+    """
+    測試沒有 trace headers 的 task, 各自建立新的 trace, 不會合併成同一個
+    """
+
+    class Request:
+        headers = None
+
+    exporter = ListExporter()
+    tracing.set_exporter(exporter)
+    span_list = []
+    for _ in range(2):
+        with tracing.start_span(
+            "task.crawler",
+            parent=tracing.extract(
+                Request()
+            ),
+        ) as span:
+            span_list.append(span)
+    tracing.set_exporter(None)
+    assert all(
+        span.trace_id
+        for span in span_list
+    )
+    assert (
+        span_list[0].trace_id
+        != span_list[1].trace_id
+    )
+    assert (
+        span_list[0].parent_id is None
+    )
+
+
+def test_annotate_sql():
+    """
+    測試 SQL 加上 trace 註解
+    """
+    tracing.set_exporter(ListExporter())
+    with tracing.start_span(
+        "upload"
+    ) as span:
+        statement, _ = (
+            tracing.annotate_sql(
+                None,
+                None,
+                "SELECT 1",
+                (),
+                None,
+                False,
+            )
+        )
+    tracing.set_exporter(None)
+    assert statement == (
+        f"/* trace_id={span.trace_id} "
+        f"span_id={span.span_id} */ SELECT 1"
+    )
+    assert (
+        span.attributes["sql_count"]
+        == 1
+    )
+
+
+def test_format_trace(tmp_path):
+    """
+    測試 JsonLinesExporter 輸出, 並用 (dataset, date, source) 找出對應的 trace
+    """
+    path = str(
+        tmp_path / "traces.jsonl"
+    )
+    tracing.set_exporter(
+        tracing.JsonLinesExporter(path)
+    )
+    with tracing.start_span(
+        "producer.Update",
+        dataset="taiwan_stock_price",
+    ):
+        for source in ["twse", "tpex"]:
+            with tracing.start_span(
+                "producer.send",
+                dataset="taiwan_stock_price",
+                date="2021-04-01",
+                source=source,
+            ):
+                headers = (
+                    tracing.inject()
+                )
+            with tracing.start_span(
+                "task.crawler",
+                parent=headers,
+                dataset="taiwan_stock_price",
+                date="2021-04-01",
+                source=source,
+            ):
+                with tracing.start_span(
+                    "fetch"
+                ):
+                    pass
+    tracing.set_exporter(None)
+    span_list = tracing.load_span_list(
+        path
+    )
+    with open(
+        path, encoding="utf8"
+    ) as f:
+        assert len(f.readlines()) == 7
+    lines = tracing.format_trace(
+        span_list,
+        dict(
+            dataset="taiwan_stock_price",
+            date="2021-04-01",
+            source="twse",
+        ),
+    )
+    assert lines[0].startswith(
+        "trace_id: "
+    )
+    assert [
+        line.strip().split(" ")[0]
+        for line in lines[1:]
+    ] == [
+        "producer.Update",
+        "producer.send",
+        "task.crawler",
+        "fetch",
+    ]
+    assert (
+        json.loads(
+            lines[2].split("ms ", 1)[1]
+        )["source"]
+        == "twse"
+    )